@@ -0,0 +1,86 @@
+"""Benchmark the accuracy-contour modes and measure how far "planar" deviates from "spherical".
+
+Usage::
+
+    uv run python benchmarks/contour_modes.py [--points 200000] [--spacing 10] [--accuracy 30]
+
+Builds a synthetic random-walk segment per latitude, runs ContourBuilder in both
+modes (with NumPy when installed, and the per-point fallback) and prints the
+timings and the largest distance between corresponding contour points.
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import random
+import time
+
+from alp2gpx import contours
+from alp2gpx.contours import EARTH_RADIUS_M, METRES_PER_DEGREE, ContourBuilder
+from alp2gpx.trackpoint import FIELDS, Segment
+
+TAIL = (None,) * (len(FIELDS) - 5)
+
+
+def synthetic_segment(points: int, lat0: float, spacing_m: float, accuracy_m: float, seed: int = 1) -> Segment:
+    rnd = random.Random(seed)
+    segment = Segment()
+    lat, lon, heading = lat0, 8.9, 0.0
+    for i in range(points):
+        segment.append_row((lat, lon, 2000.0, 1.6e9 + i, rnd.randint(1, int(accuracy_m))) + TAIL)
+        heading += rnd.gauss(0, 0.4)
+        step = rnd.uniform(0, 2 * spacing_m)
+        lat += step * math.cos(heading) / METRES_PER_DEGREE
+        lon += step * math.sin(heading) / (METRES_PER_DEGREE * math.cos(math.radians(lat)))
+    return segment
+
+
+def build(segment: Segment, mode: str, chunk: int = 65536):
+    parts = [
+        Segment.from_columns(None, min(chunk, len(segment) - begin), {
+            name: (segment.columns[name][begin:begin + chunk], None) for name in ("lat", "lon", "elevation", "timestamp", "accuracy")
+        })
+        for begin in range(0, len(segment), chunk)
+    ]
+    builder = ContourBuilder(mode)
+    left, right = [], []
+    started = time.perf_counter()
+    for part in parts:
+        for side, contour in zip((left, right), builder.feed(part)):
+            side.append(contour)
+    for side, contour in zip((left, right), builder.finish()):
+        side.append(contour)
+    elapsed = time.perf_counter() - started
+    return elapsed, [[(lat, lon) for part in side for lat, lon in zip(part.column("lat"), part.column("lon"))] for side in (left, right)]
+
+
+def distance_m(a, b) -> float:
+    # equirectangular is exact enough for the sub-metre distances compared here
+    dy = (b[0] - a[0]) * METRES_PER_DEGREE
+    dx = (b[1] - a[1]) * METRES_PER_DEGREE * math.cos(math.radians(a[0]))
+    return math.hypot(dx, dy)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--points", type=int, default=200000)
+    parser.add_argument("--spacing", type=float, default=10.0, help="mean distance between points in metres")
+    parser.add_argument("--accuracy", type=float, default=30.0, help="largest offset in metres")
+    args = parser.parse_args()
+
+    engines = [("numpy", True), ("per-point", False)] if contours.HAVE_NUMPY else [("per-point", False)]
+    print(f"{args.points} points, spacing ~{args.spacing:g} m, offsets up to {args.accuracy:g} m (R = {EARTH_RADIUS_M:.0f} m)")
+    for lat0 in (0.0, 46.5, 70.0):
+        segment = synthetic_segment(args.points, lat0, args.spacing, args.accuracy)
+        for engine, use_numpy in engines:
+            contours.HAVE_NUMPY = use_numpy
+            t_sph, sph = build(segment, "spherical")
+            t_pla, pla = build(segment, "planar")
+            error = max(distance_m(a, b) for side_s, side_p in zip(sph, pla) for a, b in zip(side_s, side_p))
+            print(f"lat {lat0:4.1f}  {engine:9s}  spherical {t_sph:7.3f}s  planar {t_pla:7.3f}s  speedup {t_sph / t_pla:5.1f}x  max deviation {error * 1000:.4f} mm")
+        contours.HAVE_NUMPY = engines[0][1]
+
+
+if __name__ == "__main__":
+    main()
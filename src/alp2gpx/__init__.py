@@ -3,14 +3,24 @@ import os
 import sys
 import cProfile
 from pathlib import Path
-from typing import Optional
+from typing import Optional, Tuple
 
-from .alp2gpx import alp2gpx
+from .alp2gpx import StringDecodeError, alp2gpx
+from .cache import CACHE_ENV, DEFAULT_MAX_BYTES
+from .columnar import HAVE_PYARROW
+from .compression import COMPRESS_FORMATS
+from .contours import CONTOUR_MODES
+from .formats import COLUMNAR_FORMATS, OUTPUT_FORMATS, output_format
+from .geojson import GEOJSON_GEOMETRIES
+from .geoid import GRID_ENV, build_grid, get_grid
+from .ldk import LDKFormatError
 from .ops import batch_convert, find_tracks, read_header
+from .simplify import SIMPLIFY_METHODS
 
 
-def _default_output(input_path: str) -> str:
-    return "%s.gpx" % os.path.splitext(input_path)[0]
+def _default_output(input_path: str, compress: Optional[str] = None, output_format: str = "gpx") -> str:
+    output = os.path.splitext(input_path)[0] + OUTPUT_FORMATS[output_format]
+    return f"{output}.{compress}" if compress else output
 
 
 def _require_input(input_path: Optional[str], batch_dir: Optional[Path]) -> None:
@@ -18,6 +28,14 @@ def _require_input(input_path: Optional[str], batch_dir: Optional[Path]) -> None
         raise SystemExit("Provide an input file or --batch-dir to process.")
 
 
+def _bbox(text: str) -> Tuple[float, float, float, float]:
+    try:
+        min_lon, min_lat, max_lon, max_lat = (float(value) for value in text.split(","))
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected MIN_LON,MIN_LAT,MAX_LON,MAX_LAT")
+    return min_lon, min_lat, max_lon, max_lat
+
+
 def main() -> None:
     parser = argparse.ArgumentParser()
 
@@ -30,7 +48,7 @@ def main() -> None:
         "-o",
         "--output",
         default=None,  # Handled after parser.parse_args()
-        help="output base name (default input file path and base name)",
+        help="output base name (default input file path and base name); a .gz, .bz2 or .xz suffix compresses the GPX",
     )
     parser.add_argument(
         "--summary-only",
@@ -48,6 +66,59 @@ def main() -> None:
         default=Path("dist/converted"),
         help="Output directory for batch conversion (defaults to dist/converted).",
     )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Parallel conversions for --batch-dir or the tracks of an LDK (0 = one per CPU; default 1).",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only convert new or changed tracks, tracked in a manifest in --out-dir.",
+    )
+    parser.add_argument(
+        "--prune",
+        action="store_true",
+        help="With --batch-dir, delete outputs whose source track no longer exists.",
+    )
+    parser.add_argument(
+        "--build-index",
+        type=Path,
+        default=None,
+        metavar="DB",
+        help="With --batch-dir, add header stats of all tracks to this SQLite index (only new or changed files are read).",
+    )
+    parser.add_argument(
+        "--query-index",
+        type=Path,
+        default=None,
+        metavar="DB",
+        help="List tracks in this SQLite index matching the filters below, without reading any TRK file.",
+    )
+    parser.add_argument("--trk-version", type=int, default=None, help="Index query: TRK version (2, 3 or 4).")
+    parser.add_argument("--since", default=None, help="Index query: first location on or after this ISO date/time.")
+    parser.add_argument("--until", default=None, help="Index query: first location on or before this ISO date/time.")
+    parser.add_argument("--min-length", type=float, default=None, help="Index query: minimum track length in metres.")
+    parser.add_argument("--max-length", type=float, default=None, help="Index query: maximum track length in metres.")
+    parser.add_argument("--min-gain", type=float, default=None, help="Index query: minimum elevation gain in metres.")
+    parser.add_argument("--max-gain", type=float, default=None, help="Index query: maximum elevation gain in metres.")
+    parser.add_argument(
+        "--bbox",
+        type=_bbox,
+        default=None,
+        metavar="MIN_LON,MIN_LAT,MAX_LON,MAX_LAT",
+        help="Index query: first location inside this bounding box.",
+    )
+    parser.add_argument(
+        "--ldk-track",
+        dest="ldk_tracks",
+        action="append",
+        default=None,
+        metavar="PATH",
+        help="Convert only this LDK entry (path or uuid as listed by --summary-only; repeatable).",
+    )
     parser.add_argument(
         "--limit",
         type=int,
@@ -89,6 +160,108 @@ def main() -> None:
         action="store_true",
         help="Emit left/right accuracy contour tracks offset by horizontal accuracy.",
     )
+    parser.add_argument(
+        "--contour-mode",
+        choices=CONTOUR_MODES,
+        default="spherical",
+        help="Offset contours along great circles (default) or on a local east-north plane (faster; deviates by up to about accuracy^2 * tan(lat) / 6371 km, e.g. 1.1 mm for 100 m at 46.5 degrees, 2.8 mm at 70 degrees).",
+    )
+    parser.add_argument(
+        "--simplify",
+        type=float,
+        default=None,
+        metavar="METRES",
+        help="Drop trackpoints within this distance of the simplified track line (timestamps and extensions of kept points are preserved).",
+    )
+    parser.add_argument(
+        "--simplify-method",
+        choices=SIMPLIFY_METHODS,
+        default="visvalingam",
+        help="Simplification algorithm for --simplify: visvalingam (default, O(n log n)) removes points whose triangle with their neighbours is under METRES squared; douglas-peucker keeps points farther than METRES from the line (O(n^2) worst case).",
+    )
+    parser.add_argument(
+        "--compress",
+        choices=COMPRESS_FORMATS,
+        default=None,
+        help="Write compressed GPX (<name>.gpx.gz etc.): all --batch-dir outputs, or the default single-file output.",
+    )
+    parser.add_argument(
+        "--compress-level",
+        type=int,
+        choices=range(1, 10),
+        default=None,
+        metavar="1-9",
+        help="Compression level for compressed outputs (default 6).",
+    )
+    parser.add_argument(
+        "--coordinate-digits",
+        type=int,
+        choices=range(1, 10),
+        default=None,
+        metavar="1-9",
+        help="Write lat/lon with this many decimals (7 = the TRK resolution, exact; default: shortest float repr).",
+    )
+    parser.add_argument(
+        "--elevation-digits",
+        type=int,
+        choices=range(0, 7),
+        default=None,
+        metavar="0-6",
+        help="Write elevations with this many decimals (3 = millimetres; default: shortest float repr).",
+    )
+    parser.add_argument(
+        "--time-milliseconds",
+        action="store_true",
+        help="Keep milliseconds in trackpoint times (2024-05-01T10:00:00.250Z); by default times are whole seconds.",
+    )
+    parser.add_argument(
+        "--format",
+        dest="output_format",
+        choices=tuple(OUTPUT_FORMATS),
+        default=None,
+        help="Output format: GPX, a GeoJSON FeatureCollection, newline-delimited GeoJSON points, or the trackpoints as typed columns (parquet/feather need pyarrow; default: from the --output suffix, else gpx).",
+    )
+    parser.add_argument(
+        "--geojson-geometry",
+        choices=GEOJSON_GEOMETRIES,
+        default="linestring",
+        help="GeoJSON track geometry: a LineString per segment with per-point times/extensions (default), or one MultiLineString.",
+    )
+    parser.add_argument(
+        "--dataset",
+        action="store_true",
+        help="With --batch-dir and --format parquet/feather/npz, write one dataset: --out-dir mirrors the batch directory, and the file column holds paths relative to it.",
+    )
+    parser.add_argument(
+        "--no-geoid",
+        dest="geoid",
+        action="store_false",
+        help="Skip EGM96 geoid correction and keep ellipsoidal (WGS84) elevations.",
+    )
+    parser.add_argument(
+        "--geoid-grid",
+        type=Path,
+        default=os.environ.get(GRID_ENV) or None,
+        help=f"Use a local memory-mapped EGM96 grid instead of pyproj (default ${GRID_ENV}).",
+    )
+    parser.add_argument(
+        "--build-geoid-grid",
+        type=Path,
+        default=None,
+        help="Write a local EGM96 grid for --geoid-grid (requires pyproj) and exit.",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        default=os.environ.get(CACHE_ENV) or None,
+        help=f"Cache decoded tracks in this directory and reuse them across runs (default ${CACHE_ENV}).",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=DEFAULT_MAX_BYTES >> 20,
+        help="Size bound of --cache-dir in MiB; least recently used entries are evicted (default %(default)s).",
+    )
     parser.add_argument(
         "-v",
         "--verbose",
@@ -96,9 +269,56 @@ def main() -> None:
         default=0,
         help="Increase status detail on stdout (repeat for more detail).",
     )
-    parser.set_defaults(aq_extensions=False)
+    parser.set_defaults(aq_extensions=False, geoid=True)
 
     args = parser.parse_args()
+    if args.simplify is not None and not args.simplify > 0:
+        parser.error("--simplify must be a positive distance in metres")
+    if args.output_format is None:
+        args.output_format = output_format(args.output) if args.output and not args.batch_dir else "gpx"
+    if args.accuracy_contours and args.output_format != "gpx":
+        parser.error("--accuracy-contours is only supported for GPX output")
+    if args.output_format in ("parquet", "feather") and not HAVE_PYARROW:
+        parser.error(f"{args.output_format} output requires pyarrow (--format npz needs no extra packages)")
+    if args.output_format in COLUMNAR_FORMATS and args.compress:
+        parser.error(f"--compress does not apply to {args.output_format} output")
+    if args.dataset and not (args.batch_dir and args.output_format in COLUMNAR_FORMATS):
+        parser.error("--dataset needs --batch-dir and --format parquet, feather or npz")
+    if args.build_geoid_grid:
+        try:
+            build_grid(str(args.build_geoid_grid))
+        except RuntimeError as exc:
+            raise SystemExit(str(exc))
+        print(f"Geoid grid written to {args.build_geoid_grid}", file=sys.stderr)
+        return
+    if args.geoid and args.geoid_grid:
+        # checked once here rather than failing every file of a batch
+        try:
+            get_grid(str(args.geoid_grid))
+        except (OSError, ValueError) as exc:
+            parser.error(f"--geoid-grid: {exc}")
+    if args.query_index:
+        from .trkindex import format_index_row, query_index
+
+        if not args.query_index.exists():
+            raise SystemExit(f"No index at {args.query_index}; create it with --batch-dir and --build-index")
+        try:
+            rows = query_index(
+                args.query_index,
+                version=args.trk_version,
+                since=args.since,
+                until=args.until,
+                min_length=args.min_length,
+                max_length=args.max_length,
+                min_gain=args.min_gain,
+                max_gain=args.max_gain,
+                bbox=args.bbox,
+            )
+        except ValueError as exc:
+            raise SystemExit(str(exc))
+        for row in rows[: args.limit]:
+            print(format_index_row(row))
+        return
     _require_input(args.input, args.batch_dir)
 
     # Batch workflow: scan versions and optionally convert all tracks.
@@ -108,7 +328,16 @@ def main() -> None:
             raise SystemExit(f"No .trk files found under {args.batch_dir}")
 
         print(f"Found {len(tracks)} TRK files under {args.batch_dir}")
-        batch_convert(
+        if args.build_index:
+            from .trkindex import build_index
+
+            try:
+                indexed, unchanged, removed = build_index(args.build_index, tracks, root=args.batch_dir)
+            except ValueError as exc:
+                raise SystemExit(str(exc))
+            print(f"Index {args.build_index}: {indexed} indexed, {unchanged} unchanged, {removed} removed")
+            return
+        failed = batch_convert(
             tracks=tracks,
             out_dir=args.out_dir,
             summary_only=args.summary_only,
@@ -117,37 +346,96 @@ def main() -> None:
             pretty=args.pretty,
             verbose=args.verbose,
             accuracy_contours=args.accuracy_contours,
+            contour_mode=args.contour_mode,
+            simplify=args.simplify,
+            simplify_method=args.simplify_method,
+            compress=args.compress,
+            compress_level=args.compress_level,
+            coordinate_digits=args.coordinate_digits,
+            elevation_digits=args.elevation_digits,
+            time_milliseconds=args.time_milliseconds,
+            output_format=args.output_format,
+            geojson_geometry=args.geojson_geometry,
+            dataset_root=args.batch_dir if args.dataset else None,
+            geoid=args.geoid,
+            geoid_grid=args.geoid_grid,
+            jobs=args.jobs,
+            incremental=args.incremental,
+            cache_dir=args.cache_dir,
+            cache_size=args.cache_size,
+            prune=args.prune,
         )
+        if failed:
+            raise SystemExit(f"{failed} conversion(s) failed")
         return
 
     if args.profile_out and args.batch_dir:
         raise SystemExit("--profile-out is only supported for single-file conversions.")
 
     # Single-file workflow (backwards compatible).
+    if args.summary_only and args.input.lower().endswith(".ldk"):
+        from .ldk import LDKArchive
+
+        try:
+            with LDKArchive.open(args.input) as archive:
+                for entry in archive.entries():
+                    print(f"{entry.path}\t{entry.type_name}\tuuid={entry.uuid:08X}\tsize={entry.size}")
+        except LDKFormatError as exc:
+            raise SystemExit(f"{args.input}: {exc}")
+        return
     if args.summary_only:
         version, header = read_header(Path(args.input))
-        if args.verbose > 0 and version and version <= 3:
-            from .ops import quick_stats_v3, format_summary_line
+        if args.verbose > 0 and version:
+            from .ops import quick_stats, format_summary_line
 
-            stats = quick_stats_v3(Path(args.input))
+            stats = quick_stats(Path(args.input))
             print(format_summary_line(Path(args.input), stats, args.verbose))
             return
         print(f"{args.input}\tversion={version}\theader={header}")
         return
 
     if args.output is None:
-        args.output = _default_output(args.input)
+        args.output = _default_output(args.input, args.compress, args.output_format)
 
-    run_kwargs = dict(include_extensions=args.aq_extensions, progress=args.progress, pretty=args.pretty, accuracy_contours=args.accuracy_contours)
+    run_kwargs = dict(
+        include_extensions=args.aq_extensions,
+        progress=args.progress,
+        pretty=args.pretty,
+        accuracy_contours=args.accuracy_contours,
+        contour_mode=args.contour_mode,
+        simplify=args.simplify,
+        simplify_method=args.simplify_method,
+        compress_level=args.compress_level,
+        coordinate_digits=args.coordinate_digits,
+        elevation_digits=args.elevation_digits,
+        time_milliseconds=args.time_milliseconds,
+        output_format=args.output_format,
+        geojson_geometry=args.geojson_geometry,
+        geoid=args.geoid,
+        geoid_grid=str(args.geoid_grid) if args.geoid_grid else None,
+        cache_dir=str(args.cache_dir) if args.cache_dir else None,
+        cache_max_bytes=args.cache_size << 20,
+        ldk_tracks=args.ldk_tracks,
+        jobs=args.jobs,
+    )
 
-    if args.profile_out:
-        args.profile_out.parent.mkdir(parents=True, exist_ok=True)
-        cProfile.runctx(
-            "alp2gpx(args.input, args.output, verbose=args.verbose, **run_kwargs)",
-            globals(),
-            locals(),
-            filename=str(args.profile_out),
-        )
-        print(f"Profile written to {args.profile_out}", file=sys.stderr)
-    else:
-        alp2gpx(args.input, args.output, verbose=args.verbose, **run_kwargs)
+    try:
+        if args.profile_out:
+            args.profile_out.parent.mkdir(parents=True, exist_ok=True)
+            profiler = cProfile.Profile()
+            result = profiler.runcall(alp2gpx, args.input, args.output, verbose=args.verbose, **run_kwargs)
+            profiler.dump_stats(str(args.profile_out))
+            print(f"Profile written to {args.profile_out}", file=sys.stderr)
+        else:
+            result = alp2gpx(args.input, args.output, verbose=args.verbose, **run_kwargs)
+    except StringDecodeError as exc:
+        raise SystemExit(str(exc))
+    except LDKFormatError as exc:
+        raise SystemExit(f"{args.input}: {exc}")
+
+    if result.failed_tracks:
+        raise SystemExit(f"{len(result.failed_tracks)} LDK track(s) failed")
+    if result.geoid_points:
+        print(f"Geoid correction took {result.geoid_seconds:.3f}s", file=sys.stderr)
+    elif result.geoid_skipped:
+        print("Geoid correction skipped: no EGM96 backend (install pyproj or pass --geoid-grid); elevations are ellipsoidal", file=sys.stderr)
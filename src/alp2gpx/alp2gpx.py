@@ -19,25 +19,96 @@ in Perl to Python.
 '''
 
 from struct import *
+from array import array
 from datetime import datetime
 import base64
-import xml.etree.ElementTree as ET
 import io
 import os
 import sys
-from typing import Optional
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from typing import List, Optional
 from math import isfinite
 
-from .trackpoint import AQ_NS, Segment, TrackPoint, decode_network, parse_satellites
-from .contours import build_accuracy_contours
+from .trackpoint import FIELDS, Segment, TrackPoint
+from .cache import DEFAULT_MAX_BYTES, TrackCache, track_key
+from .columnar import ColumnarWriter
+from .compression import compression_suffix
+from .contours import ContourBuilder
+from .geoid import correct_heights
+from .formats import COLUMNAR_FORMATS, OUTPUT_FORMATS, output_format as format_of
+from .geojson import GeoJSONWriter, NDJSONWriter
+from .gpxwriter import GPXWriter
+from .ldk import TRACK_TYPE, LDKArchive, LDKFormatError
+from .npdecode import HAVE_NUMPY, decode_v3_columns
+from .reader import INT, BufferReader
+from .simplify import Simplifier
+from .summary import stats_from_v4_summary
+from .timefmt import TimeFormatter
+from .v4decode import V4LocationDecoder
 
 PROJECT_LINK = "https://github.com/k127/alp2gpx"
 
+UTF8_REPLACEMENT = '\ufffd'.encode('utf-8')
+# fallback probe order for strings that are neither ASCII nor UTF-8
+CODECS = (
+        "big5", "big5hkscs", "cp037", "cp273", "cp424", "cp437", "cp500", "cp720", 
+        "cp737", "cp775", "cp850", "cp852", "cp855", "cp856", "cp857", "cp858", "cp860",
+        "cp861", "cp862", "cp863", "cp864", "cp865", "cp866", "cp869", "cp874", "cp875",
+        "cp932", "cp949", "cp950", "cp1006", "cp1026", "cp1125", "cp1140", "cp1250",
+        "cp1251", "cp1252", "cp1253", "cp1254", "cp1255", "cp1256", "cp1257",
+        "cp1258", "euc_jp", "euc_jis_2004", "euc_jisx0213", "euc_kr", "gb2312",
+        "gbk", "gb18030", "hz", "iso2022_jp", "iso2022_jp_1", "iso2022_jp_2",
+        "iso2022_jp_2004", "iso2022_jp_3", "iso2022_jp_ext", "iso2022_kr", "latin_1",
+        "iso8859_2", "iso8859_3", "iso8859_4", "iso8859_5", "iso8859_6", "iso8859_7",
+        "iso8859_8", "iso8859_9", "iso8859_10", "iso8859_11", "iso8859_13", "iso8859_14",
+        "iso8859_15", "iso8859_16", "johab", "koi8_r", "koi8_t", "koi8_u", "kz1048",
+        "mac_cyrillic", "mac_greek", "mac_iceland", "mac_latin2", "mac_roman",
+        "mac_turkish", "ptcp154", "shift_jis", "shift_jis_2004", "shift_jisx0213",
+        "utf_32", "utf_32_be", "utf_32_le", "utf_16", "utf_16_be", "utf_16_le", "utf_7",
+        "utf_8_sig",
+)
+
+
+class StringDecodeError(ValueError):
+    """Raised when a TRK string cannot be decoded with any known codec."""
+
+
+# size, longitude, latitude heading every location record
+LOCATION_HEAD = Struct('>lll')
+# height, timestamp of a version 2/3 location record
+LOCATION_V3 = Struct('>lq')
+# TrackPoint fields after lat, lon, elevation, timestamp, accuracy, vertical_accuracy, pressure
+V3_ROW_TAIL = (None,) * (len(FIELDS) - 7)
+# locations decoded, corrected and written per batch; bounds memory for long tracks
+CHUNK_POINTS = 65536
+# constructor options that apply to every track of an LDK archive, passed on to its workers
+TRACK_OPTIONS = (
+    "include_extensions",
+    "progress",
+    "progress_interval",
+    "verbose",
+    "pretty",
+    "accuracy_contours",
+    "contour_mode",
+    "simplify",
+    "simplify_method",
+    "compress_level",
+    "coordinate_digits",
+    "elevation_digits",
+    "time_milliseconds",
+    "output_format",
+    "geojson_geometry",
+    "geoid",
+    "geoid_grid",
+)
+
 class alp2gpx(object):
     inputfile, outputfile = None, None
     fname = None
     fileVersion, headerSize = None, None
-    metadata, waypoints, segments = None, None, None
+    metadata, waypoints, sumary = None, None, None
     include_extensions: bool = False
     progress: bool = False
     progress_interval: int = 200
@@ -45,9 +116,52 @@ class alp2gpx(object):
     pretty: bool = False
     verbose: int = 0
     accuracy_contours: bool = False
-
-    def __init__(self, inputfile, outputfile, include_extensions: bool = False, progress: bool = False, progress_interval: int = 200, pretty: bool = False, verbose: int = 0, accuracy_contours: bool = False):
-        self.inputfile = open(inputfile, "rb")
+    contour_mode: str = "spherical"
+    simplify: Optional[float] = None
+    simplify_method: str = "visvalingam"
+    removed_points: int = 0
+    compress_level: Optional[int] = None
+    coordinate_digits: Optional[int] = None
+    elevation_digits: Optional[int] = None
+    time_milliseconds: bool = False
+    output_format: str = "gpx"
+    geojson_geometry: str = "linestring"
+    source_name: Optional[str] = None
+    geoid: bool = True
+    geoid_grid: Optional[str] = None
+    geoid_seconds: float = 0.0
+    geoid_points: int = 0
+    geoid_skipped: int = 0
+
+    def __init__(
+        self,
+        inputfile,
+        outputfile,
+        include_extensions: bool = False,
+        progress: bool = False,
+        progress_interval: int = 200,
+        pretty: bool = False,
+        verbose: int = 0,
+        accuracy_contours: bool = False,
+        contour_mode: str = "spherical",
+        simplify: Optional[float] = None,
+        simplify_method: str = "visvalingam",
+        compress_level: Optional[int] = None,
+        coordinate_digits: Optional[int] = None,
+        elevation_digits: Optional[int] = None,
+        time_milliseconds: bool = False,
+        output_format: Optional[str] = None,
+        geojson_geometry: str = "linestring",
+        source_name: Optional[str] = None,
+        geoid: bool = True,
+        geoid_grid: Optional[str] = None,
+        cache_dir: Optional[str] = None,
+        cache_max_bytes: int = DEFAULT_MAX_BYTES,
+        ldk_tracks: Optional[List[str]] = None,
+        jobs: int = 1,
+        ldk_offset: Optional[int] = None,
+    ):
+        self.inputfile = BufferReader.open(inputfile)
         self.fname = inputfile
 
         self.outputfile = outputfile
@@ -57,8 +171,51 @@ class alp2gpx(object):
         self.pretty = pretty
         self.verbose = verbose
         self.accuracy_contours = accuracy_contours
-        self.accuracy_left = []
-        self.accuracy_right = []
+        self.contour_mode = contour_mode
+        # tolerance in metres of the simplification stage (None = keep every point)
+        self.simplify = simplify
+        self.simplify_method = simplify_method
+        self._simplifier = Simplifier(simplify, simplify_method) if simplify else None
+        self.removed_points = 0
+        # level for .gz/.bz2/.xz outputs (None = the format's default)
+        self.compress_level = compress_level
+        # fixed decimals of lat/lon and elevations (None = float repr, see gpxwriter)
+        self.coordinate_digits = coordinate_digits
+        self.elevation_digits = elevation_digits
+        self.time_milliseconds = time_milliseconds
+        # shared by the tracks and their contour copies, see timefmt
+        self._format_time = TimeFormatter(time_milliseconds)
+        # "gpx", "geojson" or "ndjson" (None = implied by the output name, see geojson.output_format)
+        self.output_format = output_format or format_of(outputfile)
+        if self.output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"unknown output format {self.output_format!r} (expected one of {', '.join(OUTPUT_FORMATS)})")
+        if accuracy_contours and self.output_format != "gpx":
+            raise ValueError("accuracy contours are only written to GPX output")
+        if self.output_format in COLUMNAR_FORMATS and compression_suffix(outputfile):
+            raise ValueError(f"{self.output_format} output is not compressed by file name")
+        self.geojson_geometry = geojson_geometry
+        # value of the file column of columnar outputs (default: the input path)
+        self.source_name = source_name or inputfile
+        self.geoid = geoid
+        self.geoid_grid = geoid_grid
+        self.geoid_seconds = 0.0
+        # elevations corrected, and left ellipsoidal because no EGM96 backend was available
+        self.geoid_points = 0
+        self.geoid_skipped = 0
+        self.segment_count = 0
+        self.point_count = 0
+        self._v4_decoder = V4LocationDecoder()
+        self._codec = None
+        self._cache = TrackCache(cache_dir, cache_max_bytes) if cache_dir else None
+        self.cache_hit = False
+        # paths or uuids of the LDK entries to convert (default: every track)
+        self.ldk_tracks = ldk_tracks
+        # LDK tracks converted concurrently (0 = one process per CPU)
+        self.jobs = jobs
+        self.ldk_offset = ldk_offset
+        self.outputs = [outputfile]
+        # LDK entries whose conversion failed (the other tracks are still converted)
+        self.failed_tracks: List[str] = []
 
         ext = os.path.splitext(inputfile)[1]
         if ext.lower() == '.trk':
@@ -70,52 +227,102 @@ class alp2gpx(object):
 
         self._print_status()
 
-    def _progress_tick(self):
+    def _progress_tick(self, count: int = 1):
         if not self.progress:
             return
-        self._progress_count += 1
-        if self._progress_count % self.progress_interval == 0:
+        before = self._progress_count // self.progress_interval
+        self._progress_count += count
+        if self._progress_count // self.progress_interval != before:
             print(f"… {self._progress_count} trackpoints", file=sys.stderr)
 
-    def _build_contours(self, segments):
-        self.accuracy_left = []
-        self.accuracy_right = []
-        for seg in segments:
-            left, right = build_accuracy_contours(seg.points)
-            self.accuracy_left.append(left)
-            self.accuracy_right.append(right)
+    def _correct_elevations(self, segment: Segment):
+        """Apply geoid correction to all points with an elevation in one batched transform."""
+        if not self.geoid:
+            return
+        elevation = segment.columns.get('elevation')
+        if elevation is None:
+            return
+        started = time.perf_counter()
+        lon, lat = segment.columns['lon'], segment.columns['lat']
+        mask = segment.valid['elevation']
+        if mask.find(0) == -1:
+            index = None
+            corrected = correct_heights(lon, lat, elevation, grid=self.geoid_grid)
+        else:
+            index = [i for i, ok in enumerate(mask) if ok]
+            corrected = correct_heights(
+                [lon[i] for i in index],
+                [lat[i] for i in index],
+                [elevation[i] for i in index],
+                grid=self.geoid_grid,
+            )
+        count = len(elevation) if index is None else len(index)
+        if corrected is None:
+            self.geoid_skipped += count
+        else:
+            self.geoid_points += count
+            if index is None:
+                elevation[:] = array('d', corrected)
+            else:
+                for i, value in zip(index, corrected):
+                    elevation[i] = value
+        self.geoid_seconds += time.perf_counter() - started
 
     def _print_status(self):
+        if self.fname.lower().endswith('.ldk') and self.ldk_offset is None:
+            # totals over the converted tracks; the header fields are per track
+            parts = [f"{self.fname}", f"ldk tracks={len(self.outputs)}"]
+            if self.verbose >= 1:
+                parts.append(f"loc={self.point_count}")
+                parts.append(f"seg={self.segment_count}")
+            if self.simplify:
+                parts.append(f"removed={self.removed_points}")
+            if self.failed_tracks:
+                parts.append(f"failed={len(self.failed_tracks)}")
+            print(" ".join(parts))
+            return
         parts = [f"{self.fname}", f"v{self.fileVersion}"]
+        if self.fileVersion is None or self.fileVersion <= 3:
+            stats = {
+                "loc": self.number_of_locations(),
+                "seg": self.number_of_segments(),
+                "wpt": self.number_of_waypoints(),
+                "length": self.total_track_length(),
+                "gain": self.total_track_elevation_gain(),
+                "duration": self.total_track_time(),
+            }
+        else:
+            # v4 keeps these in the summary metadata, not at fixed offsets
+            stats = stats_from_v4_summary(self.fileVersion, self.headerSize, self.sumary or {})
+            if stats["loc"] is None:
+                stats["loc"] = self.point_count
+            if stats["seg"] is None:
+                stats["seg"] = self.segment_count
+            if stats["wpt"] is None and self.waypoints is not None:
+                stats["wpt"] = len(self.waypoints)
         if self.verbose >= 1:
-            parts.append(f"loc={self.number_of_locations()}")
-            parts.append(f"seg={self.number_of_segments()}")
-            parts.append(f"wpt={self.number_of_waypoints()}")
+            parts.append(f"loc={stats['loc']}")
+            parts.append(f"seg={stats['seg']}")
+            parts.append(f"wpt={stats['wpt'] if stats['wpt'] is not None else '?'}")
         if self.verbose >= 2:
-            parts.append(f"len={self.total_track_length():.1f}m")
-            parts.append(f"gain={self.total_track_elevation_gain():.1f}m")
-            parts.append(f"duration={self.total_track_time()}s")
+            parts.append(f"len={stats['length']:.1f}m" if stats["length"] is not None else "len=?")
+            parts.append(f"gain={stats['gain']:.1f}m" if stats["gain"] is not None else "gain=?")
+            parts.append(f"duration={stats['duration']}s" if stats["duration"] is not None else "duration=?")
+        if self.simplify:
+            parts.append(f"removed={self.removed_points}/{self.point_count}")
         print(" ".join(parts))
         
     def _get_int(self):
-        result = self.inputfile.read(4)
-        return  unpack('>l', result)[0]
+        return self.inputfile.read_int()
     
     def _get_double(self):
-        result = self.inputfile.read(8)
-        return  unpack('>d', result)[0]
+        return self.inputfile.read_double()
     
     def _get_coordinate(self):
-        result = self._get_int() * 1e-7;
-        return result
-    
-    def _get_double(self):
-        result = self.inputfile.read(8)
-        return  unpack('>d', result)[0]
+        return self.inputfile.read_coordinate()
     
     def _get_long(self):
-        result = self.inputfile.read(8)
-        return  unpack('>q', result)[0]
+        return self.inputfile.read_long()
      
     def _get_timestamp(self):
         result = self._get_long() * 1e-3;
@@ -123,37 +330,30 @@ class alp2gpx(object):
     
 
     def _get_string(self, size):
-        res = None
         result = self.inputfile.read(size)
-     
-        codecs = [
-                'UTF-8', "ascii", "big5", "big5hkscs", "cp037", "cp273", "cp424", "cp437", "cp500", "cp720", 
-                "cp737", "cp775", "cp850", "cp852", "cp855", "cp856", "cp857", "cp858", "cp860",
-                "cp861", "cp862", "cp863", "cp864", "cp865", "cp866", "cp869", "cp874", "cp875",
-                "cp932", "cp949", "cp950", "cp1006", "cp1026", "cp1125", "cp1140", "cp1250",
-                "cp1251", "cp1252", "cp1253", "cp1254", "cp1255", "cp1256", "cp1257",
-                "cp1258", "cp65001", "euc_jp", "euc_jis_2004", "euc_jisx0213", "euc_kr", "gb2312",
-                "gbk", "gb18030", "hz", "iso2022_jp", "iso2022_jp_1", "iso2022_jp_2",
-                "iso2022_jp_2004", "iso2022_jp_3", "iso2022_jp_ext", "iso2022_kr", "latin_1",
-                "iso8859_2", "iso8859_3", "iso8859_4", "iso8859_5", "iso8859_6", "iso8859_7",
-                "iso8859_8", "iso8859_9", "iso8859_10", "iso8859_11", "iso8859_13", "iso8859_14",
-                "iso8859_15", "iso8859_16", "johab", "koi8_r", "koi8_t", "koi8_u", "kz1048",
-                "mac_cyrillic", "mac_greek", "mac_iceland", "mac_latin2", "mac_roman",
-                "mac_turkish", "ptcp154", "shift_jis", "shift_jis_2004", "shift_jisx0213",
-                "utf_32", "utf_32_be", "utf_32_le", "utf_16", "utf_16_be", "utf_16_le", "utf_7",
-                "utf_8", "utf_8_sig",
-        ]
-        for charset in codecs:
+        if result.isascii():
+            return result.decode('ascii')
+        # valid UTF-8 decodes without replacement characters other than encoded U+FFFD ones
+        res = result.decode('utf-8', 'replace')
+        if res.count('\ufffd') == result.count(UTF8_REPLACEMENT):
+            return res
+        return self._decode_fallback(result)
+
+    def _decode_fallback(self, result):
+        # legacy files: try the codec that worked earlier in this file, then probe the rest
+        if self._codec is not None:
+            try:
+                return result.decode(self._codec)
+            except (UnicodeDecodeError, LookupError):
+                pass
+        for charset in CODECS:
             try:
                 res = result.decode(charset)
-                break
-            except:
+            except (UnicodeDecodeError, LookupError):
                 continue
-        if res:
+            self._codec = charset
             return res
-        else:
-            print("die", self.fname, self.fileVersion)
-            exit()
+        raise StringDecodeError(f"{self.fname}: cannot decode string {result!r} (version {self.fileVersion})")
         
     def _get_raw(self, size):
         value = self.inputfile.read(size)
@@ -171,29 +371,16 @@ class alp2gpx(object):
         return unpack('c', result)[0]
     
     def _get_pointer(self):
-        result = self.inputfile.read(8)
-        return unpack('>Q', result)[0]
+        return self.inputfile.read_pointer()
     
     
-    def _get_height(self, lon, lat):
+    def _get_height(self):
+        # ellipsoidal height; geoid correction runs per segment in _correct_elevations
         result = self._get_int()
         if result ==  -999999999:
             return None
         else:
             result *= 1e-3
-        try:
-            from pyproj import CRS
-            from pyproj.transformer import TransformerGroup, Transformer
-            tg = TransformerGroup(4979, 5773)
-            tg.download_grids(verbose=True)
-            transformer_3d = Transformer.from_crs(
-                CRS("EPSG:4979").to_3d(),
-                CRS("EPSG:5773").to_3d(),
-                always_xy=True,
-            )
-            result = transformer_3d.transform(lon, lat, result)[2]
-        except Exception as e:
-            pass        
         return result
     
     def _get_accuracy(self):
@@ -226,132 +413,49 @@ class alp2gpx(object):
         return result
     
     def _get_location(self, segmentVersion):
-        size = self._get_int()
-        lon = self._get_coordinate()
-        lat = self._get_coordinate()
-
-
-        alt = None
-        ts = None
-        acc = None
-        bar = None
-        vertical_accuracy = None
-        sat_gps = sat_glo = sat_bds = sat_gal = None
-        battery = None
-        network_code = None
-        network_signal_raw = None
-        network_type = None
-        network_percent = None
-        network_dbm = None
-        inclination = None
-        magnetic_field = None
-        elevation_wgs84 = None
-        elevation_dem = None
+        return TrackPoint(*self._get_location_row(segmentVersion))
+
+    def _get_location_row(self, segmentVersion):
+        # location values in TrackPoint field order, as taken by Segment.append_row
+        reader = self.inputfile
+        if segmentVersion == 4:
+            # tagged record (e=elevation, t=timestamp, ...), see v4decode
+            row, reader.pos = self._v4_decoder.decode_row(reader.buf, reader.pos)
+            return row
+
+        buf, pos = reader.buf, reader.pos
+        size, lon, lat = LOCATION_HEAD.unpack_from(buf, pos)
+        lon *= 1e-7
+        lat *= 1e-7
+        pos += 12
 
         if segmentVersion <= 3:
-            alt = self._get_height(lon, lat)
-            ts = self._get_timestamp()
+            alt, ts = LOCATION_V3.unpack_from(buf, pos)
+            alt = None if alt == -999999999 else alt * 1e-3
+            ts *= 1e-3
+            pos += 12
 
             acc,bar = None, None
 
             if size > 20:
-                acc = self._get_accuracy()
+                acc = INT.unpack_from(buf, pos)[0]
+                pos += 4
             if size > 24:
-                bar = self._get_pressure()
-
-        elif segmentVersion == 4:
-            size = size - 8     # count used items
-            acc,bar = None, None
-            while size > 0:
-                # read name of data (e=elevation, ...)
-                name = self._get_string(1)
-
-                if name == "e":
-                    # elevation
-                    alt = self._get_height(lon, lat)
-                    size = size - 5
-                    #print("Altitude" , alt)
-                    continue
-                if name == "t":
-                    # timestamp
-                    ts = self._get_timestamp()
-                    size = size - 9
-                    #print("Time" , ts)
-                    continue
-                if name == "a":
-                    # accuracy
-                    acc = self._get_accuracy()
-                    size = size - 5
-                    #print("accuracy" , acc)
-                    continue
-                if name == "p":
-                    # pressure
-                    bar = self._get_pressure()
-                    size = size - 5
-                    #print("pressure" , bar)
-                    continue
-                if name == "n":
-                    #cell network info: cell type in byte 1 (generation in tens, protocol in units), signal strength inbyte 2 (from 1=BAD to 127=GOOD) (added in OM 3.8b / AQ 2.2.9b)
-                    ct = self.inputfile.read(2)
-                    network_code = ct[0] if len(ct) > 0 else None
-                    network_signal_raw = ct[1] if len(ct) > 1 else None
-                    network_type, network_percent, network_dbm = decode_network(network_code, network_signal_raw)
-                    size = size - 3
-                    continue
-                if name == "b":
-                    #battery level (0-100%) (added in OM 3.8b / AQ 2.2.9b)
-                    bt = self.inputfile.read(1)
-                    battery = int.from_bytes(bt, "big")
-                    size = size - 2
-                    continue
-                if name == "s":
-                    #satellites in use per constellation (UNKNOWN, GPS, SBAS, GLONASS, QZSS, BEIDOU, GALILEO, IRNSS) (added in OM 3.8b / AQ 2.2.9b)
-                    sat =  self.inputfile.read(8)
-                    sat_gps, sat_glo, sat_bds, sat_gal = parse_satellites(sat)
-                    size = size - 9
-                    continue
-                if name == "v":
-                    #vertical accuracy (meters*1e2) (added in OM 3.10b / AQ 2.3.2c)
-                    va = self._get_int()
-                    vertical_accuracy = va * 1e-2
-                    size = size - 5
-                    continue
-                else:
-                    # consume remaining payload to avoid infinite loops on unknown keys
-                    remaining = max(0, size - 1)
-                    if remaining:
-                        self.inputfile.read(remaining)
-                    size = 0
+                bar = INT.unpack_from(buf, pos)[0]
+                bar = None if bar == 999999999 else bar * 1e-3
+                pos += 4
+            reader.pos = pos
         else:
             print("Location format error")
             exit()
 
-        return TrackPoint(
-            lat=lat,
-            lon=lon,
-            elevation=alt,
-            timestamp=ts,
-            accuracy=acc,
-            pressure=bar,
-            vertical_accuracy=vertical_accuracy,
-            sat_gps=sat_gps,
-            sat_glo=sat_glo,
-            sat_bds=sat_bds,
-            sat_gal=sat_gal,
-            battery=battery,
-            network_type=network_type,
-            network_signal_percent=network_percent,
-            network_signal_dbm=network_dbm,
-            network_code=network_code,
-            network_signal_raw=network_signal_raw,
-            inclination=inclination,
-            magnetic_field=magnetic_field,
-            elevation_wgs84=elevation_wgs84,
-            elevation_dem=elevation_dem,
-        )
+        row = [lat, lon, alt, ts, acc, None, bar]
+        row.extend(V3_ROW_TAIL)
+        return row
     
     
     def _get_segment(self, segmentVersion):
+        # returns (meta, chunks); the chunks must be consumed before the next segment is read
         if segmentVersion < 3:
             self._get_int()
         meta = {}
@@ -365,23 +469,42 @@ class alp2gpx(object):
         
         nlocations = self._get_int()
         #print("Nb locations:" , nlocations)
-        result = []
-        for n in range(nlocations):
-            location = self._get_location(segmentVersion)
-            self._progress_tick()
-            result.append(location)
-        return Segment(meta=meta, points=result)
-            
+        return meta, self._get_segment_chunks(segmentVersion, meta, nlocations)
+
+    def _get_segment_chunks(self, segmentVersion, meta, nlocations):
+        # yield the locations as Segments of at most CHUNK_POINTS
+        reader = self.inputfile
+        progress = self.progress
+        remaining = nlocations
+        while remaining > 0:
+            count = min(remaining, CHUNK_POINTS)
+            if segmentVersion <= 3 and HAVE_NUMPY:
+                # vectorized decode of the whole block; same values as _get_location
+                columns, reader.pos = decode_v3_columns(reader.buf, reader.pos, count)
+                chunk = Segment.from_columns(meta, count, columns)
+                self._progress_tick(count)
+            else:
+                # decode straight into the columns, without a TrackPoint per location
+                chunk = Segment(meta=meta)
+                append_row = chunk.append_row
+                get_location_row = self._get_location_row
+                for n in range(count):
+                    append_row(get_location_row(segmentVersion))
+                    if progress:
+                        self._progress_tick()
+            remaining -= count
+            yield chunk
+
     def _get_segments(self, segmentVersion):
+        # yield (meta, chunks) per segment, see _get_segment
         num_segments = self._get_int()
 #       print("Nb segments:" , num_segments)
-        results = []
         for s in range(num_segments):
-            segment = self._get_segment(segmentVersion)
-            results.append(segment)
-        if self.accuracy_contours:
-            self._build_contours(results)
-        return results
+            meta, chunks = self._get_segment(segmentVersion)
+            yield meta, chunks
+            # skip whatever the consumer left unread to reach the next segment
+            for chunk in chunks:
+                pass
             
             
     def _get_waypoints(self):
@@ -393,118 +516,31 @@ class alp2gpx(object):
             location = self._get_location(self.fileVersion)
             result.append({'meta': meta, 'location': location})
         return result
+
+    def _correct_waypoints(self, waypoints):
+        locations = Segment(points=[wp['location'] for wp in waypoints])
+        self._correct_elevations(locations)
+        for wp, elevation in zip(waypoints, locations.column('elevation')):
+            wp['location'].elevation = elevation
+        return waypoints
+
+    def _process(self, segments):
+        # stages applied to decoded (or cached) segments before they are written
+        for meta, chunks in segments:
+            self.segment_count += 1
+            yield meta, self._process_chunks(chunks)
+
+    def _process_chunks(self, chunks):
+        simplifier = self._simplifier
+        for chunk in chunks:
+            self.point_count += len(chunk)
+            if simplifier is not None:
+                # before the geoid stage, which then only corrects the kept points
+                chunk = simplifier(chunk)
+                self.removed_points = simplifier.removed
+            self._correct_elevations(chunk)
+            yield chunk
         
-    def _get_additional_data(self, offset):
-        data = ''
-        magic_number = self._get_int()   
-        size = self._get_long()
-        add_offset = self._get_pointer()
-        add_data = self._get_raw(size)
-        data += add_data
-        if add_offset:
-            moreData = self._get_additional_data(add_offset)
-            data += moreData
-        return(data)
-            
-    def _get_node_data(self, node):
-        data = ''
-        self.inputfile.seek(node['offset'])
-        magic_number = self._get_int()   
-        flags = self._get_int()
-        total_size = self._get_long()
-        size = self._get_long()        
-        add_offset = self._get_pointer()    
-        data += self._get_raw(size)
-        
-        if add_offset:
-            data += self._get_additional_data(add_offset)
-        
-        return data
-        
-    def _get_node(self, offset, path=None, uuid=None):
-        # {Node}
-        # - int magic number of the node (0x00015555)
-        # - int flags
-        # - pointer {Metadata} position of node metadata
-        # - double reserved
-        # - {NodeEntries} entries of the nod
-        
-        self.inputfile.seek(offset)
-        magig_number_of_the_node = self._get_int()
-        flags  = self._get_int()
-        metadata_pointer = self._get_pointer()
-        node_entries = self._get_long()
-        
-        self.inputfile.seek(metadata_pointer+0x20)
-        metadata = self._get_metadata(2)
-        self.inputfile.seek(node_entries)
-         
-        if path and not uuid:
-            path = '/'
-        elif uuid:
-            if metadata.get('name', ''):
-                path = metadata.get('name')+'/'
-            else:
-                path = '%08X' % uuid
-      
-        node_entries_magic = self._get_int()
-        
-        if node_entries_magic == 0x00025555:
-            n_total = self._get_int()
-            n_child = self._get_int()
-            n_data = self._get_int()
-            add_offset = self._get_pointer()
-            n_empty = n_total - n_child - n_data;
-        elif node_entries_magic == 0x00045555:
-            n_child = self._get_int()
-            n_data = self._get_int()
-            n_empty = 0
-        else:
-            return None
-        
-        child_entries = []
-        for child in range(n_child):
-            offset = self._get_pointer()
-            uuid = self._get_int()
-            child_entries.append({'uuid': uuid, 'offset':offset})
-            
-            
-        self.inputfile.seek(self.inputfile.tell() + n_empty * (8+4))
-        data_entries = []
-        for x in range(n_data):
-            offset = self._get_pointer()
-            uuid = self._get_int()
-            data_entries.append({'offset': offset, 'uuid': uuid, 'path': path})
-            
-        node = []
-        for entry in child_entries:
-            child = self._get_node(entry['offset'], path, entry['uuid']);
-            node.append(child)
-
-        for entry in data_entries:
-            data = self._get_node_data(entry)
-            file_type = unpack('i', data[:4])[0]
-            file_data = data[1:]
-            
-            '''
-            FOR FUTURE REFERENCE
-            type_map = ({'101': 'wpt', '102': 'set', '103':  'rte', '104': 'trk', '105':  'are' });
-            type_str = type_map[file_type]
-            '''
-            
-            if file_type == 104:
-                bytes = io.BytesIO(file_data)
-                self.inputfile = bytes
-                self.inputfile.seek(0)
-                self.parse_trk()
-            else:
-                '''
-                NOT SUPPORTED FILE TYPE
-                FOR NOW
-                '''
-                pass
-              
-            
     def total_track_time(self):
         self.inputfile.seek(60)
         result = self._get_long()
@@ -568,62 +604,36 @@ class alp2gpx(object):
         header_size  = self._get_int()          
         return (file_version, header_size);
 
-    def _format_time(self, timestamp: Optional[float]) -> Optional[str]:
-        if timestamp is None:
-            return None
-        try:
-            d = datetime.utcfromtimestamp(timestamp)
-        except (OSError, OverflowError, TypeError, ValueError):
-            return None
-        return d.strftime("%Y-%m-%dT%H:%M:%SZ")
+    def _track_name(self):
+        # "<first location time> <metadata name>", the name of the written tracks
+        # the header accessors seek, and the segments are still being read from the input
+        pos = self.inputfile.tell()
+        tsdebut = self.time_of_first_location()
+        self.inputfile.seek(pos)
+        if not self.metadata.get('name'):
+            name = tsdebut.strftime("%Y-%m-%d %H:%M:%S")
+            filename = tsdebut.strftime("%y-%m-%d")
+        else:
+            name = tsdebut.strftime("%Y-%m-%d %H:%M:%S") + ' ' + self.metadata.get('name')
+            filename = tsdebut.strftime("%y-%m-%d") + ' ' + self.metadata.get('name')
 
-    def _build_extensions(self, trkpoint: TrackPoint):
-        if not self.include_extensions or not trkpoint.has_extensions():
-            return None
+            # suppress characters not permitted in filename
+            for i in [';', ':', '!', "*", '/', '\\', '.', ','] :
+                filename = filename.replace(i, '-')
+
+            # suppress trailing space
+            filename = filename.strip()
+        return name
 
-        extensions = ET.Element('extensions')
-
-        if trkpoint.accuracy is not None:
-            ET.SubElement(extensions, f"{{{AQ_NS}}}accuracy").text = f"{trkpoint.accuracy}"
-        if trkpoint.vertical_accuracy is not None:
-            ET.SubElement(extensions, f"{{{AQ_NS}}}accuracyVertical").text = f"{trkpoint.vertical_accuracy}"
-        if trkpoint.pressure is not None:
-            ET.SubElement(extensions, f"{{{AQ_NS}}}pressure").text = f"{trkpoint.pressure}"
-        if trkpoint.battery is not None:
-            ET.SubElement(extensions, f"{{{AQ_NS}}}battery").text = f"{trkpoint.battery}"
-        if trkpoint.elevation_wgs84 is not None:
-            ET.SubElement(extensions, f"{{{AQ_NS}}}elevationWgs84").text = f"{trkpoint.elevation_wgs84}"
-        if trkpoint.elevation_dem is not None:
-            ET.SubElement(extensions, f"{{{AQ_NS}}}elevationDem").text = f"{trkpoint.elevation_dem}"
-
-        if any(v is not None for v in [trkpoint.sat_gps, trkpoint.sat_glo, trkpoint.sat_bds, trkpoint.sat_gal]):
-            satellites = ET.SubElement(extensions, f"{{{AQ_NS}}}satellites")
-            if trkpoint.sat_gps is not None:
-                ET.SubElement(satellites, f"{{{AQ_NS}}}gps").text = f"{trkpoint.sat_gps}"
-            if trkpoint.sat_glo is not None:
-                ET.SubElement(satellites, f"{{{AQ_NS}}}glo").text = f"{trkpoint.sat_glo}"
-            if trkpoint.sat_bds is not None:
-                ET.SubElement(satellites, f"{{{AQ_NS}}}bds").text = f"{trkpoint.sat_bds}"
-            if trkpoint.sat_gal is not None:
-                ET.SubElement(satellites, f"{{{AQ_NS}}}gal").text = f"{trkpoint.sat_gal}"
-
-        if any(v is not None for v in [trkpoint.network_type, trkpoint.network_signal_percent, trkpoint.network_signal_dbm]):
-            network = ET.SubElement(extensions, f"{{{AQ_NS}}}network")
-            if trkpoint.network_signal_percent is not None:
-                ET.SubElement(network, f"{{{AQ_NS}}}signalPercent").text = f"{trkpoint.network_signal_percent}"
-            if trkpoint.network_signal_dbm is not None:
-                ET.SubElement(network, f"{{{AQ_NS}}}signalDbm").text = f"{trkpoint.network_signal_dbm}"
-            if trkpoint.network_type is not None:
-                ET.SubElement(network, f"{{{AQ_NS}}}type").text = trkpoint.network_type
-
-        if trkpoint.inclination is not None:
-            ET.SubElement(extensions, f"{{{AQ_NS}}}inclination").text = f"{trkpoint.inclination}"
-        if trkpoint.magnetic_field is not None:
-            ET.SubElement(extensions, f"{{{AQ_NS}}}magneticField").text = f"{trkpoint.magnetic_field}"
-
-        return extensions if len(extensions) else None
-
-    def write_xml(self):
+    def _write_output(self, segments):
+        if self.output_format == "gpx":
+            self.write_xml(segments)
+        elif self.output_format in COLUMNAR_FORMATS:
+            self.write_columns(segments)
+        else:
+            self.write_geojson(segments)
+
+    def write_xml(self, segments):
         '''
         <?xml version="1.0" encoding="UTF-8"?>
         <gpx version="1.0">
@@ -647,93 +657,73 @@ class alp2gpx(object):
             </trkseg></trk>
         </gpx>
         '''
-        tsdebut = self.time_of_first_location()
-        if not self.metadata.get('name'):
-            name = tsdebut.strftime("%Y-%m-%d %H:%M:%S")
-            filename = tsdebut.strftime("%y-%m-%d")
-        else:
-            name = tsdebut.strftime("%Y-%m-%d %H:%M:%S") + ' ' + self.metadata.get('name')
-            filename = tsdebut.strftime("%y-%m-%d") + ' ' + self.metadata.get('name')
-
-            # suppress characters not permitted in filename
-            for i in [';', ':', '!', "*", '/', '\\', '.', ','] :
-                filename = filename.replace(i, '-')
-
-            # suppress trailing space
-            filename = filename.strip()
-            
+        name = self._track_name()
         # print('Name:', name)
         
-        attrs = {"xmlns": "http://www.topografix.com/GPX/1/1", "version": "1.1", "creator": "Alp2gpx"}
-        if self.include_extensions:
-            ET.register_namespace("aq", AQ_NS)
-
-        root = ET.Element('gpx', attrs)
-        tree = ET.ElementTree(root)
-        metadata = ET.SubElement(root, 'metadata')
-        desc = ET.SubElement(metadata, 'desc')
-        desc.text = name
-        link = ET.SubElement(metadata, 'link', href=PROJECT_LINK)
-
-        for wp in self.waypoints:
-            loc: TrackPoint = wp['location']
-            wpt = ET.SubElement(root, 'wpt', lat=f"{loc.lat}", lon=f"{loc.lon}")
-            if loc.elevation is not None:
-                node = ET.SubElement(wpt, 'ele')
-                node.text = f"{loc.elevation}"
-            node = ET.SubElement(wpt, 'name')
-            node.text = wp['meta']['name']
-            
-        for s in self.segments:
-            trk = ET.SubElement(root, 'trk')
-            tname = ET.SubElement(trk, 'name')
-            tname.text = name
-
-            trkseg = ET.SubElement(trk, 'trkseg')
-            if self.include_extensions and s.meta:
-                seg_ext = ET.SubElement(trkseg, 'extensions')
-                seg_meta = ET.SubElement(seg_ext, f"{{{AQ_NS}}}segmentMeta")
-                for key, value in s.meta.items():
-                    item = ET.SubElement(seg_meta, f"{{{AQ_NS}}}item", name=str(key))
-                    item.text = f"{value}"
-
-            for p in s.points:
-                trkpt = ET.SubElement(trkseg, 'trkpt', lat=f"{p.lat}", lon=f"{p.lon}")
-                if p.elevation is not None:
-                    node = ET.SubElement(trkpt, 'ele')
-                    node.text = f"{p.elevation}"
-                time_str = self._format_time(p.timestamp)
-                if time_str:
-                    node = ET.SubElement(trkpt, 'time')
-                    node.text = time_str
-                extensions = self._build_extensions(p)
-                if extensions is not None:
-                    trkpt.append(extensions)
-
-        if self.accuracy_contours and self.accuracy_left and self.accuracy_right:
-            for label, segments in (("accuracy-left", self.accuracy_left), ("accuracy-right", self.accuracy_right)):
-                trk = ET.SubElement(root, 'trk')
-                tname = ET.SubElement(trk, 'name')
-                tname.text = f"{name} ({label})"
-                for seg_pts in segments:
-                    trkseg = ET.SubElement(trk, 'trkseg')
-                    for p in seg_pts:
-                        trkpt = ET.SubElement(trkseg, 'trkpt', lat=f"{p.lat}", lon=f"{p.lon}")
-                        if p.elevation is not None:
-                            node = ET.SubElement(trkpt, 'ele')
-                            node.text = f"{p.elevation}"
-                        time_str = self._format_time(p.timestamp)
-                        if time_str:
-                            node = ET.SubElement(trkpt, 'time')
-                            node.text = time_str
-                
-        if self.pretty:
-            try:
-                ET.indent(tree, space="  ", level=0)
-            except AttributeError:
-                pass
-
-        tree.write(self.outputfile, encoding='utf-8', xml_declaration=True)
+        extensions = self.include_extensions
+        # the aq: declaration is settled once all segments are written, see GPXWriter
+        with GPXWriter(self.outputfile, pretty=self.pretty, aq_namespace=None if extensions else False, format_time=self._format_time, compress_level=self.compress_level, coordinate_digits=self.coordinate_digits, elevation_digits=self.elevation_digits) as gpx:
+            gpx.write_metadata(name, PROJECT_LINK)
+
+            for wp in self.waypoints:
+                gpx.write_waypoint(wp['location'], wp['meta']['name'])
+
+            # accuracy contours follow the tracks, so they are spooled to temporary files meanwhile
+            spools = (gpx.spool(), gpx.spool()) if self.accuracy_contours else ()
+            written = 0
+            for meta, chunks in segments:
+                written += 1
+                gpx.begin_track(name)
+                gpx.begin_segment(meta if extensions else None)
+                if spools:
+                    contours = ContourBuilder(self.contour_mode)
+                    for spool in spools:
+                        spool.begin_segment()
+                for chunk in chunks:
+                    gpx.write_points(chunk, extensions=extensions)
+                    if spools:
+                        for spool, contour in zip(spools, contours.feed(chunk)):
+                            spool.write_points(contour)
+                if spools:
+                    for spool, contour in zip(spools, contours.finish()):
+                        spool.write_points(contour)
+                        spool.end_segment()
+                gpx.end_segment()
+                gpx.end_track()
+
+            for label, spool in zip(("accuracy-left", "accuracy-right"), spools):
+                if written:
+                    gpx.write_spooled_track(f"{name} ({label})", spool)
+                else:
+                    spool.close()
+
+    def write_geojson(self, segments):
+        '''Write the waypoints and segments as GeoJSON (output_format "geojson") or NDJSON ("ndjson"), see geojson.py.'''
+        name = self._track_name()
+        extensions = self.include_extensions
+        options = dict(format_time=self._format_time, compress_level=self.compress_level, coordinate_digits=self.coordinate_digits, elevation_digits=self.elevation_digits)
+        if self.output_format == "ndjson":
+            writer = NDJSONWriter(self.outputfile, **options)
+        else:
+            writer = GeoJSONWriter(self.outputfile, geometry=self.geojson_geometry, **options)
+        with writer as out:
+            for wp in self.waypoints:
+                out.write_waypoint(wp['location'], wp['meta']['name'])
+            out.begin_track(name)
+            for meta, chunks in segments:
+                out.begin_segment(meta if extensions else None)
+                for chunk in chunks:
+                    out.write_points(chunk, extensions=extensions)
+                out.end_segment()
+            out.end_track()
+
+    def write_columns(self, segments):
+        '''Write the trackpoints as typed columns (output_format "parquet", "feather" or "npz"), see columnar.py.'''
+        with ColumnarWriter(self.outputfile, self.output_format, self.source_name) as out:
+            for meta, chunks in segments:
+                out.begin_segment()
+                for chunk in chunks:
+                    out.write_points(chunk)
         
         
     def parse_trk(self):
@@ -781,15 +771,27 @@ class alp2gpx(object):
         total_track_time = self.total_track_time()
         '''
         
+        self._codec = None
+        key = None
+        if self._cache is not None:
+            key = track_key(self.inputfile.buf)
+            cached = self._cache.load(key)
+            if cached is not None:
+                # decoded earlier: only the conversion stages run
+                self.cache_hit = True
+                self.fileVersion, self.headerSize = cached.file_version, cached.header_size
+                self.metadata, self.sumary = cached.metadata, cached.sumary
+                self.waypoints = self._correct_waypoints(cached.waypoints)
+                self._write_output(self._process(cached.segments()))
+                return
+
         (self.fileVersion, self.headerSize)= self.check_version()    
 #         print("Version:", self.fileVersion)
         
         if self.fileVersion <= 3:
             self.inputfile.seek(self.headerSize+8)
             self.metadata = self._get_metadata(self.fileVersion)
-            self.waypoints = self._get_waypoints()
-            self.segments = self._get_segments(self.fileVersion)
-            self.write_xml()
+            waypoints = self._get_waypoints()
         else:            
             # read sumary data
             self.inputfile.seek(8)
@@ -809,31 +811,106 @@ class alp2gpx(object):
             x2 = self._get_int()  
 
             # read waypoints (not tested with waypoints in file)
-            self.waypoints = self._get_waypoints()
-
-            # read track
-            self.segments = self._get_segments(self.fileVersion)
-            
-            self.write_xml()
+            waypoints = self._get_waypoints()
+
+        # read track
+        segments = self._get_segments(self.fileVersion)
+        if key is not None:
+            # store the decoder output, before any conversion stage touches it
+            segments = self._cache.writer(key, self.fileVersion, self.headerSize, self.metadata, self.sumary, waypoints).tee(segments)
+        self.waypoints = self._correct_waypoints(waypoints)
+        self._write_output(self._process(segments))
         #self.inputfile.seek(0)
    
     
     def parse_ldk(self):
-        # - int       application specific magic number
-        # - int       archive version
-        # - pointer   {Node} position of the root node (always with list entries)
-        # - double    reserved
-        # - double    reserved
-        # - double    reserved
-        # - double    reserved            
-        self.inputfile.seek(0)
-        application_specific_magic_number = self._get_int()
-        archive_version = self._get_int()
-        position_of_the_root_node = self._get_pointer()
-        res1, res2, res3, res4 = self._get_double(), self._get_double(), self._get_double(), self._get_double()
-        
-        root_node = self._get_node(position_of_the_root_node)
-        
-        pass
-        
-
+        # the archive index reads only the node tables, see ldk.py
+        archive = LDKArchive(self.inputfile.buf)
+        if self.ldk_offset is not None:
+            # one track of a parallel conversion, see _convert_ldk_entry
+            self.inputfile = BufferReader(archive.read(archive.entry_at(self.ldk_offset)))
+            self.parse_trk()
+            return
+        if self.ldk_tracks:
+            entries = []
+            for key in self.ldk_tracks:
+                try:
+                    entries.append(archive.find(key))
+                except KeyError:
+                    raise LDKFormatError(f"no entry {key} in the archive")
+        else:
+            entries = archive.tracks()
+        for entry in entries:
+            if entry.type != TRACK_TYPE:
+                raise LDKFormatError(f"{entry.path} is a {entry.type_name} entry, not a track")
+
+        # one output per track, in a directory named after the output file; in its format and compressed like it
+        suffix = compression_suffix(self.outputfile)
+        base = self.outputfile[:len(self.outputfile) - len(suffix)]
+        unreadable = set()
+
+        def metadata_failed(entry, exc):
+            # a track whose header cannot be read is reported now and not converted
+            self._track_failed(entry, exc)
+            unreadable.add(entry.offset)
+
+        paths = archive.output_paths(entries, os.path.splitext(base)[0], OUTPUT_FORMATS[self.output_format], on_error=metadata_failed)
+        self.outputs = [path + suffix for path in paths]
+        pending = [i for i, entry in enumerate(entries) if entry.offset not in unreadable]
+        for i in pending:
+            os.makedirs(os.path.dirname(self.outputs[i]), exist_ok=True)
+        # the file column of an LDK track names the archive and the entry
+        source = self.source_name
+        self.sources = [source + entry.path for entry in entries]
+        jobs = self.jobs or os.cpu_count() or 1
+        if jobs > 1 and len(pending) > 1:
+            self._convert_ldk_parallel(entries, pending, jobs)
+            return
+        for i in pending:
+            entry, output, source = entries[i], self.outputs[i], self.sources[i]
+            self.inputfile = BufferReader(archive.read(entry))
+            self.outputfile = output
+            self.source_name = source
+            self.sumary = None
+            try:
+                self.parse_trk()
+            except Exception as exc:
+                self._track_failed(entry, exc)
+
+    def _track_failed(self, entry, exc: Exception):
+        # one broken LDK track is reported, like a failed file of a batch, and the others still converted
+        print(f"     !! {self.fname}{entry.path}: {type(exc).__name__}: {exc}")
+        self.failed_tracks.append(entry.path)
+
+    def _track_options(self) -> dict:
+        # keyword arguments that convert one track of this archive the way this conversion would
+        options = {name: getattr(self, name) for name in TRACK_OPTIONS}
+        options["cache_dir"] = self._cache.directory if self._cache else None
+        options["cache_max_bytes"] = self._cache.max_bytes if self._cache else DEFAULT_MAX_BYTES
+        return options
+
+    def _convert_ldk_parallel(self, entries, pending: List[int], jobs: int):
+        options = self._track_options()
+        # largest tracks first so the longest conversions do not end up last on a single worker
+        order = sorted(pending, key=lambda i: entries[i].size, reverse=True)
+        with ProcessPoolExecutor(max_workers=min(jobs, len(pending))) as pool:
+            futures = [(i, pool.submit(_convert_ldk_entry, self.fname, entries[i].offset, self.outputs[i], dict(options, source_name=self.sources[i]))) for i in order]
+            for i, future in futures:
+                try:
+                    geoid_seconds, geoid_points, geoid_skipped, segment_count, point_count, removed_points = future.result()
+                except Exception as exc:
+                    self._track_failed(entries[i], exc)
+                    continue
+                self.geoid_seconds += geoid_seconds
+                self.geoid_points += geoid_points
+                self.geoid_skipped += geoid_skipped
+                self.segment_count += segment_count
+                self.point_count += point_count
+                self.removed_points += removed_points
+
+
+def _convert_ldk_entry(inputfile, offset: int, outputfile, options: dict):
+    # worker of alp2gpx._convert_ldk_parallel; the status line is left to the parent (progress goes to stderr)
+    with redirect_stdout(io.StringIO()):
+        result = alp2gpx(inputfile, outputfile, ldk_offset=offset, **options)
+    return result.geoid_seconds, result.geoid_points, result.geoid_skipped, result.segment_count, result.point_count, result.removed_points
@@ -0,0 +1,221 @@
+"""On-disk cache of decoded TRK tracks.
+
+Entries are keyed by the BLAKE2b hash of the TRK bytes and PARSER_VERSION, and
+hold the parser output before any conversion option is applied (geoid
+correction, contours, extensions and formatting all run on top of it), so one
+entry serves every flag combination.
+
+An entry stores the segment chunks column by column as raw ``array`` memory,
+followed by a JSON footer with the header fields, metadata, waypoints and the
+offset of every column::
+
+    magic | chunk columns ... | footer JSON | footer offset (u64 LE) | magic
+
+Loading maps the file and rebuilds one chunk at a time from slices of the
+mapping, so a hit needs no more memory than a fresh decode. Recency is kept in
+the file mtimes; after each store the oldest entries are evicted until the
+directory fits ``max_bytes``.
+"""
+
+from __future__ import annotations
+
+import base64
+import hashlib
+import json
+import mmap
+import os
+import sys
+from struct import Struct, error as StructError
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .trackpoint import COLUMN_TYPES, FIELDS, Segment, TrackPoint
+
+CACHE_ENV = "ALP2GPX_CACHE_DIR"
+# bump whenever the decoders produce different values for the same file
+PARSER_VERSION = 1
+DEFAULT_MAX_BYTES = 2 << 30
+MAGIC = b"ALPTRKC1"
+_TRAILER = Struct("<Q8s")
+SUFFIX = ".trkc"
+
+
+def track_key(buffer) -> str:
+    """Cache key of a TRK file given its bytes (any buffer)."""
+    return f"{hashlib.blake2b(buffer, digest_size=20).hexdigest()}-v{PARSER_VERSION}"
+
+
+def _encode(value):
+    # metadata values are str, int, float or bytes (booleans and raw blobs)
+    if isinstance(value, bytes):
+        return {"__bytes__": base64.b64encode(value).decode("ascii")}
+    raise TypeError(f"cannot cache {type(value).__name__}")
+
+
+def _decode(obj):
+    if len(obj) == 1 and "__bytes__" in obj:
+        return base64.b64decode(obj["__bytes__"])
+    return obj
+
+
+class CachedTrack:
+    """A cache hit: header fields plus a (meta, chunks) segment stream like alp2gpx._get_segments."""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        mm = self._mm
+        offset, magic = _TRAILER.unpack_from(mm, len(mm) - _TRAILER.size)
+        if mm[:len(MAGIC)] != MAGIC or magic != MAGIC:
+            raise ValueError(f"{path}: not a track cache entry")
+        info = json.loads(mm[offset:len(mm) - _TRAILER.size].decode("utf-8"), object_hook=_decode)
+        if info["byteorder"] != sys.byteorder:
+            raise ValueError(f"{path}: written on a {info['byteorder']}-endian machine")
+        self.file_version: int = info["file_version"]
+        self.header_size: int = info["header_size"]
+        self.metadata: dict = info["metadata"]
+        self.sumary: Optional[dict] = info["sumary"]
+        self.waypoints = [{"meta": wp["meta"], "location": TrackPoint(*wp["location"])} for wp in info["waypoints"]]
+        self._segments = info["segments"]
+
+    def segments(self) -> Iterator[Tuple[dict, Iterator[Segment]]]:
+        for segment in self._segments:
+            yield segment["meta"], self._chunks(segment["meta"], segment["chunks"])
+
+    def _chunks(self, meta: dict, chunks: List[dict]) -> Iterator[Segment]:
+        view = memoryview(self._mm)
+        for chunk in chunks:
+            columns = {}
+            for name, (offset, size, mask_offset, mask_size) in chunk["columns"].items():
+                data = view[offset:offset + size]
+                if COLUMN_TYPES[name] is None:
+                    values = json.loads(data.tobytes().decode("utf-8"))
+                else:
+                    values = data
+                mask = None if mask_offset is None else view[mask_offset:mask_offset + mask_size]
+                columns[name] = (values, mask)
+            yield Segment.from_columns(meta, chunk["count"], columns)
+
+
+class CacheWriter:
+    """Write one entry while the track is decoded; commit() publishes it atomically.
+
+    The temporary file is only created once tee() is iterated, so a conversion
+    that fails before reading any segment leaves nothing behind.
+    """
+
+    def __init__(self, cache: "TrackCache", key: str, file_version: int, header_size: int, metadata: dict, sumary: Optional[dict], waypoints: List[dict]):
+        self._cache = cache
+        self._path = cache.entry_path(key)
+        self._tmp = f"{self._path}.{os.getpid()}.tmp"
+        self._file = None
+        self._info = {
+            "byteorder": sys.byteorder,
+            "file_version": file_version,
+            "header_size": header_size,
+            "metadata": metadata,
+            "sumary": sumary,
+            # copied now: the geoid stage corrects the waypoint elevations in place later
+            "waypoints": [{"meta": wp["meta"], "location": [getattr(wp["location"], name) for name in FIELDS]} for wp in waypoints],
+            "segments": [],
+        }
+
+    def _blob(self, data: bytes) -> Tuple[int, int]:
+        offset = self._file.tell()
+        self._file.write(data)
+        return offset, len(data)
+
+    def tee(self, segments):
+        """Pass (meta, chunks) through unchanged, storing every chunk; commits once all are consumed."""
+        try:
+            self._file = open(self._tmp, "wb")
+            self._file.write(MAGIC)
+            for meta, chunks in segments:
+                chunk_index: List[dict] = []
+                self._info["segments"].append({"meta": meta, "chunks": chunk_index})
+                yield meta, self._tee_chunks(chunks, chunk_index)
+            self.commit()
+        finally:
+            self.abort()
+
+    def _tee_chunks(self, chunks, chunk_index: List[dict]):
+        for chunk in chunks:
+            columns: Dict[str, list] = {}
+            for name, column in chunk.columns.items():
+                if COLUMN_TYPES[name] is None:
+                    offset, size = self._blob(json.dumps(column).encode("utf-8"))
+                else:
+                    offset, size = self._blob(column.tobytes())
+                mask = chunk.valid.get(name)
+                mask_offset, mask_size = self._blob(bytes(mask)) if mask is not None else (None, None)
+                columns[name] = [offset, size, mask_offset, mask_size]
+            chunk_index.append({"count": len(chunk), "columns": columns})
+            yield chunk
+
+    def commit(self) -> None:
+        offset = self._file.tell()
+        self._file.write(json.dumps(self._info, default=_encode).encode("utf-8"))
+        self._file.write(_TRAILER.pack(offset, MAGIC))
+        self._file.close()
+        os.replace(self._tmp, self._path)
+        self._cache.evict()
+
+    def abort(self) -> None:
+        if self._file is None:
+            return
+        if not self._file.closed:
+            self._file.close()
+        if os.path.exists(self._tmp):
+            os.remove(self._tmp)
+
+
+class TrackCache:
+    """Directory of cache entries with size-bounded LRU eviction."""
+
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def entry_path(self, key: str) -> str:
+        return os.path.join(self.directory, key + SUFFIX)
+
+    def load(self, key: str) -> Optional[CachedTrack]:
+        """Return the entry for key (marking it recently used), or None."""
+        path = self.entry_path(key)
+        try:
+            track = CachedTrack(path)
+        except (OSError, ValueError, KeyError, StructError):
+            # missing, truncated or from another parser layout: decode afresh
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return track
+
+    def writer(self, key: str, file_version: int, header_size: int, metadata: dict, sumary: Optional[dict], waypoints: List[dict]) -> CacheWriter:
+        return CacheWriter(self, key, file_version, header_size, metadata, sumary, waypoints)
+
+    def evict(self) -> None:
+        """Delete least recently used entries until the directory fits max_bytes."""
+        entries = []
+        total = 0
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if not entry.name.endswith(SUFFIX):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+                total += stat.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
@@ -0,0 +1,266 @@
+"""Columnar export of trackpoints for analytics: Parquet, Feather (Arrow IPC) or .npz.
+
+One row per written trackpoint (after simplification and geoid correction).
+The columns are ``file`` (the source track), ``segment`` (its index in the
+track) and ``point_index`` (the point's index in the segment), then every
+TrackPoint field typed after trackpoint.COLUMN_TYPES. ``timestamp`` is a UTC
+datetime in milliseconds, the TRK resolution. Missing values (and non-finite
+times) are nulls, and the schema is the same for every track, so outputs can
+be read together as one dataset. Waypoints are not exported.
+
+- ``.parquet`` and ``.feather`` need pyarrow. Each decoded chunk is written as
+  one row group or record batch.
+- ``.npz`` needs nothing. It is a NumPy archive (``numpy.load``) with one
+  array per column, plus a boolean ``<name>_valid`` array per nullable field.
+  Strings are fixed-width unicode arrays. The columns are spooled to
+  temporary files and put into the archive when the writer closes.
+"""
+
+from __future__ import annotations
+
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import zipfile
+from array import array
+from math import isfinite
+from typing import Dict
+
+from .trackpoint import COLUMN_TYPES, FIELDS, REQUIRED_COLUMNS, Segment
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional: only the .npz export is available
+    pa = pq = None
+
+try:
+    import numpy as np
+except ImportError:  # optional: Arrow columns are built from Python values
+    np = None
+
+HAVE_PYARROW = pa is not None
+
+COPY_BLOCK = 1 << 20
+# rows of a string column encoded per write
+STRING_BLOCK = 65536
+_ORDER = "<" if sys.byteorder == "little" else ">"
+# .npy type per array typecode (native byte order, like array.array)
+_NPY_TYPES = {"d": "f8", "i": "i4", "h": "i2", "q": "i8"}
+_UTF32 = "utf-32-le" if sys.byteorder == "little" else "utf-32-be"
+
+
+def _timestamp_ms(column) -> array:
+    # seconds (float) -> integer milliseconds; masked and non-finite entries are 0
+    return array("q", [round(value * 1000) if isfinite(value) else 0 for value in column])
+
+
+def _npy_header(descr: str, count: int) -> bytes:
+    header = f"{{'descr': '{descr}', 'fortran_order': False, 'shape': ({count},), }}"
+    # magic, version and length take 10 bytes; the header is padded so the data starts 64-byte aligned
+    header += " " * (63 - (10 + len(header)) % 64) + "\n"
+    return b"\x93NUMPY\x01\x00" + struct.pack("<H", len(header)) + header.encode("latin1")
+
+
+class _NpzSink:
+    """Columns spooled to temporary files, written as .npy members of an .npz on close."""
+
+    def __init__(self, path, source: str):
+        self.path = path
+        self.source = source
+        self._count = 0
+        self._spools = {name: tempfile.TemporaryFile() for name in ("segment", "point_index") + FIELDS}
+        self._valid = {name: tempfile.TemporaryFile() for name in FIELDS if name not in REQUIRED_COLUMNS}
+        # characters of the longest value per string column
+        self._widths: Dict[str, int] = {name: 1 for name in FIELDS if COLUMN_TYPES[name] is None}
+
+    def write(self, segment: Segment, index: int, start: int, count: int) -> None:
+        spools = self._spools
+        spools["segment"].write((array("i", [index]) * count).tobytes())
+        spools["point_index"].write(array("q", range(start, start + count)).tobytes())
+        for name in FIELDS:
+            column = segment.columns.get(name)
+            mask = segment.valid.get(name)
+            typecode = COLUMN_TYPES[name]
+            if typecode is None:
+                values = [None] * count if column is None else column
+                # one line per value; strings of TrackPoint fields hold no newlines
+                text = ["" if value is None else value for value in values]
+                self._widths[name] = max(self._widths[name], max(map(len, text)))
+                spools[name].write("".join(f"{value}\n" for value in text).encode("utf-8"))
+                valid = bytes(value is not None for value in values)
+            elif column is None:
+                spools[name].write(bytes(array(typecode).itemsize * count))
+                valid = bytes(count)
+            else:
+                spools[name].write((_timestamp_ms(column) if name == "timestamp" else column).tobytes())
+                valid = b"\x01" * count if mask is None else mask
+                if name == "timestamp":
+                    # a NaN or infinite time has no datetime64 value
+                    valid = bytes(ok and isfinite(value) for ok, value in zip(valid, column))
+            if name in self._valid:
+                self._valid[name].write(valid)
+        self._count += count
+
+    def close(self) -> None:
+        count = self._count
+        with zipfile.ZipFile(self.path, "w", zipfile.ZIP_STORED, allowZip64=True) as archive:
+            width = max(len(self.source), 1)
+            with archive.open("file.npy", "w", force_zip64=True) as member:
+                member.write(_npy_header(f"{_ORDER}U{width}", count))
+                row = self.source.ljust(width, "\0").encode(_UTF32)
+                for start in range(0, count, STRING_BLOCK):
+                    member.write(row * min(STRING_BLOCK, count - start))
+            for name, spool in self._spools.items():
+                spool.seek(0)
+                with archive.open(f"{name}.npy", "w", force_zip64=True) as member:
+                    typecode = COLUMN_TYPES.get(name, "q" if name == "point_index" else "i")
+                    if name == "timestamp":
+                        member.write(_npy_header(f"{_ORDER}M8[ms]", count))
+                    elif typecode is None:
+                        self._copy_strings(spool, member, self._widths[name], count)
+                        continue
+                    else:
+                        member.write(_npy_header(_ORDER + _NPY_TYPES[typecode], count))
+                    shutil.copyfileobj(spool, member, COPY_BLOCK)
+            for name, spool in self._valid.items():
+                spool.seek(0)
+                with archive.open(f"{name}_valid.npy", "w", force_zip64=True) as member:
+                    member.write(_npy_header("|b1", count))
+                    shutil.copyfileobj(spool, member, COPY_BLOCK)
+        self.discard()
+
+    @staticmethod
+    def _copy_strings(spool, member, width: int, count: int) -> None:
+        member.write(_npy_header(f"{_ORDER}U{width}", count))
+        block = []
+        for line in spool:
+            block.append(line[:-1].decode("utf-8").ljust(width, "\0"))
+            if len(block) == STRING_BLOCK:
+                member.write("".join(block).encode(_UTF32))
+                block = []
+        member.write("".join(block).encode(_UTF32))
+
+    def discard(self) -> None:
+        for spool in (*self._spools.values(), *self._valid.values()):
+            spool.close()
+
+
+def arrow_schema():
+    """The Arrow schema of the exported columns (requires pyarrow)."""
+    types = {"d": pa.float64(), "i": pa.int32(), "h": pa.int16(), None: pa.string()}
+    fields = [
+        pa.field("file", pa.dictionary(pa.int32(), pa.string()), nullable=False),
+        pa.field("segment", pa.int32(), nullable=False),
+        pa.field("point_index", pa.int64(), nullable=False),
+    ]
+    for name in FIELDS:
+        kind = pa.timestamp("ms", tz="UTC") if name == "timestamp" else types[COLUMN_TYPES[name]]
+        fields.append(pa.field(name, kind, nullable=name not in REQUIRED_COLUMNS))
+    return pa.schema(fields)
+
+
+class _ArrowSink:
+    """Record batches written to a Parquet file or an Arrow IPC (Feather v2) file."""
+
+    def __init__(self, path, source: str, output_format: str):
+        self.path = path
+        self.schema = arrow_schema()
+        self._source = pa.array([source], pa.string())
+        if output_format == "parquet":
+            self._writer = pq.ParquetWriter(str(path), self.schema)
+        else:
+            self._writer = pa.ipc.new_file(str(path), self.schema)
+
+    def _column(self, segment: Segment, name: str, kind, count: int):
+        column = segment.columns.get(name)
+        if column is None:
+            return pa.nulls(count, kind)
+        if COLUMN_TYPES[name] is None:
+            return pa.array(column, kind)
+        mask = segment.valid.get(name)
+        if np is None:
+            values = segment.column(name)
+            if name == "timestamp":
+                values = (round(value * 1000) if value is not None and isfinite(value) else None for value in values)
+            return pa.array(list(values), kind)
+        values = np.frombuffer(column, dtype=column.typecode)
+        missing = None if mask is None else np.frombuffer(mask, dtype="u1") == 0
+        if name == "timestamp":
+            # non-finite times become nulls rather than arbitrary integers
+            finite = np.isfinite(values)
+            values = np.rint(np.where(finite, values, 0.0) * 1000).astype("i8")
+            missing = ~finite if missing is None else missing | ~finite
+        return pa.array(values, kind, mask=missing)
+
+    def write(self, segment: Segment, index: int, start: int, count: int) -> None:
+        schema = self.schema
+        columns = [
+            pa.DictionaryArray.from_arrays(pa.repeat(pa.scalar(0, pa.int32()), count), self._source),
+            pa.repeat(pa.scalar(index, pa.int32()), count),
+            pa.array(range(start, start + count), pa.int64()) if np is None else pa.array(np.arange(start, start + count, dtype="i8")),
+        ]
+        columns.extend(self._column(segment, name, schema.field(name).type, count) for name in FIELDS)
+        self._writer.write_batch(pa.RecordBatch.from_arrays(columns, schema=schema))
+
+    def close(self) -> None:
+        self._writer.close()
+
+    def discard(self) -> None:
+        self._writer.close()
+
+
+class ColumnarWriter:
+    """Write the trackpoints of one track as typed columns.
+
+    Usage::
+
+        with ColumnarWriter(path, "parquet", source="a.trk") as out:
+            for meta, chunks in segments:
+                out.begin_segment()
+                for chunk in chunks:
+                    out.write_points(chunk)
+    """
+
+    def __init__(self, path, output_format: str, source: str):
+        self.path = path
+        if output_format == "npz":
+            self._sink = _NpzSink(path, source)
+        elif output_format in ("parquet", "feather"):
+            if not HAVE_PYARROW:
+                raise RuntimeError(f"pyarrow is required for {output_format} output (.npz needs no extra packages)")
+            self._sink = _ArrowSink(path, source, output_format)
+        else:
+            raise ValueError(f"unknown columnar format {output_format!r} (expected parquet, feather or npz)")
+        self.rows = 0
+        self._segment = -1
+        self._index = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            # do not leave a truncated file behind
+            self._sink.discard()
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+    def begin_segment(self) -> None:
+        self._segment += 1
+        self._index = 0
+
+    def write_points(self, segment: Segment) -> None:
+        count = len(segment)
+        if not count:
+            return
+        self._sink.write(segment, self._segment, self._index, count)
+        self._index += count
+        self.rows += count
+
+    def close(self) -> None:
+        self._sink.close()
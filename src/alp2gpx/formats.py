@@ -0,0 +1,32 @@
+"""Output formats and their file suffixes."""
+
+from __future__ import annotations
+
+import os
+
+from .compression import compression_suffix
+
+# output format -> file suffix (before any compression suffix)
+OUTPUT_FORMATS = {
+    "gpx": ".gpx",
+    "geojson": ".geojson",
+    "ndjson": ".ndjson",
+    "parquet": ".parquet",
+    "feather": ".feather",
+    "npz": ".npz",
+}
+# further names recognised when the format is taken from the output file
+FORMAT_ALIASES = {".json": "geojson", ".geojsonl": "ndjson", ".geojsons": "ndjson", ".jsonl": "ndjson", ".arrow": "feather"}
+# formats written by columnar.ColumnarWriter; they are not compressed by suffix
+COLUMNAR_FORMATS = ("parquet", "feather", "npz")
+
+
+def output_format(path) -> str:
+    """Output format implied by the name of path ('gpx' unless it ends in another format's suffix)."""
+    path = str(path)
+    base = path[:len(path) - len(compression_suffix(path))]
+    suffix = os.path.splitext(base)[1].lower()
+    for name, known in OUTPUT_FORMATS.items():
+        if suffix == known:
+            return name
+    return FORMAT_ALIASES.get(suffix, "gpx")
@@ -0,0 +1,183 @@
+"""EGM96 geoid correction for ellipsoidal (WGS84) elevations.
+
+Two backends are available: pyproj (downloads ``us_nga_egm96_15`` on first use)
+and a local, memory-mapped copy of the same 15' grid that needs neither pyproj
+nor network access. The local grid is produced once with :func:`build_grid` on a
+machine that has pyproj and then copied to the conversion hosts.
+"""
+
+from __future__ import annotations
+
+import math
+import mmap
+import os
+from struct import Struct
+from typing import Dict, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # optional: pure-Python interpolation fallback
+    np = None
+
+GRID_ENV = "ALP2GPX_GEOID_GRID"
+GRID_MAGIC = b"ALPGEOID"
+# magic, north-west node (lat, lon), node spacing (dlat, dlon), rows, cols
+GRID_HEADER = Struct("<8s4d2I")
+# float32 nodes, row-major from north to south, west to east; the last column repeats the first.
+_PAIR = Struct("<2f")
+
+_UNSET = object()
+_transformer = _UNSET
+_grids: Dict[str, "GeoidGrid"] = {}
+
+
+def _build_transformer():
+    try:
+        from pyproj import CRS
+        from pyproj.transformer import TransformerGroup, Transformer
+
+        tg = TransformerGroup(4979, 5773)
+        tg.download_grids(verbose=True)
+        return Transformer.from_crs(
+            CRS("EPSG:4979").to_3d(),
+            CRS("EPSG:5773").to_3d(),
+            always_xy=True,
+        )
+    except Exception:
+        return None
+
+
+def get_transformer():
+    """Return the process-wide WGS84 -> EGM96 transformer, or None if pyproj is unusable."""
+    global _transformer
+    if _transformer is _UNSET:
+        _transformer = _build_transformer()
+    return _transformer
+
+
+class GeoidGrid:
+    """Read-only, memory-mapped geoid undulation grid with bilinear interpolation.
+
+    Interpolating the nodes sampled from pyproj reproduces pyproj's EGM96 heights
+    to within 1 mm (the grid stores float32, as does ``us_nga_egm96_15.tif``).
+    Raises OSError if path cannot be read and ValueError if it is not a grid.
+    Use as a context manager, or call close(), to release the mapping.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._values = None
+        with open(path, "rb") as f:
+            try:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # empty file
+                raise ValueError(f"{path}: not a geoid grid") from None
+        if len(self._mm) < GRID_HEADER.size:
+            self._mm.close()
+            raise ValueError(f"{path}: not a geoid grid")
+        magic, self.lat0, self.lon0, self.dlat, self.dlon, self.rows, self.cols = GRID_HEADER.unpack_from(self._mm, 0)
+        if magic != GRID_MAGIC or self.rows < 2 or self.cols < 2 or len(self._mm) < GRID_HEADER.size + self.rows * self.cols * 4:
+            self._mm.close()
+            raise ValueError(f"{path}: not a geoid grid")
+        if np is not None:
+            self._values = np.frombuffer(self._mm, dtype="<f4", count=self.rows * self.cols, offset=GRID_HEADER.size).reshape(self.rows, self.cols)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def close(self) -> None:
+        # the NumPy view holds a buffer export of the mapping, so drop it first
+        self._values = None
+        self._mm.close()
+
+    def undulation(self, lons: Sequence[float], lats: Sequence[float]) -> List[float]:
+        """Return geoid undulation N (metres) at each lon/lat."""
+        if self._values is not None:
+            return self._undulation_np(lons, lats).tolist()
+        return [self._undulation_point(lon, lat) for lon, lat in zip(lons, lats)]
+
+    def _undulation_np(self, lons, lats):
+        y = (self.lat0 - np.asarray(lats, dtype=np.float64)) / self.dlat
+        x = np.mod(np.asarray(lons, dtype=np.float64) - self.lon0, 360.0) / self.dlon
+        row = np.clip(np.floor(y).astype(np.intp), 0, self.rows - 2)
+        col = np.clip(np.floor(x).astype(np.intp), 0, self.cols - 2)
+        fy = y - row
+        fx = x - col
+        v = self._values
+        top = v[row, col] * (1.0 - fx) + v[row, col + 1] * fx
+        bottom = v[row + 1, col] * (1.0 - fx) + v[row + 1, col + 1] * fx
+        return top * (1.0 - fy) + bottom * fy
+
+    def _undulation_point(self, lon: float, lat: float) -> float:
+        y = (self.lat0 - lat) / self.dlat
+        x = math.fmod(lon - self.lon0, 360.0)
+        if x < 0:
+            x += 360.0
+        x /= self.dlon
+        row = min(max(int(math.floor(y)), 0), self.rows - 2)
+        col = min(max(int(math.floor(x)), 0), self.cols - 2)
+        fy = y - row
+        fx = x - col
+        base = GRID_HEADER.size + (row * self.cols + col) * 4
+        v00, v01 = _PAIR.unpack_from(self._mm, base)
+        v10, v11 = _PAIR.unpack_from(self._mm, base + self.cols * 4)
+        top = v00 * (1.0 - fx) + v01 * fx
+        bottom = v10 * (1.0 - fx) + v11 * fx
+        return top * (1.0 - fy) + bottom * fy
+
+
+def get_grid(path: str) -> GeoidGrid:
+    """Return the process-wide mapping of the grid at path (pages are shared between processes)."""
+    key = os.path.abspath(path)
+    grid = _grids.get(key)
+    if grid is None:
+        grid = _grids[key] = GeoidGrid(key)
+    return grid
+
+
+def build_grid(path: str, step: float = 0.25, bounds: Optional[Tuple[float, float, float, float]] = None) -> None:
+    """Sample EGM96 undulations from pyproj at every grid node and write a local grid file.
+
+    bounds (south, west, north, east in degrees, widened to whole steps) limits
+    the grid to a region; heights outside it are extrapolated, not looked up.
+    """
+    transformer = get_transformer()
+    if transformer is None:
+        raise RuntimeError("pyproj with the us_nga_egm96_15 grid is required to build a geoid grid")
+    south, west, north, east = bounds or (-90.0, -180.0, 90.0, 180.0)
+    north = math.ceil(north / step) * step
+    west = math.floor(west / step) * step
+    rows = int(round((north - math.floor(south / step) * step) / step)) + 1
+    cols = int(round((math.ceil(east / step) * step - west) / step)) + 1
+    lons = [west + c * step for c in range(cols)]
+    with open(path, "wb") as f:
+        f.write(GRID_HEADER.pack(GRID_MAGIC, north, west, step, step, rows, cols))
+        row_struct = Struct(f"<{cols}f")
+        for r in range(rows):
+            lat = north - r * step
+            heights = transformer.transform(lons, [lat] * cols, [0.0] * cols)[2]
+            # H = h - N, so with h = 0 the orthometric height is -N
+            f.write(row_struct.pack(*[-h for h in heights]))
+
+
+def correct_heights(lons: Sequence[float], lats: Sequence[float], heights: Sequence[float], grid: Optional[str] = None) -> Optional[List[float]]:
+    """Transform a batch of ellipsoidal heights to EGM96; returns None when no correction is available.
+
+    Uses the local grid at ``grid`` (or ``$ALP2GPX_GEOID_GRID``) when given, pyproj otherwise.
+    """
+    if not heights:
+        return None
+    grid = grid or os.environ.get(GRID_ENV)
+    if grid:
+        undulations = get_grid(grid).undulation(lons, lats)
+        return [h - n for h, n in zip(heights, undulations)]
+    transformer = get_transformer()
+    if transformer is None:
+        return None
+    try:
+        return list(transformer.transform(list(lons), list(lats), list(heights))[2])
+    except Exception:
+        return None
@@ -0,0 +1,290 @@
+"""Streaming GeoJSON output, as an alternative to the GPX writer.
+
+Two layouts, both written chunk by chunk from the decoded segments:
+
+- ``GeoJSONWriter``: a FeatureCollection (``.geojson``). Waypoints are Point
+  features. A track is a LineString feature per segment (``geometry="linestring"``)
+  or a single MultiLineString feature (``"multilinestring"``). LineString
+  features carry the per-point times, and with extensions the aq: fields, as
+  parallel arrays in ``properties.coordinateProperties`` (the convention of
+  Mapbox's togeojson). Those arrays are spooled to temporary files while the
+  coordinates are written, so memory does not grow with the segment.
+- ``NDJSONWriter``: newline-delimited GeoJSON (``.ndjson``), one Point feature
+  per line for every waypoint and trackpoint, with the time, track name,
+  segment index and (with extensions) the aq: fields as properties.
+
+Properties use the TrackPoint field names. Positions are ``[lon, lat]`` or
+``[lon, lat, elevation]``; missing and non-finite elevations are left out.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import tempfile
+from math import isfinite
+from typing import Callable, Dict, List, Optional
+
+from .compression import open_text
+from .trackpoint import EXTENSION_FIELDS, Segment
+
+GEOJSON_GEOMETRIES = ("linestring", "multilinestring")
+COPY_BLOCK = 1 << 20
+# points formatted per write call
+FLUSH_POINTS = 4096
+
+
+def _json_value(value) -> str:
+    # JSON text of a TrackPoint value; non-finite numbers have no JSON form
+    if value is None:
+        return "null"
+    if isinstance(value, str):
+        return json.dumps(value, ensure_ascii=False)
+    return f"{value}" if isfinite(value) else "null"
+
+
+def _json_string(text: Optional[str]) -> str:
+    return "null" if text is None else json.dumps(text, ensure_ascii=False)
+
+
+class _Writer:
+    """Output file handling and value formatting shared by both layouts."""
+
+    def __init__(self, path, format_time: Optional[Callable[[Optional[float]], Optional[str]]] = None, coordinate_digits: Optional[int] = None, elevation_digits: Optional[int] = None, compress_level: Optional[int] = None):
+        self.path = path
+        self._file = open_text(path, compress_level)
+        self._write = self._file.write
+        self._format_time = format_time or (lambda timestamp: None)
+        self._coordinate_spec = "" if coordinate_digits is None else f".{coordinate_digits}f"
+        self._elevation_spec = "" if elevation_digits is None else f".{elevation_digits}f"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            # do not leave a truncated document behind
+            self._file.close()
+            os.remove(self.path)
+
+    def close(self) -> None:
+        self._file.close()
+
+    def _position(self, lat: float, lon: float, ele: Optional[float]) -> str:
+        # a non-finite elevation has no JSON form, so the position stays 2D
+        cspec = self._coordinate_spec
+        if ele is None or not isfinite(ele):
+            return f"[{lon:{cspec}},{lat:{cspec}}]"
+        return f"[{lon:{cspec}},{lat:{cspec}},{ele:{self._elevation_spec}}]"
+
+    def _positions(self, segment: Segment) -> List[str]:
+        cspec, espec = self._coordinate_spec, self._elevation_spec
+        return [
+            f"[{lon:{cspec}},{lat:{cspec}}]" if ele is None or not isfinite(ele) else f"[{lon:{cspec}},{lat:{cspec}},{ele:{espec}}]"
+            for lat, lon, ele in zip(segment.column("lat"), segment.column("lon"), segment.column("elevation"))
+        ]
+
+    def _times(self, segment: Segment) -> List[str]:
+        return [f'"{text}"' if text else "null" for text in map(self._format_time, segment.column("timestamp"))]
+
+    @staticmethod
+    def _extension_names(segment: Segment) -> List[str]:
+        # aq: fields with at least one value in segment
+        names = []
+        for name in EXTENSION_FIELDS:
+            column = segment.columns.get(name)
+            if column is None:
+                continue
+            mask = segment.valid.get(name)
+            if mask is None:
+                if any(value is not None for value in column):
+                    names.append(name)
+            elif mask.find(1) != -1:
+                names.append(name)
+        return names
+
+
+class _ArraySpools:
+    """Per-point property arrays of one LineString, kept in temporary files until its coordinates are written."""
+
+    def __init__(self):
+        self._files: Dict[str, object] = {}
+        self._count = 0
+
+    def add(self, arrays: Dict[str, List[str]], count: int) -> None:
+        """Append count JSON values per array; arrays missing now (or earlier) are padded with null."""
+        for name, values in arrays.items():
+            spool = self._files.get(name)
+            if spool is None:
+                spool = self._files[name] = tempfile.TemporaryFile("w+", encoding="utf-8")
+                spool.write(",null" * self._count)
+            # every value is preceded by a comma; dump() skips the first one
+            spool.write("," + ",".join(values))
+        for name, spool in self._files.items():
+            if name not in arrays:
+                spool.write(",null" * count)
+        self._count += count
+
+    def dump(self, write, file) -> None:
+        """Write the arrays as the members of a JSON object, then close the spools."""
+        first = True
+        for name, spool in self._files.items():
+            write(f'{"" if first else ","}"{name}":[')
+            first = False
+            spool.flush()
+            spool.seek(1)
+            shutil.copyfileobj(spool, file, COPY_BLOCK)
+            spool.close()
+            write("]")
+        self._files = {}
+        self._count = 0
+
+
+class GeoJSONWriter(_Writer):
+    """Write waypoints and tracks as a GeoJSON FeatureCollection.
+
+    Usage mirrors GPXWriter::
+
+        with GeoJSONWriter(path) as out:
+            out.write_waypoint(location, label)
+            out.begin_track(name)
+            out.begin_segment(meta)
+            for chunk in chunks:
+                out.write_points(chunk, extensions=True)
+            out.end_segment()
+            out.end_track()
+    """
+
+    def __init__(self, path, geometry: str = "linestring", **options):
+        if geometry not in GEOJSON_GEOMETRIES:
+            raise ValueError(f"unknown GeoJSON geometry {geometry!r} (expected one of {', '.join(GEOJSON_GEOMETRIES)})")
+        super().__init__(path, **options)
+        self.geometry = geometry
+        self._features = 0
+        self._track: Optional[str] = None
+        self._segment = -1
+        self._segment_meta: Optional[dict] = None
+        self._segment_metas: List[Optional[dict]] = []
+        self._points = 0
+        self._spools = _ArraySpools()
+        self._write('{"type":"FeatureCollection","features":[')
+
+    def close(self) -> None:
+        if self._file.closed:
+            return
+        self._write("]}\n")
+        super().close()
+
+    def _begin_feature(self) -> None:
+        self._write(",\n" if self._features else "\n")
+        self._features += 1
+
+    def write_waypoint(self, location, name: Optional[str]) -> None:
+        self._begin_feature()
+        position = self._position(location.lat, location.lon, location.elevation)
+        self._write(f'{{"type":"Feature","geometry":{{"type":"Point","coordinates":{position}}},"properties":{{"name":{_json_string(name)},"waypoint":true}}}}')
+
+    def begin_track(self, name: str) -> None:
+        self._track = name
+        self._segment = -1
+        self._segment_metas = []
+        if self.geometry == "multilinestring":
+            self._begin_feature()
+            self._write('{"type":"Feature","geometry":{"type":"MultiLineString","coordinates":[')
+
+    def end_track(self) -> None:
+        if self.geometry == "multilinestring":
+            properties = f'"name":{_json_string(self._track)},"segments":{self._segment + 1}'
+            if any(self._segment_metas):
+                properties += f',"segmentMeta":{json.dumps(self._segment_metas, ensure_ascii=False, default=str)}'
+            self._write(f"]}},\"properties\":{{{properties}}}}}")
+        self._track = None
+
+    def begin_segment(self, meta: Optional[dict] = None) -> None:
+        """Start the next line of the current track; meta (with extensions) becomes its properties."""
+        self._segment += 1
+        self._points = 0
+        self._segment_meta = meta or None
+        if self.geometry == "multilinestring":
+            self._segment_metas.append(self._segment_meta)
+            self._write("," if self._segment else "")
+            self._write("[")
+        else:
+            self._begin_feature()
+            self._write('{"type":"Feature","geometry":{"type":"LineString","coordinates":[')
+
+    def end_segment(self) -> None:
+        if self.geometry == "multilinestring":
+            self._write("]")
+            return
+        properties = f'"name":{_json_string(self._track)},"segment":{self._segment}'
+        if self._segment_meta:
+            properties += f',"segmentMeta":{json.dumps(self._segment_meta, ensure_ascii=False, default=str)}'
+        self._write(f"]}},\"properties\":{{{properties},\"coordinateProperties\":{{")
+        self._spools.dump(self._write, self._file)
+        self._write("}}}")
+
+    def write_points(self, segment: Segment, extensions: bool = False) -> None:
+        """Append the points of segment (or of one chunk of it) to the current line."""
+        count = len(segment)
+        if not count:
+            return
+        positions = self._positions(segment)
+        for start in range(0, count, FLUSH_POINTS):
+            self._write(("," if self._points or start else "") + ",".join(positions[start:start + FLUSH_POINTS]))
+        self._points += count
+        if self.geometry == "multilinestring":
+            return
+        arrays = {"times": self._times(segment)}
+        if extensions:
+            for name in self._extension_names(segment):
+                arrays[name] = [_json_value(value) for value in segment.column(name)]
+        self._spools.add(arrays, count)
+
+
+class NDJSONWriter(_Writer):
+    """Write waypoints and trackpoints as newline-delimited GeoJSON Point features (same calls as GeoJSONWriter)."""
+
+    def __init__(self, path, **options):
+        super().__init__(path, **options)
+        self._track_property = ""
+        self._segment = -1
+
+    def write_waypoint(self, location, name: Optional[str]) -> None:
+        position = self._position(location.lat, location.lon, location.elevation)
+        self._write(f'{{"type":"Feature","geometry":{{"type":"Point","coordinates":{position}}},"properties":{{"name":{_json_string(name)},"waypoint":true}}}}\n')
+
+    def begin_track(self, name: str) -> None:
+        self._track_property = f'"track":{_json_string(name)}'
+        self._segment = -1
+
+    def end_track(self) -> None:
+        pass
+
+    def begin_segment(self, meta: Optional[dict] = None) -> None:
+        self._segment += 1
+
+    def end_segment(self) -> None:
+        pass
+
+    def write_points(self, segment: Segment, extensions: bool = False) -> None:
+        if not len(segment):
+            return
+        head = f'{{{self._track_property},"segment":{self._segment}'
+        columns = [self._positions(segment), self._times(segment)]
+        names = self._extension_names(segment) if extensions else []
+        # '"name":' prefixes of the aq: properties, None where a point has no value
+        for name in names:
+            key = f',"{name}":'
+            columns.append([None if value is None else key + _json_value(value) for value in segment.column(name)])
+        parts = []
+        for position, time, *values in zip(*columns):
+            properties = f'{head},"time":{time}' + "".join(value for value in values if value is not None)
+            parts.append(f'{{"type":"Feature","geometry":{{"type":"Point","coordinates":{position}}},"properties":{properties}}}}}\n')
+            if len(parts) == FLUSH_POINTS:
+                self._write("".join(parts))
+                parts = []
+        self._write("".join(parts))
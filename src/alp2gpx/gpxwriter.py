@@ -0,0 +1,432 @@
+"""Streaming GPX 1.1 serializer.
+
+Writes the document element by element to a buffered file instead of building
+an ElementTree, reading points straight from the segment columns; a segment can
+be handed over in chunks as it is decoded. The output is
+byte-identical to ``ElementTree.write(encoding='utf-8', xml_declaration=True)``,
+with ``ET.indent(space="  ")`` applied when ``pretty`` is set. A path ending in
+``.gz``, ``.bz2`` or ``.xz`` is compressed as it is written, see compression.py.
+
+Coordinates and elevations are written as Python float reprs unless a number
+of decimals is given. TRK files store coordinates in 1e-7 degrees and heights
+in millimetres; fixed-point formatting of the decoded floats with 7 (3)
+decimals reproduces those integers exactly, without repr noise such as
+``46.576083300000004``, and is about twice as fast as repr.
+"""
+
+from __future__ import annotations
+
+import os
+import shutil
+import tempfile
+from itertools import compress, repeat
+from operator import is_not
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+from .compression import compression_suffix, open_binary, open_text
+from .trackpoint import AQ_NS, COLUMN_TYPES, EXTENSION_FIELDS, Segment
+
+GPX_NS = "http://www.topografix.com/GPX/1/1"
+DECLARATION = "<?xml version='1.0' encoding='utf-8'?>\n"
+# points are joined and handed to the file in batches of this size
+FLUSH_POINTS = 4096
+COPY_BLOCK = 1 << 20
+
+
+def escape_text(text: str) -> str:
+    if "&" in text:
+        text = text.replace("&", "&amp;")
+    if "<" in text:
+        text = text.replace("<", "&lt;")
+    if ">" in text:
+        text = text.replace(">", "&gt;")
+    return text
+
+
+def escape_attribute(text: str) -> str:
+    text = escape_text(text)
+    if '"' in text:
+        text = text.replace('"', "&quot;")
+    if "\r" in text:
+        text = text.replace("\r", "&#13;")
+    if "\n" in text:
+        text = text.replace("\n", "&#10;")
+    if "\t" in text:
+        text = text.replace("\t", "&#09;")
+    return text
+
+
+class _Serializer:
+    """Shared <trkseg>/<trkpt> formatting for the document and for spooled tracks."""
+
+    def __init__(self, file, pretty: bool, format_time: Optional[Callable[[Optional[float]], Optional[str]]], coordinate_digits: Optional[int] = None, elevation_digits: Optional[int] = None):
+        self._file = file
+        self._write = file.write
+        self._pretty = pretty
+        self._format_time = format_time or (lambda timestamp: None)
+        self._coordinate_digits = coordinate_digits
+        self._elevation_digits = elevation_digits
+        # format specs of lat/lon and <ele>; "" formats like str()
+        self._coordinate_spec = "" if coordinate_digits is None else f".{coordinate_digits}f"
+        self._elevation_spec = "" if elevation_digits is None else f".{elevation_digits}f"
+        # whitespace written before an element at each depth (what ET.indent puts in text/tail)
+        self._nl = ["\n" + "  " * level for level in range(8)] if pretty else [""] * 8
+        self._segment_pending = False
+        self._extensions = _ExtensionTemplates(self._nl[4:])
+        self.aq_used = False
+
+    def begin_segment(self, meta: Optional[dict] = None) -> None:
+        """Open a <trkseg>; a segment without metadata or points is written as <trkseg />."""
+        nl2, nl3, nl4, nl5 = self._nl[2:6]
+        if not meta:
+            self._segment_pending = True
+            return
+        parts = [f"{nl2}<trkseg>{nl3}<extensions>{nl4}<aq:segmentMeta>"]
+        for key, value in meta.items():
+            parts.append(f'{nl5}<aq:item name="{escape_attribute(str(key))}"')
+            text = f"{value}"
+            parts.append(f">{escape_text(text)}</aq:item>" if text else " />")
+        parts.append(f"{nl4}</aq:segmentMeta>{nl3}</extensions>")
+        self._write("".join(parts))
+        self._segment_pending = False
+        self.aq_used = True
+
+    def end_segment(self) -> None:
+        nl2 = self._nl[2]
+        self._write(f"{nl2}<trkseg />" if self._segment_pending else f"{nl2}</trkseg>")
+        self._segment_pending = False
+
+    def write_points(self, segment: Segment, extensions: bool = False) -> None:
+        """Write the points of segment (or of one chunk of it) as <trkpt> elements."""
+        if not len(segment):
+            return
+        nl = self._nl
+        nl3, nl4 = nl[3], nl[4]
+        if self._segment_pending:
+            self._write(f"{nl[2]}<trkseg>")
+            self._segment_pending = False
+
+        format_time = self._format_time
+        cspec, espec = self._coordinate_spec, self._elevation_spec
+        columns = [segment.column(name) for name in ("lat", "lon", "elevation", "timestamp")]
+        if extensions and segment.has_extensions():
+            columns.append(self._extensions.render(segment))
+            self.aq_used = True
+        else:
+            columns.append(repeat(""))
+        write = self._write
+        parts = []
+        pending = 0
+        close_point = f"{nl3}</trkpt>"
+        for lat, lon, ele, ts, ext in zip(*columns):
+            body = f"{nl4}<ele>{ele:{espec}}</ele>" if ele is not None else ""
+            time_str = format_time(ts)
+            if time_str:
+                body += f"{nl4}<time>{time_str}</time>"
+            if ext:
+                body += ext
+            if body:
+                parts.append(f'{nl3}<trkpt lat="{lat:{cspec}}" lon="{lon:{cspec}}">{body}{close_point}')
+            else:
+                parts.append(f'{nl3}<trkpt lat="{lat:{cspec}}" lon="{lon:{cspec}}" />')
+            pending += 1
+            if pending == FLUSH_POINTS:
+                write("".join(parts))
+                parts = []
+                pending = 0
+        write("".join(parts))
+
+    def write_segment(self, segment: Segment, extensions: bool = False) -> None:
+        """Write one complete <trkseg>; with extensions, segment metadata and aq: point fields are included."""
+        self.begin_segment(segment.meta if extensions else None)
+        self.write_points(segment, extensions)
+        self.end_segment()
+
+
+class TrackSpool(_Serializer):
+    """Segments of a track written to a temporary file, appended to the document later.
+
+    Used for tracks that are produced alongside the main tracks but must appear
+    after them (the accuracy contours), so they never have to be held in memory.
+    """
+
+    def __init__(self, pretty: bool = False, format_time=None, coordinate_digits: Optional[int] = None, elevation_digits: Optional[int] = None):
+        super().__init__(
+            tempfile.TemporaryFile("w+", encoding="utf-8", errors="xmlcharrefreplace"),
+            pretty,
+            format_time,
+            coordinate_digits,
+            elevation_digits,
+        )
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class GPXWriter(_Serializer):
+    """Write a GPX document incrementally: metadata, waypoints, then tracks.
+
+    Usage::
+
+        with GPXWriter(path, pretty=True) as gpx:
+            gpx.write_metadata(name, link)
+            gpx.write_waypoint(location, label)
+            gpx.begin_track(name)
+            gpx.begin_segment(meta)
+            for chunk in chunks:
+                gpx.write_points(chunk, extensions=True)
+            gpx.end_segment()
+            gpx.end_track()
+
+    ElementTree only declares the ``aq:`` prefix when an aq: element is used.
+    ``aq_namespace`` forces the declaration on or off; with the default None it
+    is written up front and removed on close if no aq: element was written.
+    """
+
+    def __init__(self, path, pretty: bool = False, aq_namespace: Optional[bool] = None, format_time: Optional[Callable[[Optional[float]], Optional[str]]] = None, compress_level: Optional[int] = None, coordinate_digits: Optional[int] = None, elevation_digits: Optional[int] = None):
+        super().__init__(open_text(path, compress_level, errors="xmlcharrefreplace"), pretty, format_time, coordinate_digits, elevation_digits)
+        self.path = path
+        self._compress_level = compress_level
+        self._aq_namespace = aq_namespace
+        ns = f' xmlns:aq="{AQ_NS}"' if aq_namespace is not False else ""
+        self._write(f'{DECLARATION}<gpx{ns} xmlns="{GPX_NS}" version="1.1" creator="Alp2gpx">')
+
+    def __enter__(self) -> "GPXWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            # do not leave a truncated document behind
+            self._file.close()
+            os.remove(self.path)
+
+    def close(self) -> None:
+        if self._file.closed:
+            return
+        self._write(f"{self._nl[0]}</gpx>")
+        self._file.close()
+        if self._aq_namespace is None and not self.aq_used:
+            self._drop_aq_declaration()
+
+    def _drop_aq_declaration(self) -> None:
+        # shift the rest of the file left over the declaration, one block at a time
+        start = len(DECLARATION.replace("\n", os.linesep)) + len("<gpx")
+        width = len(f' xmlns:aq="{AQ_NS}"')
+        if compression_suffix(self.path):
+            # a compressed stream cannot be edited in place: recompress it without the declaration
+            tmp = f"{self.path}.{os.getpid()}.tmp{compression_suffix(self.path)}"
+            with open_binary(self.path, "rb") as src, open_binary(tmp, "wb", self._compress_level) as dst:
+                dst.write(src.read(start + width)[:start])
+                shutil.copyfileobj(src, dst, COPY_BLOCK)
+            os.replace(tmp, self.path)
+            return
+        with open(self.path, "r+b") as f:
+            read_pos, write_pos = start + width, start
+            while True:
+                f.seek(read_pos)
+                block = f.read(COPY_BLOCK)
+                if not block:
+                    break
+                f.seek(write_pos)
+                f.write(block)
+                read_pos += len(block)
+                write_pos += len(block)
+            f.truncate(write_pos)
+
+    def write_metadata(self, desc: str, link: str) -> None:
+        nl1, nl2 = self._nl[1], self._nl[2]
+        self._write(
+            f"{nl1}<metadata>{nl2}{_leaf('desc', desc)}"
+            f'{nl2}<link href="{escape_attribute(link)}" />{nl1}</metadata>'
+        )
+
+    def write_waypoint(self, location, name: Optional[str]) -> None:
+        nl1, nl2 = self._nl[1], self._nl[2]
+        cspec = self._coordinate_spec
+        ele = f"{nl2}<ele>{location.elevation:{self._elevation_spec}}</ele>" if location.elevation is not None else ""
+        self._write(f'{nl1}<wpt lat="{location.lat:{cspec}}" lon="{location.lon:{cspec}}">{ele}{nl2}{_leaf("name", name)}{nl1}</wpt>')
+
+    def begin_track(self, name: str) -> None:
+        nl1, nl2 = self._nl[1], self._nl[2]
+        self._write(f"{nl1}<trk>{nl2}{_leaf('name', name)}")
+
+    def end_track(self) -> None:
+        self._write(f"{self._nl[1]}</trk>")
+
+    def spool(self) -> TrackSpool:
+        """Return a spool formatting segments like this writer, for write_spooled_track."""
+        return TrackSpool(self._pretty, self._format_time, self._coordinate_digits, self._elevation_digits)
+
+    def write_spooled_track(self, name: str, spool: TrackSpool) -> None:
+        """Write a <trk> whose segments were collected in spool, then close the spool."""
+        self.begin_track(name)
+        spool._file.seek(0)
+        shutil.copyfileobj(spool._file, self._file, COPY_BLOCK)
+        spool.close()
+        self.end_track()
+        self.aq_used = self.aq_used or spool.aq_used
+
+
+def _leaf(tag: str, text: Optional[str]) -> str:
+    if not text:
+        return f"<{tag} />"
+    return f"<{tag}>{escape_text(text)}</{tag}>"
+
+
+def _type_leaf(network_type: Optional[str]) -> Optional[str]:
+    return None if network_type is None else _leaf("aq:type", network_type)
+
+
+class _IntStrings(dict):
+    """int -> str memo; the integer fields (satellites, battery, signal, accuracy) take few distinct values."""
+
+    def __missing__(self, value):
+        if value is None:
+            return None
+        text = self[value] = str(value)
+        return text
+
+
+# EXTENSION_FIELDS in the order of their GPX elements (the network type follows the signal)
+OUTPUT_ORDER = (
+    "accuracy",
+    "vertical_accuracy",
+    "pressure",
+    "battery",
+    "elevation_wgs84",
+    "elevation_dem",
+    "sat_gps",
+    "sat_glo",
+    "sat_bds",
+    "sat_gal",
+    "network_signal_percent",
+    "network_signal_dbm",
+    "network_type",
+    "inclination",
+    "magnetic_field",
+)
+
+
+class _ExtensionTemplates:
+    """The <extensions> blocks of a chunk's points from precompiled templates.
+
+    A template is the list of literal pieces around the values of one
+    combination of EXTENSION_FIELDS, compiled once per writer. When every field
+    of a chunk is either always or never set (the usual case), the block of each
+    point is a single ``"".join`` over the pieces zipped with the columns
+    already converted to text; otherwise points are formatted with the
+    template of the fields they carry.
+    """
+
+    def __init__(self, indents):
+        self.nl0, self.nl1, self.nl2 = indents[0], indents[1], indents[2]
+        self._pieces: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+        self._formats: Dict[Tuple[str, ...], str] = {}
+        self._strings = {name: _IntStrings() for name in EXTENSION_FIELDS if COLUMN_TYPES[name] in ("h", "i")}
+
+    def pieces(self, names: Tuple[str, ...]) -> Tuple[str, ...]:
+        """Literal text before, between and after the values of names (in OUTPUT_ORDER)."""
+        pieces = self._pieces.get(names)
+        if pieces is None:
+            pieces = self._pieces[names] = self._compile(set(names))
+        return pieces
+
+    def _format(self, names: Tuple[str, ...]) -> str:
+        template = self._formats.get(names)
+        if template is None:
+            # the pieces are markup and whitespace only, so they need no brace escaping
+            template = self._formats[names] = "{}".join(self.pieces(names))
+        return template
+
+    def _compile(self, present) -> Tuple[str, ...]:
+        nl0, nl1, nl2 = self.nl0, self.nl1, self.nl2
+        # every value is a \0 marker; the markers follow OUTPUT_ORDER
+        slot = dict.fromkeys(present, "\0")
+        parts = []
+        for name, tag in (
+            ("accuracy", "accuracy"),
+            ("vertical_accuracy", "accuracyVertical"),
+            ("pressure", "pressure"),
+            ("battery", "battery"),
+            ("elevation_wgs84", "elevationWgs84"),
+            ("elevation_dem", "elevationDem"),
+        ):
+            if name in present:
+                parts.append(f"{nl1}<aq:{tag}>{slot[name]}</aq:{tag}>")
+        satellites = [(name, tag) for name, tag in (("sat_gps", "gps"), ("sat_glo", "glo"), ("sat_bds", "bds"), ("sat_gal", "gal")) if name in present]
+        if satellites:
+            parts.append(f"{nl1}<aq:satellites>")
+            parts.extend(f"{nl2}<aq:{tag}>{slot[name]}</aq:{tag}>" for name, tag in satellites)
+            parts.append(f"{nl1}</aq:satellites>")
+        network = [name for name in ("network_signal_percent", "network_signal_dbm", "network_type") if name in present]
+        if network:
+            parts.append(f"{nl1}<aq:network>")
+            if "network_signal_percent" in present:
+                parts.append(f"{nl2}<aq:signalPercent>{slot['network_signal_percent']}</aq:signalPercent>")
+            if "network_signal_dbm" in present:
+                parts.append(f"{nl2}<aq:signalDbm>{slot['network_signal_dbm']}</aq:signalDbm>")
+            if "network_type" in present:
+                # filled with the rendered <aq:type> leaf, see _type_leaf
+                parts.append(f"{nl2}{slot['network_type']}")
+            parts.append(f"{nl1}</aq:network>")
+        for name, tag in (("inclination", "inclination"), ("magnetic_field", "magneticField")):
+            if name in present:
+                parts.append(f"{nl1}<aq:{tag}>{slot[name]}</aq:{tag}>")
+        if not parts:
+            return ("",)
+        return tuple(f"{nl0}<extensions>{''.join(parts)}{nl0}</extensions>".split("\0"))
+
+    def render(self, segment: Segment) -> Iterator[str]:
+        """One <extensions> block (or "") per point of segment."""
+        names = []
+        complete = True
+        for name in OUTPUT_ORDER:
+            column = segment.columns.get(name)
+            if column is None:
+                continue
+            mask = segment.valid.get(name)
+            if mask is None:
+                missing = sum(1 for value in column if value is None)
+                if missing == len(column):
+                    continue
+                complete = complete and not missing
+            else:
+                if mask.find(1) == -1:
+                    continue
+                complete = complete and mask.find(0) == -1
+            names.append(name)
+        columns = []
+        for name in names:
+            column = segment.column(name)
+            if name in self._strings:
+                column = map(self._strings[name].__getitem__, column)
+            elif name == "network_type":
+                column = map(_type_leaf, column)
+            else:
+                column = map(_text, column)
+            columns.append(column)
+        names = tuple(names)
+        if complete:
+            pieces = self.pieces(names)
+            interleaved = [repeat(pieces[0])]
+            for piece, column in zip(pieces[1:], columns):
+                interleaved.append(column)
+                interleaved.append(repeat(piece))
+            return map("".join, zip(*interleaved))
+        return self._render_partial(names, columns)
+
+    def _render_partial(self, names: Tuple[str, ...], columns) -> Iterator[str]:
+        # templates by which of names a point carries
+        templates: Dict[tuple, str] = {}
+        for values in zip(*columns):
+            key = tuple(map(is_not, values, repeat(None)))
+            template = templates.get(key)
+            if template is None:
+                template = templates[key] = self._format(tuple(compress(names, key)))
+            yield template.format(*compress(values, key))
+
+
+def _text(value) -> Optional[str]:
+    return None if value is None else str(value)
@@ -0,0 +1,247 @@
+"""Indexed access to AlpineQuest LDK archives.
+
+An LDK file is a tree of nodes (folders) whose entry tables point at child
+nodes and at data entries (the embedded waypoint, set, route, track and area
+files). The index reads only the node headers, node metadata and entry tables,
+plus the fixed header and the type byte of every data entry, so listing a large
+backup touches a few pages of the mapping. Entry contents are returned as
+slices of the archive buffer; only contents split over several chunks are
+copied, to join them.
+
+Layout (all big-endian)::
+
+    {Archive}  int magic, int version, pointer root {Node}, double reserved[4]
+    {Node}     int magic (0x00015555), int flags, pointer {Metadata}, double reserved,
+               {NodeEntries}
+    {NodeEntries}
+               list (0x00025555): int total, int children, int data, pointer more
+                                  {NodeEntries}, then `total` entries: children,
+                                  empty ones, data
+               table (0x00045555): int children, int data, then the entries
+    entry      pointer, int uuid
+    {Data}     int magic, int flags, long total size, long size, pointer next
+               {Chunk}, bytes[size]; the first byte is the content type
+    {Chunk}    int magic, long size, pointer next {Chunk}, bytes[size]
+
+Node metadata is a version 2 {Metadata} block stored as a data entry, i.e. 0x20
+bytes after the metadata pointer.
+"""
+
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from struct import Struct
+from struct import error as StructError
+from typing import Callable, Dict, Iterator, List, Optional, Union
+
+from .reader import INT, BufferReader
+from .summary import read_metadata, track_metadata
+
+ARCHIVE_HEADER = Struct(">llQ")
+NODE_HEADER = Struct(">llQd")
+LIST_HEADER = Struct(">llllQ")
+TABLE_HEADER = Struct(">ll")
+ENTRY = Struct(">Ql")
+DATA_HEADER = Struct(">llqqQ")
+CHUNK_HEADER = Struct(">lqQ")
+
+NODE_MAGIC = 0x00015555
+LIST_MAGIC = 0x00025555
+TABLE_MAGIC = 0x00045555
+
+ENTRY_TYPES = {101: "wpt", 102: "set", 103: "rte", 104: "trk", 105: "are"}
+TRACK_TYPE = 104
+# characters replaced in output file and folder names
+UNSAFE_CHARS = (";", ":", "!", "*", "/", "\\", ".", ",")
+
+
+class LDKFormatError(ValueError):
+    """Raised when an LDK archive does not have the expected structure."""
+
+
+@dataclass(frozen=True)
+class LDKEntry:
+    """One data entry of an archive: where it is and what it holds."""
+
+    path: str
+    uuid: int
+    type: int
+    size: int
+    offset: int
+
+    @property
+    def type_name(self) -> str:
+        return ENTRY_TYPES.get(self.type, str(self.type))
+
+
+class LDKArchive:
+    """Lazy index over an LDK buffer (bytes, memoryview or a mapped file)."""
+
+    def __init__(self, buffer: Union[bytes, bytearray, memoryview], reader: Optional[BufferReader] = None):
+        self.buf = memoryview(buffer)
+        self._reader = reader
+        if len(self.buf) < ARCHIVE_HEADER.size:
+            raise LDKFormatError("file too short for an LDK archive")
+        self.magic, self.version, self.root = ARCHIVE_HEADER.unpack_from(self.buf, 0)
+        self._entries: Optional[List[LDKEntry]] = None
+
+    @classmethod
+    def open(cls, path) -> "LDKArchive":
+        reader = BufferReader.open(path)
+        return cls(reader.buf, reader)
+
+    def close(self) -> None:
+        """Unmap an archive from open(); slices returned by read() must be released first."""
+        self.buf.release()
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+
+    def __enter__(self) -> "LDKArchive":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def entries(self) -> List[LDKEntry]:
+        """All data entries, depth first in archive order; built on first use."""
+        if self._entries is None:
+            self._entries = list(self._walk())
+        return self._entries
+
+    def tracks(self) -> List[LDKEntry]:
+        return [entry for entry in self.entries() if entry.type == TRACK_TYPE]
+
+    def find(self, key: str) -> LDKEntry:
+        """Return the entry with this path, or with this uuid (as 8 hex digits)."""
+        for entry in self.entries():
+            if entry.path == key or f"{entry.uuid:08X}" == key.upper():
+                return entry
+        raise KeyError(key)
+
+    def entry_at(self, offset: int, path: str = "", uuid: int = 0) -> LDKEntry:
+        """The entry whose data starts at offset, without walking the node tree."""
+        _, _, total, _, _ = DATA_HEADER.unpack_from(self.buf, offset)
+        kind = self.buf[offset + DATA_HEADER.size] if total else 0
+        # the content size excludes the type byte, like the bytes read() returns
+        return LDKEntry(path or f"{offset:#x}", uuid, kind, max(total - 1, 0), offset)
+
+    def output_paths(
+        self,
+        entries: List[LDKEntry],
+        out_dir: str,
+        suffix: str = ".gpx",
+        on_error: Optional[Callable[[LDKEntry, Exception], None]] = None,
+    ) -> List[str]:
+        """One output path per entry under out_dir: node folders, then the track name (or uuid) and suffix.
+
+        A track whose metadata cannot be read is named after its uuid and passed
+        to on_error (when given) instead of failing the whole archive.
+        """
+        result = []
+        used = set()
+        for entry in entries:
+            folders = [_safe_name(part) for part in entry.path.strip("/").split("/")[:-1]]
+            try:
+                name = track_metadata(self.read(entry)).get("name")
+            except (StructError, ValueError) as exc:
+                name = None
+                if on_error is not None:
+                    on_error(entry, exc)
+            stem = _safe_name(name) if isinstance(name, str) and _safe_name(name) else f"{entry.uuid:08X}"
+            path = os.path.join(out_dir, *folders, f"{stem}{suffix}")
+            if path in used:
+                path = os.path.join(out_dir, *folders, f"{stem} {entry.uuid:08X}{suffix}")
+            used.add(path)
+            result.append(path)
+        return result
+
+    def chunks(self, entry: LDKEntry) -> Iterator[memoryview]:
+        """Yield the content of entry (without its type byte) as slices of the archive."""
+        buf = self.buf
+        _, _, _, size, more = DATA_HEADER.unpack_from(buf, entry.offset)
+        start = entry.offset + DATA_HEADER.size
+        yield buf[start + 1:start + size]
+        seen = set()
+        while more:
+            if more in seen:
+                raise LDKFormatError(f"chunk loop at {more:#x}")
+            seen.add(more)
+            _, size, following = CHUNK_HEADER.unpack_from(buf, more)
+            start = more + CHUNK_HEADER.size
+            yield buf[start:start + size]
+            more = following
+
+    def read(self, entry: LDKEntry) -> Union[memoryview, bytes]:
+        """The content of entry: a zero-copy slice, or the joined chunks when it is split."""
+        chunks = list(self.chunks(entry))
+        if len(chunks) == 1:
+            return chunks[0]
+        return b"".join(chunks)
+
+    def _walk(self) -> Iterator[LDKEntry]:
+        buf = self.buf
+        visited = set()
+        stack = [(self.root, "/")]
+        while stack:
+            offset, path = stack.pop()
+            if offset in visited:
+                raise LDKFormatError(f"node loop at {offset:#x}")
+            visited.add(offset)
+            magic, _, _, _ = NODE_HEADER.unpack_from(buf, offset)
+            if magic != NODE_MAGIC:
+                raise LDKFormatError(f"no node at {offset:#x}")
+            children, data = self._node_entries(offset + NODE_HEADER.size)
+            for pointer, uuid in data:
+                yield self.entry_at(pointer, f"{path}{uuid:08X}", uuid)
+            # reversed, so the stack visits children in table order
+            for pointer, uuid in reversed(children):
+                name = self._node_name(pointer) or f"{uuid:08X}"
+                stack.append((pointer, f"{path}{name}/"))
+
+    def _node_entries(self, offset: int):
+        buf = self.buf
+        children: List[tuple] = []
+        data: List[tuple] = []
+        seen = set()
+        while offset:
+            if offset in seen:
+                raise LDKFormatError(f"entry table loop at {offset:#x}")
+            seen.add(offset)
+            magic = INT.unpack_from(buf, offset)[0]
+            if magic == LIST_MAGIC:
+                _, total, n_child, n_data, more = LIST_HEADER.unpack_from(buf, offset)
+                pos = offset + LIST_HEADER.size
+                n_empty = total - n_child - n_data
+            elif magic == TABLE_MAGIC:
+                n_child, n_data = TABLE_HEADER.unpack_from(buf, offset + 4)
+                pos = offset + 4 + TABLE_HEADER.size
+                n_empty, more = 0, 0
+            else:
+                raise LDKFormatError(f"no entry table at {offset:#x}")
+            for _ in range(n_child):
+                children.append(ENTRY.unpack_from(buf, pos))
+                pos += ENTRY.size
+            pos += n_empty * ENTRY.size
+            for _ in range(n_data):
+                data.append(ENTRY.unpack_from(buf, pos))
+                pos += ENTRY.size
+            offset = more
+        return children, data
+
+    def _node_name(self, offset: int) -> Optional[str]:
+        metadata_pointer = NODE_HEADER.unpack_from(self.buf, offset)[2]
+        if not metadata_pointer:
+            return None
+        metadata: Dict[str, object] = read_metadata(self.buf, metadata_pointer + DATA_HEADER.size)[0]
+        name = metadata.get("name")
+        if not isinstance(name, str) or not name:
+            return None
+        return name.replace("/", "-")
+
+
+def _safe_name(name: str) -> str:
+    for char in UNSAFE_CHARS:
+        name = name.replace(char, "-")
+    return name.strip()
@@ -0,0 +1,117 @@
+"""Conversion manifest for incremental batch runs.
+
+The manifest lives in the output directory and records, per source track, the
+size, mtime, content hash and conversion options of its last successful
+conversion. A re-run converts only tracks that are new, changed or converted
+with different options. Unchanged files are recognised from ``stat`` alone; the
+hash is only computed when size or mtime differ (e.g. after a copy that did not
+preserve timestamps), so a re-run over a large archive costs one stat per file.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+MANIFEST_NAME = ".alp2gpx-manifest.json"
+MANIFEST_VERSION = 1
+HASH_BLOCK = 1 << 20
+
+
+def file_digest(path: Path) -> str:
+    """Return the BLAKE2b content hash of a file as hex."""
+    digest = hashlib.blake2b(digest_size=20)
+    with path.open("rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class Manifest:
+    """Source -> last conversion record for one output directory."""
+
+    def __init__(self, out_dir: Path, entries: Optional[Dict[str, dict]] = None):
+        self.out_dir = out_dir
+        self.path = out_dir / MANIFEST_NAME
+        self.entries: Dict[str, dict] = entries or {}
+        self._pending: Dict[str, dict] = {}
+
+    @classmethod
+    def load(cls, out_dir: Path) -> "Manifest":
+        """Read the manifest in out_dir; a missing or unreadable one starts empty."""
+        try:
+            with (out_dir / MANIFEST_NAME).open(encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return cls(out_dir)
+        if not isinstance(data, dict) or data.get("version") != MANIFEST_VERSION:
+            return cls(out_dir)
+        return cls(out_dir, data.get("entries") or {})
+
+    def save(self) -> None:
+        """Write the manifest atomically (temporary file + rename)."""
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump({"version": MANIFEST_VERSION, "entries": self.entries}, f, indent=0, sort_keys=True)
+        os.replace(tmp, self.path)
+
+    @staticmethod
+    def key(path: Path) -> str:
+        return str(path.resolve())
+
+    def _output_name(self, output: Path) -> str:
+        # output relative to out_dir, so mirrored (dataset) layouts stay distinct; the
+        # bare file name of flat layouts is the same as in manifests written before
+        return output.relative_to(self.out_dir).as_posix()
+
+    def needs_conversion(self, path: Path, output: Path, options: dict) -> bool:
+        """True unless path was converted to output with these options and has not changed since."""
+        key = self.key(path)
+        try:
+            stat = path.stat()
+        except OSError:
+            return True  # let the conversion report it
+        name = self._output_name(output)
+        record = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "options": options, "output": name}
+        entry = self.entries.get(key)
+        if entry is not None and entry.get("options") == options and entry.get("output") == name and output.exists():
+            if entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns:
+                return False
+            if entry.get("size") == stat.st_size:
+                record["hash"] = file_digest(path)
+                if record["hash"] == entry.get("hash"):
+                    # touched or copied but identical: remember the new mtime and skip
+                    self.entries[key] = {**entry, "mtime_ns": stat.st_mtime_ns}
+                    return False
+        self._pending[key] = record
+        return True
+
+    def record(self, path: Path) -> None:
+        """Store the record prepared by needs_conversion after a successful conversion."""
+        key = self.key(path)
+        record = self._pending.pop(key, None)
+        if record is None:
+            return
+        if "hash" not in record:
+            record["hash"] = file_digest(path)
+        self.entries[key] = record
+
+    def forget(self, path: Path) -> None:
+        """Drop path after a failed conversion so the next run retries it."""
+        key = self.key(path)
+        self._pending.pop(key, None)
+        self.entries.pop(key, None)
+
+    def prune(self, sources: Iterable[Path]) -> List[Path]:
+        """Remove entries (and their outputs) whose source is not in sources; returns the removed outputs."""
+        keep = {self.key(path) for path in sources}
+        removed = []
+        for key in [key for key in self.entries if key not in keep]:
+            output = self.out_dir.joinpath(*self.entries.pop(key)["output"].split("/"))
+            if output.exists():
+                output.unlink()
+                removed.append(output)
+        return removed
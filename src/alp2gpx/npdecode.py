@@ -0,0 +1,123 @@
+"""Optional NumPy decoding of whole TRK v2/v3 location blocks."""
+
+from __future__ import annotations
+
+from typing import Dict, Optional, Tuple
+
+from .reader import INT
+
+try:
+    import numpy as np
+except ImportError:  # optional: the per-point decoder in alp2gpx is used instead
+    np = None
+
+HAVE_NUMPY = np is not None
+
+HEIGHT_MISSING = -999999999
+PRESSURE_MISSING = 999999999
+
+# byte offset within a record (size prefix included) and big-endian dtype of each field
+_V3_FIELDS = {
+    "lon": (4, ">i4"),
+    "lat": (8, ">i4"),
+    "height": (12, ">i4"),
+    "timestamp": (16, ">i8"),
+    "accuracy": (24, ">i4"),
+    "pressure": (28, ">i4"),
+}
+
+Columns = Dict[str, Tuple["np.ndarray", Optional["np.ndarray"]]]
+
+
+def v3_record_length(size: int) -> int:
+    """Bytes consumed by a v2/v3 record with the given size prefix (matches the per-point reader)."""
+    return 24 + (4 if size > 20 else 0) + (4 if size > 24 else 0)
+
+
+def _uniform_records(data, pos: int, count: int):
+    """Return a zero-copy structured view if all count records share the first record's size."""
+    size = INT.unpack_from(data, pos)[0]
+    stride = v3_record_length(size)
+    if pos + stride * count > len(data):
+        return None
+    sizes = np.ndarray((count,), dtype=">i4", buffer=data, offset=pos, strides=(stride,))
+    if not (sizes == size).all():
+        return None
+    names = ["lon", "lat", "height", "timestamp"]
+    if size > 20:
+        names.append("accuracy")
+    if size > 24:
+        names.append("pressure")
+    dtype = np.dtype(
+        {
+            "names": names,
+            "formats": [_V3_FIELDS[n][1] for n in names],
+            "offsets": [_V3_FIELDS[n][0] for n in names],
+            "itemsize": stride,
+        }
+    )
+    return np.ndarray((count,), dtype=dtype, buffer=data, offset=pos), size, pos + stride * count
+
+
+def _scan_offsets(data, pos: int, count: int):
+    offsets = np.empty(count, dtype=np.int64)
+    sizes = np.empty(count, dtype=np.int32)
+    unpack_from = INT.unpack_from
+    for i in range(count):
+        size = unpack_from(data, pos)[0]
+        offsets[i] = pos
+        sizes[i] = size
+        pos += v3_record_length(size)
+    return offsets, sizes, pos
+
+
+def _gather(raw, offsets, field: str):
+    start, fmt = _V3_FIELDS[field]
+    width = np.dtype(fmt).itemsize
+    idx = offsets[:, None] + np.arange(start, start + width)
+    return raw[idx].view(fmt).ravel()
+
+
+def decode_v3_columns(data, pos: int, count: int) -> Tuple[Columns, int]:
+    """Decode count v2/v3 location records starting at pos into column arrays.
+
+    Returns ({name: (values, valid)}, end offset) in the item types of
+    trackpoint.COLUMN_TYPES, ready for Segment.from_columns; valid is None when
+    every value is present, otherwise a boolean mask (sentinels and absent
+    fields are masked out).
+    """
+    raw = np.frombuffer(data, dtype=np.uint8)
+    uniform = _uniform_records(raw, pos, count)
+    if uniform is not None:
+        records, size, end = uniform
+        fields = {name: records[name] for name in records.dtype.names}
+        present = {name: None for name in fields}
+    else:
+        offsets, sizes, end = _scan_offsets(data, pos, count)
+        fields = {name: _gather(raw, offsets, name) for name in ("lon", "lat", "height", "timestamp")}
+        present = {name: None for name in fields}
+        for name, min_size in (("accuracy", 20), ("pressure", 24)):
+            mask = sizes > min_size
+            if mask.any():
+                values = np.zeros(count, dtype=_V3_FIELDS[name][1])
+                values[mask] = _gather(raw, offsets[mask], name)
+                fields[name] = values
+                present[name] = None if mask.all() else mask
+
+    columns: Columns = {
+        "lon": (fields["lon"].astype(np.float64) * 1e-7, None),
+        "lat": (fields["lat"].astype(np.float64) * 1e-7, None),
+        "timestamp": (fields["timestamp"].astype(np.float64) * 1e-3, None),
+    }
+    height = fields["height"]
+    valid = height != HEIGHT_MISSING
+    columns["elevation"] = (height.astype(np.float64) * 1e-3, None if valid.all() else valid)
+    if "accuracy" in fields:
+        columns["accuracy"] = (fields["accuracy"].astype(np.int32), present["accuracy"])
+    if "pressure" in fields:
+        pressure = fields["pressure"]
+        valid = pressure != PRESSURE_MISSING
+        if present["pressure"] is not None:
+            valid &= present["pressure"]
+        columns["pressure"] = (pressure.astype(np.float64) * 1e-3, None if valid.all() else valid)
+    return columns, end
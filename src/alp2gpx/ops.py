@@ -2,12 +2,19 @@
 
 from __future__ import annotations
 
+import io
 import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
 from pathlib import Path
 from struct import unpack
-from typing import Iterable, Tuple
+from typing import Iterable, Iterator, List, Tuple
 
 from .alp2gpx import alp2gpx
+from .cache import DEFAULT_MAX_BYTES
+from .formats import OUTPUT_FORMATS
+from .manifest import Manifest
+from .summary import read_metadata, stats_from_v4_summary
 
 
 def find_tracks(base_dir: Path) -> list[Path]:
@@ -57,23 +64,123 @@ def quick_stats_v3(path: Path) -> dict:
     }
 
 
+def quick_stats_v4(path: Path) -> dict:
+    """quick_stats_v3 for v4 files: decodes only the leading summary block."""
+    with path.open("rb") as f:
+        version, header = unpack(">ll", f.read(8))
+        # header is the offset of the first byte after the summary
+        data = f.read(max(0, header - 8))
+    summary, _ = read_metadata(data, 0)
+    return stats_from_v4_summary(4, header, summary)
+
+
+def quick_stats(path: Path) -> dict | None:
+    """Header stats of a v2/v3/v4 track without parsing its locations (None for other files)."""
+    version, header = read_header(path)
+    if not version:
+        return None
+    if version <= 3:
+        return quick_stats_v3(path)
+    return quick_stats_v4(path)
+
+
+def _fmt(value, spec: str = "", unit: str = "") -> str:
+    # v4 summaries may lack a value
+    return "?" if value is None else format(value, spec) + unit
+
+
 def format_summary_line(path: Path, stats: dict, verbose: int) -> str:
     parts = [f"{path}", f"version={stats['version']}", f"header={stats['header']}"]
     if verbose >= 1:
-        parts.append(f"loc={stats['loc']}")
-        parts.append(f"seg={stats['seg']}")
-        parts.append(f"wpt={stats['wpt']}")
+        parts.append(f"loc={_fmt(stats['loc'])}")
+        parts.append(f"seg={_fmt(stats['seg'])}")
+        parts.append(f"wpt={_fmt(stats['wpt'])}")
     if verbose >= 2:
-        parts.append(f"len={stats['length']:.1f}m")
-        parts.append(f"gain={stats['gain']:.1f}m")
-        parts.append(f"dur={stats['duration']}s")
+        parts.append(f"len={_fmt(stats['length'], '.1f', 'm')}")
+        parts.append(f"gain={_fmt(stats['gain'], '.1f', 'm')}")
+        parts.append(f"dur={_fmt(stats['duration'], '', 's')}")
     if verbose >= 3:
-        parts.append(f"len3d={stats['length3d']:.1f}m")
-        parts.append(f"lon0={stats['lon0']:.6f}")
-        parts.append(f"lat0={stats['lat0']:.6f}")
+        parts.append(f"len3d={_fmt(stats['length3d'], '.1f', 'm')}")
+        parts.append(f"lon0={_fmt(stats['lon0'], '.6f')}")
+        parts.append(f"lat0={_fmt(stats['lat0'], '.6f')}")
     return " ".join(parts)
 
 
+def _file_size(path: Path) -> int:
+    try:
+        return path.stat().st_size
+    except OSError:
+        return 0
+
+
+def output_path(path: Path, out_dir: Path, compress: str | None = None, output_format: str = "gpx", root: Path | None = None) -> Path:
+    """Batch output of track path: ``<stem>.gpx`` (or the format's suffix), plus ``.<compress>`` when compressing.
+
+    With root, the output keeps the track's directory relative to root.
+    """
+    if root is not None:
+        out_dir = out_dir / path.parent.relative_to(root)
+    name = f"{path.stem}{OUTPUT_FORMATS[output_format]}"
+    return out_dir / (f"{name}.{compress}" if compress else name)
+
+
+def _convert_one(idx: int, path: Path, out_dir: Path, options: dict, compress: str | None = None, root: Path | None = None) -> bool:
+    """Convert one track and print its report lines; failures are reported, not raised."""
+    version, header = read_header(path)
+    print(f"[{idx:02}] {path}\tversion={version}\theader={header}")
+    out_path = output_path(path, out_dir, compress, options["output_format"], root)
+    if root is not None:
+        # a part of the dataset: its file column is the track's path relative to root
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        options = dict(options, source_name=path.relative_to(root).as_posix())
+    try:
+        result = alp2gpx(str(path), str(out_path), **options)
+    except Exception as exc:
+        print(f"     !! {path}: {type(exc).__name__}: {exc}")
+        return False
+    geoid_note = ""
+    if result.geoid_points:
+        geoid_note = f", geoid={result.geoid_seconds:.3f}s"
+    elif result.geoid_skipped:
+        geoid_note = ", geoid=skipped"
+    cache_note = ", cached" if result.cache_hit else ""
+    removed_note = f", removed={result.removed_points}" if options["simplify"] else ""
+    print(f"     -> {out_path} (segments={result.segment_count}, points={result.point_count}{removed_note}, version={result.fileVersion}{geoid_note}{cache_note})")
+    return True
+
+
+def _convert_captured(idx: int, path: Path, out_dir: Path, options: dict, compress: str | None, root: Path | None) -> Tuple[str, bool]:
+    # pool worker: return the report (including alp2gpx's status line) instead of printing it
+    out = io.StringIO()
+    with redirect_stdout(out):
+        ok = _convert_one(idx, path, out_dir, options, compress, root)
+    return out.getvalue(), ok
+
+
+def _convert_parallel(tracks: List[Path], out_dir: Path, options: dict, jobs: int, compress: str | None, root: Path | None) -> Iterator[Tuple[Path, bool]]:
+    # largest files first so the longest conversions do not end up last on a single worker
+    order = sorted(range(len(tracks)), key=lambda i: _file_size(tracks[i]), reverse=True)
+    with ProcessPoolExecutor(max_workers=min(jobs, len(tracks))) as pool:
+        futures = {i: pool.submit(_convert_captured, i + 1, tracks[i], out_dir, options, compress, root) for i in order}
+        # report in input order, each file as soon as it and all files before it are done
+        for i, path in enumerate(tracks):
+            try:
+                report, ok = futures[i].result()
+            except Exception as exc:
+                report, ok = f"[{i + 1:02}] {path}\n     !! {path}: {type(exc).__name__}: {exc}\n", False
+            print(report, end="", flush=True)
+            yield path, ok
+
+
+def _convert_all(tracks: List[Path], out_dir: Path, options: dict, jobs: int, compress: str | None = None, root: Path | None = None) -> Iterator[Tuple[Path, bool]]:
+    """Convert tracks, printing each report; yields (path, ok) in input order."""
+    if jobs > 1 and len(tracks) > 1:
+        yield from _convert_parallel(tracks, out_dir, options, jobs, compress, root)
+        return
+    for idx, path in enumerate(tracks, start=1):
+        yield path, _convert_one(idx, path, out_dir, options, compress, root)
+
+
 def batch_convert(
     tracks: Iterable[Path],
     out_dir: Path,
@@ -83,27 +190,128 @@ def batch_convert(
     pretty: bool = False,
     verbose: int = 0,
     accuracy_contours: bool = False,
-) -> None:
+    contour_mode: str = "spherical",
+    simplify: float | None = None,
+    simplify_method: str = "visvalingam",
+    compress: str | None = None,
+    compress_level: int | None = None,
+    coordinate_digits: int | None = None,
+    elevation_digits: int | None = None,
+    time_milliseconds: bool = False,
+    output_format: str = "gpx",
+    geojson_geometry: str = "linestring",
+    dataset_root: Path | None = None,
+    geoid: bool = True,
+    geoid_grid: Path | None = None,
+    jobs: int = 1,
+    incremental: bool = False,
+    prune: bool = False,
+    cache_dir: Path | None = None,
+    cache_size: int = DEFAULT_MAX_BYTES >> 20,
+) -> int:
+    """Convert tracks into out_dir; returns the number of failed conversions.
+
+    With jobs > 1 (0 = one per CPU) conversions run in a process pool, largest
+    files first, and the per-file reports are printed in input order.
+    With incremental, only tracks that are new or changed since the last run
+    (or were converted with other options) are converted, see manifest.Manifest;
+    prune also deletes outputs whose source is no longer among tracks.
+    With cache_dir, decoded tracks are reused across runs (cache_size in MiB).
+    With simplify (metres), points within that tolerance of the simplified
+    line are dropped, see simplify.Simplifier.
+    With compress ("gz", "bz2" or "xz"), outputs are written compressed as
+    ``<stem>.gpx.<compress>`` at compress_level.
+    coordinate_digits/elevation_digits fix the decimals written (default repr);
+    time_milliseconds keeps the milliseconds of <time>.
+    output_format "geojson" or "ndjson" writes ``<stem>.geojson``/``<stem>.ndjson``
+    instead of GPX, see geojson.py (geojson_geometry picks the track geometry);
+    "parquet", "feather" or "npz" exports the trackpoints as typed columns, see
+    columnar.py. With dataset_root, those parts form one dataset: out_dir
+    mirrors the directories of the tracks under dataset_root, and the file
+    column holds each track's path relative to it.
+    """
     out_dir.mkdir(parents=True, exist_ok=True)
-    for idx, path in enumerate(tracks, start=1):
-        version, header = read_header(path)
-        if summary_only and verbose > 0 and version and version <= 3:
-            stats = quick_stats_v3(path)
-            print(format_summary_line(path, stats, verbose))
-            if limit and idx >= limit:
-                break
-            continue
-        else:
-            print(f"[{idx:02}] {path}\tversion={version}\theader={header}")
-            if summary_only:
-                if limit and idx >= limit:
-                    break
-                continue
-
-        out_path = out_dir / f"{path.stem}.gpx"
-        result = alp2gpx(str(path), str(out_path), include_extensions=include_extensions, pretty=pretty, verbose=verbose, accuracy_contours=accuracy_contours)
-        segments = len(result.segments or [])
-        points = sum(len(seg.points) for seg in result.segments or [])
-        print(f"     -> {out_path} (segments={segments}, points={points}, version={result.fileVersion})")
-        if limit and idx >= limit:
-            break
+    tracks = list(tracks)
+    if summary_only:
+        if limit:
+            tracks = tracks[:limit]
+        for idx, path in enumerate(tracks, start=1):
+            stats = quick_stats(path) if verbose > 0 else None
+            if stats is not None:
+                print(format_summary_line(path, stats, verbose))
+            else:
+                version, header = read_header(path)
+                print(f"[{idx:02}] {path}\tversion={version}\theader={header}")
+        return 0
+
+    options = dict(
+        include_extensions=include_extensions,
+        pretty=pretty,
+        verbose=verbose,
+        accuracy_contours=accuracy_contours,
+        contour_mode=contour_mode,
+        simplify=simplify,
+        simplify_method=simplify_method,
+        compress_level=compress_level,
+        coordinate_digits=coordinate_digits,
+        elevation_digits=elevation_digits,
+        time_milliseconds=time_milliseconds,
+        output_format=output_format,
+        geojson_geometry=geojson_geometry,
+        geoid=geoid,
+        geoid_grid=str(geoid_grid) if geoid_grid else None,
+        cache_dir=str(cache_dir) if cache_dir else None,
+        cache_max_bytes=cache_size << 20,
+    )
+    if jobs < 1:
+        jobs = os.cpu_count() or 1
+
+    manifest = None
+    pending = tracks
+    if incremental or prune:
+        manifest = Manifest.load(out_dir)
+        if prune:
+            for output in manifest.prune(tracks):
+                print(f"     xx {output} (source removed)")
+    if incremental:
+        # verbosity and caching do not change the GPX
+        fingerprint = {key: value for key, value in options.items() if key not in ("verbose", "cache_dir", "cache_max_bytes")}
+        if not accuracy_contours:
+            # nor does the contour mode without contours
+            del fingerprint["contour_mode"]
+        if not simplify:
+            del fingerprint["simplify"], fingerprint["simplify_method"]
+        # the compression format is part of the output name
+        if not compress:
+            del fingerprint["compress_level"]
+        for key in ("coordinate_digits", "elevation_digits"):
+            if fingerprint[key] is None:
+                del fingerprint[key]
+        if not time_milliseconds:
+            del fingerprint["time_milliseconds"]
+        # the format is part of the output name; the geometry only matters for GeoJSON
+        del fingerprint["output_format"]
+        if output_format != "geojson":
+            del fingerprint["geojson_geometry"]
+        if dataset_root is not None:
+            # the file column is relative to the root
+            fingerprint["dataset"] = True
+        pending = [path for path in tracks if manifest.needs_conversion(path, output_path(path, out_dir, compress, output_format, dataset_root), fingerprint)]
+        print(f"{len(tracks) - len(pending)} unchanged, {len(pending)} to convert")
+    # with a manifest, --limit caps the conversions of this run
+    if limit:
+        pending = pending[:limit]
+
+    failed = 0
+    try:
+        for path, ok in _convert_all(pending, out_dir, options, jobs, compress, dataset_root):
+            failed += not ok
+            if incremental:
+                if ok:
+                    manifest.record(path)
+                else:
+                    manifest.forget(path)
+    finally:
+        if manifest is not None:
+            manifest.save()
+    return failed
@@ -0,0 +1,92 @@
+"""Zero-copy binary reader over memory-mapped TRK files and in-memory LDK entries."""
+
+from __future__ import annotations
+
+import mmap
+from struct import Struct
+from typing import Optional, Union
+
+INT = Struct(">l")
+LONG = Struct(">q")
+DOUBLE = Struct(">d")
+POINTER = Struct(">Q")
+
+
+class BufferReader:
+    """File-like cursor over a buffer, decoding big-endian fields with precompiled structs.
+
+    Supports the ``seek``/``tell``/``read`` subset used by the parser, plus typed
+    ``read_*`` helpers that ``unpack_from`` at the current offset instead of
+    slicing a new bytes object for every field.
+    """
+
+    def __init__(self, buffer: Union[bytes, bytearray, memoryview, mmap.mmap], owner: Optional[mmap.mmap] = None):
+        self.buf = memoryview(buffer)
+        self.pos = 0
+        self._mmap = owner
+
+    @classmethod
+    def open(cls, path) -> "BufferReader":
+        """Map the file at path read-only (empty files fall back to an empty buffer)."""
+        with open(path, "rb") as f:
+            try:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                return cls(f.read())
+        return cls(mm, owner=mm)
+
+    def close(self) -> None:
+        self.buf.release()
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def __len__(self) -> int:
+        return len(self.buf)
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        if whence == 1:
+            offset += self.pos
+        elif whence == 2:
+            offset += len(self.buf)
+        self.pos = offset
+        return offset
+
+    def tell(self) -> int:
+        return self.pos
+
+    def read(self, size: int = -1) -> bytes:
+        start = self.pos
+        data = self.buf[start:].tobytes() if size < 0 else self.buf[start:start + size].tobytes()
+        self.pos = start + len(data)
+        return data
+
+    def view(self, size: int = -1) -> memoryview:
+        """Return the next size bytes as a memoryview slice without copying."""
+        start = self.pos
+        data = self.buf[start:] if size < 0 else self.buf[start:start + size]
+        self.pos = start + len(data)
+        return data
+
+    def read_int(self) -> int:
+        value = INT.unpack_from(self.buf, self.pos)[0]
+        self.pos += 4
+        return value
+
+    def read_long(self) -> int:
+        value = LONG.unpack_from(self.buf, self.pos)[0]
+        self.pos += 8
+        return value
+
+    def read_double(self) -> float:
+        value = DOUBLE.unpack_from(self.buf, self.pos)[0]
+        self.pos += 8
+        return value
+
+    def read_pointer(self) -> int:
+        value = POINTER.unpack_from(self.buf, self.pos)[0]
+        self.pos += 8
+        return value
+
+    def read_coordinate(self) -> float:
+        return self.read_int() * 1e-7
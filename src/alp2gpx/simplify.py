@@ -0,0 +1,182 @@
+"""Trackpoint simplification: drop points that do not change the line shape.
+
+Points are projected onto a local east-north plane in metres (longitude scaled
+by the cosine of the chunk's first latitude), then thinned with either
+
+- ``visvalingam`` (the default): repeatedly remove the point whose triangle
+  with its neighbours has the smallest area (kept in a heap, O(n log n) on any
+  input) until every remaining triangle is at least ``tolerance ** 2`` square
+  metres.
+- ``douglas-peucker``: keep the point farthest from the chord between two kept
+  points while it is more than the tolerance away; expected O(n log n) on
+  recorded tracks, but O(n^2) for pathological input (each split scans its
+  range linearly). With NumPy the distances of long ranges are computed in
+  array operations.
+
+Segments arrive in chunks (see alp2gpx.CHUNK_POINTS); each chunk is simplified
+on its own with its first and last points kept, so memory stays bounded and
+the line between chunks is unchanged. Kept points retain every column
+(timestamps, elevations and the aq: extension fields).
+"""
+
+from __future__ import annotations
+
+import heapq
+import math
+from typing import Sequence
+
+from .contours import METRES_PER_DEGREE
+from .trackpoint import Segment
+
+try:
+    import numpy as np
+except ImportError:  # optional: Douglas-Peucker scans every range point by point
+    np = None
+
+HAVE_NUMPY = np is not None
+
+# the first is the default: heap-based, O(n log n) on any input
+SIMPLIFY_METHODS = ("visvalingam", "douglas-peucker")
+# Douglas-Peucker ranges at least this long are scanned with NumPy
+NUMPY_MIN_RANGE = 256
+
+
+def _project(lat: Sequence[float], lon: Sequence[float]):
+    # equirectangular around the first point; distortion is negligible within a chunk
+    scale = math.cos(math.radians(lat[0])) * METRES_PER_DEGREE
+    lat0, lon0 = lat[0], lon[0]
+    x = [(value - lon0) * scale for value in lon]
+    y = [(value - lat0) * METRES_PER_DEGREE for value in lat]
+    return x, y
+
+
+def _farthest(x, y, first: int, last: int):
+    # (squared distance, index) of the point of first+1..last-1 farthest from the chord first-last
+    x0, y0 = x[first], y[first]
+    dx, dy = x[last] - x0, y[last] - y0
+    norm2 = dx * dx + dy * dy
+    best, index = -1.0, first
+    for i in range(first + 1, last):
+        px, py = x[i] - x0, y[i] - y0
+        if norm2 > 0:
+            t = min(max((px * dx + py * dy) / norm2, 0.0), 1.0)
+            px -= t * dx
+            py -= t * dy
+        d2 = px * px + py * py
+        if d2 > best:
+            best, index = d2, i
+    return best, index
+
+
+def _farthest_arrays(x, y, first: int, last: int):
+    # _farthest with the same operations element-wise (argmax also picks the first maximum)
+    x0, y0 = x[first], y[first]
+    dx, dy = x[last] - x0, y[last] - y0
+    norm2 = dx * dx + dy * dy
+    px = x[first + 1:last] - x0
+    py = y[first + 1:last] - y0
+    if norm2 > 0:
+        t = np.minimum(np.maximum((px * dx + py * dy) / norm2, 0.0), 1.0)
+        px = px - t * dx
+        py = py - t * dy
+    d2 = px * px + py * py
+    i = int(np.argmax(d2))
+    return float(d2[i]), first + 1 + i
+
+
+def douglas_peucker(x: Sequence[float], y: Sequence[float], tolerance: float) -> bytearray:
+    """Keep mask (1 = keep) of the planar polyline x/y for a distance tolerance."""
+    n = len(x)
+    keep = bytearray(n)
+    if n == 0:
+        return keep
+    keep[0] = keep[-1] = 1
+    tolerance2 = tolerance * tolerance
+    xa = ya = None
+    if HAVE_NUMPY and n >= NUMPY_MIN_RANGE:
+        xa, ya = np.asarray(x, dtype="f8"), np.asarray(y, dtype="f8")
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        if xa is not None and last - first >= NUMPY_MIN_RANGE:
+            best, index = _farthest_arrays(xa, ya, first, last)
+        else:
+            best, index = _farthest(x, y, first, last)
+        if best > tolerance2:
+            keep[index] = 1
+            stack.append((index, last))
+            stack.append((first, index))
+    return keep
+
+
+def visvalingam(x: Sequence[float], y: Sequence[float], tolerance: float) -> bytearray:
+    """Keep mask (1 = keep) of the planar polyline x/y; triangles under tolerance**2 are removed."""
+    n = len(x)
+    keep = bytearray(b"\x01") * n
+    if n < 3:
+        return keep
+    threshold = tolerance * tolerance
+    prev = list(range(-1, n - 1))
+    nxt = list(range(1, n + 1))
+
+    def area(a: int, b: int, c: int) -> float:
+        return abs((x[b] - x[a]) * (y[c] - y[a]) - (x[c] - x[a]) * (y[b] - y[a])) * 0.5
+
+    areas = [math.inf] * n
+    for i in range(1, n - 1):
+        areas[i] = area(i - 1, i, i + 1)
+    heap = [(areas[i], i) for i in range(1, n - 1)]
+    heapq.heapify(heap)
+    while heap:
+        value, i = heapq.heappop(heap)
+        if not keep[i] or value != areas[i]:
+            continue  # removed, or superseded by a later push
+        if value >= threshold:
+            break
+        keep[i] = 0
+        before, after = prev[i], nxt[i]
+        nxt[before] = after
+        prev[after] = before
+        for j in (before, after):
+            if 0 < j < n - 1:
+                # an effective area never drops below that of a point removed before it
+                areas[j] = max(area(prev[j], j, nxt[j]), value)
+                heapq.heappush(heap, (areas[j], j))
+    return keep
+
+
+def simplify_mask(lat: Sequence[float], lon: Sequence[float], tolerance_m: float, method: str = "visvalingam") -> bytearray:
+    """Keep mask (1 = keep) of a lat/lon polyline in degrees for a tolerance in metres."""
+    if len(lat) < 3:
+        return bytearray(b"\x01") * len(lat)
+    x, y = _project(lat, lon)
+    if method == "douglas-peucker":
+        return douglas_peucker(x, y, tolerance_m)
+    if method == "visvalingam":
+        return visvalingam(x, y, tolerance_m)
+    raise ValueError(f"unknown simplification method {method!r} (expected one of {', '.join(SIMPLIFY_METHODS)})")
+
+
+class Simplifier:
+    """Simplify streamed segment chunks; ``removed`` counts the points dropped so far."""
+
+    def __init__(self, tolerance_m: float, method: str = "visvalingam"):
+        if method not in SIMPLIFY_METHODS:
+            raise ValueError(f"unknown simplification method {method!r} (expected one of {', '.join(SIMPLIFY_METHODS)})")
+        if not tolerance_m > 0:
+            raise ValueError(f"simplification tolerance must be positive, got {tolerance_m}")
+        self.tolerance_m = tolerance_m
+        self.method = method
+        self.removed = 0
+
+    def __call__(self, chunk: Segment) -> Segment:
+        if len(chunk) < 3:
+            return chunk
+        keep = simplify_mask(chunk.columns["lat"], chunk.columns["lon"], self.tolerance_m, self.method)
+        kept = keep.count(1)
+        if kept == len(chunk):
+            return chunk
+        self.removed += len(chunk) - kept
+        return chunk.select(keep)
@@ -0,0 +1,123 @@
+"""Header statistics of TRK v4 files from the leading summary block.
+
+A v4 file starts with ``version, offset of the first byte after the summary``
+followed by the summary, a metadata block (name -> value) that AlpineQuest fills
+with the first location and track totals. Reading it needs only those first
+bytes, so summarizing a v4 file never touches the locations.
+"""
+
+from __future__ import annotations
+
+from struct import unpack_from
+from typing import Callable, Optional, Tuple
+
+from .reader import DOUBLE, INT, LONG, BufferReader
+
+# quick_stats field -> summary metadata key
+V4_SUMMARY_KEYS = {
+    "loc": "nloc",
+    "seg": "nseg",
+    "wpt": "nwpt",
+    "lon0": "lon",
+    "lat0": "lat",
+    "ts0": "dte",
+    "length": "len",
+    "length3d": "len3d",
+    "gain": "gain",
+    "duration": "dur",
+}
+
+
+def _utf8(raw: bytes) -> str:
+    return raw.decode("utf-8", "replace")
+
+
+def read_metadata(buf, pos: int, decode: Callable[[bytes], str] = _utf8) -> Tuple[dict, int]:
+    """Decode a TRK metadata block at pos; returns (entries, end offset).
+
+    Strings are decoded as UTF-8 (with replacement) unless another decode is
+    given; the full parser's codec probing is not needed for the summary keys
+    and numbers.
+    """
+    count = INT.unpack_from(buf, pos)[0]
+    pos += 4
+    result = {}
+    for _ in range(count):
+        size = INT.unpack_from(buf, pos)[0]
+        name = decode(bytes(buf[pos + 4:pos + 4 + size]))
+        pos += 4 + size
+        kind = INT.unpack_from(buf, pos)[0]
+        pos += 4
+        if kind == -1:
+            value = unpack_from("c", buf, pos)[0]
+            pos += 1
+        elif kind == -2:
+            value = LONG.unpack_from(buf, pos)[0]
+            pos += 8
+        elif kind == -3:
+            value = DOUBLE.unpack_from(buf, pos)[0]
+            pos += 8
+        elif kind == -4:
+            size = INT.unpack_from(buf, pos)[0]
+            value = bytes(buf[pos + 4:pos + 4 + size])
+            pos += 4 + size
+        elif kind >= 0:
+            value = decode(bytes(buf[pos:pos + kind]))
+            pos += kind
+        else:
+            raise ValueError(f"unknown metadata value type {kind}")
+        result[name] = value
+    return result, pos
+
+
+def _coordinate(value) -> Optional[float]:
+    # stored as 1e-7 degree integers like every TRK coordinate; doubles are taken as degrees
+    if isinstance(value, int):
+        return value * 1e-7
+    return value if isinstance(value, float) else None
+
+
+def _number(value):
+    return value if isinstance(value, (int, float)) else None
+
+
+def stats_from_v4_summary(version: int, header: int, summary: dict) -> dict:
+    """Map a decoded v4 summary to the quick_stats_v3 dict; absent values are None."""
+    get = {field: summary.get(key) for field, key in V4_SUMMARY_KEYS.items()}
+    dte = _number(get["ts0"])
+    return {
+        "version": version,
+        "header": header,
+        "loc": _number(get["loc"]),
+        "seg": _number(get["seg"]),
+        "wpt": _number(get["wpt"]),
+        "lon0": _coordinate(get["lon0"]),
+        "lat0": _coordinate(get["lat0"]),
+        "ts0": dte / 1000.0 if dte is not None else None,
+        "length": _number(get["length"]),
+        "length3d": _number(get["length3d"]),
+        "gain": _number(get["gain"]),
+        "duration": _number(get["duration"]),
+    }
+
+
+def read_track_metadata(path, decode: Callable[[bytes], str] = _utf8) -> dict:
+    """Decode only the track metadata block (name, description, ...) of a v2/v3/v4 file.
+
+    The block follows the header in every version: ``version, header size,
+    header bytes`` for v3 and ``version, summary end, summary, two ints`` for v4
+    both put it at ``header + 8``.
+    """
+    reader = BufferReader.open(path)
+    try:
+        return track_metadata(reader.buf, decode)
+    finally:
+        reader.close()
+
+
+def track_metadata(buf, decode: Callable[[bytes], str] = _utf8) -> dict:
+    """read_track_metadata for a TRK file already in memory (e.g. an LDK entry)."""
+    if len(buf) < 8:
+        return {}
+    header = INT.unpack_from(buf, 4)[0]
+    return read_metadata(buf, header + 8, decode)[0]
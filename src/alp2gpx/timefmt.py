@@ -0,0 +1,78 @@
+"""GPX <time> formatting for consecutive trackpoint timestamps.
+
+``TimeFormatter`` renders POSIX timestamps exactly like
+``datetime.utcfromtimestamp(t).strftime("%Y-%m-%dT%H:%M:%SZ")`` (including its
+round-half-even to microseconds) without building a datetime per point: the
+date prefix is rebuilt only when the day changes, hours/minutes and seconds
+come from small lookup tables, and the last rendered second is reused, which
+covers 1 Hz and faster logs and the contour copies of the same points.
+"""
+
+from __future__ import annotations
+
+import math
+from datetime import date
+from typing import Optional
+
+SECONDS_PER_DAY = 86400
+# date.toordinal() of 1970-01-01
+EPOCH_ORDINAL = 719163
+MAX_ORDINAL = date.max.toordinal()
+_HOUR_MINUTE = [f"{hour:02d}:{minute:02d}:" for hour in range(24) for minute in range(60)]
+_SECOND = [f"{second:02d}" for second in range(60)]
+
+
+class TimeFormatter:
+    """Callable mapping a timestamp (seconds, or None) to a GPX time string or None.
+
+    With milliseconds, the fraction is kept as ``.fff`` (truncated like
+    strftime's ``%f``); the default drops it like the ``%S`` format.
+    """
+
+    def __init__(self, milliseconds: bool = False):
+        self.milliseconds = milliseconds
+        # first second of the day of the cached prefix (an empty day range until the first call)
+        self._day_start = 0
+        self._day_end = 0
+        self._prefix = ""
+        self._second: Optional[float] = None
+        self._text = ""
+
+    def __call__(self, timestamp: Optional[float]) -> Optional[str]:
+        if timestamp is None:
+            return None
+        try:
+            # split like datetime.utcfromtimestamp: whole seconds + microseconds rounded half-even
+            fraction, whole = math.modf(timestamp)
+            micros = round(fraction * 1e6)
+        except (TypeError, ValueError, OverflowError):
+            return None
+        if micros >= 1000000:
+            whole += 1.0
+            micros -= 1000000
+        elif micros < 0:
+            whole -= 1.0
+            micros += 1000000
+        if whole != self._second:
+            if not self._day_start <= whole < self._day_end and not self._start_day(whole):
+                return None
+            second = int(whole) - self._day_start
+            self._second = whole
+            self._text = f"{self._prefix}{_HOUR_MINUTE[second // 60]}{_SECOND[second % 60]}"
+        if self.milliseconds:
+            return f"{self._text}.{micros // 1000:03d}Z"
+        return f"{self._text}Z"
+
+    def _start_day(self, whole: float) -> bool:
+        if math.isinf(whole):
+            return False
+        day = int(whole) // SECONDS_PER_DAY
+        ordinal = EPOCH_ORDINAL + day
+        if not 1 <= ordinal <= MAX_ORDINAL:
+            return False
+        moment = date.fromordinal(ordinal)
+        # %Y is not zero-padded for years before 1000
+        self._prefix = f"{moment.year}-{moment.month:02d}-{moment.day:02d}T"
+        self._day_start = day * SECONDS_PER_DAY
+        self._day_end = self._day_start + SECONDS_PER_DAY
+        return True
@@ -1,7 +1,10 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import List, Optional, Tuple
+from array import array
+from dataclasses import dataclass, fields
+from itertools import compress, repeat
+from operator import attrgetter
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
 
 AQ_NS = "https://alpinequest.net/xmlschemas/gpx/trackpoint/1"
 
@@ -53,10 +56,195 @@ class TrackPoint:
         )
 
 
-@dataclass
+FIELDS: Tuple[str, ...] = tuple(f.name for f in fields(TrackPoint))
+_point_values = attrgetter(*FIELDS)
+
+# array typecode per TrackPoint field; None keeps Python objects in a list.
+COLUMN_TYPES = {
+    "lat": "d",
+    "lon": "d",
+    "elevation": "d",
+    "timestamp": "d",
+    "accuracy": "i",
+    "vertical_accuracy": "d",
+    "pressure": "d",
+    "battery": "h",
+    "sat_gps": "h",
+    "sat_glo": "h",
+    "sat_bds": "h",
+    "sat_gal": "h",
+    "network_type": None,
+    "network_signal_percent": "h",
+    "network_signal_dbm": "h",
+    "network_code": "h",
+    "network_signal_raw": "h",
+    "inclination": "d",
+    "magnetic_field": "d",
+    "elevation_wgs84": "d",
+    "elevation_dem": "d",
+}
+REQUIRED_COLUMNS = ("lat", "lon")
+# fields written as aq: extensions, in GPX element order
+EXTENSION_FIELDS = (
+    "accuracy",
+    "vertical_accuracy",
+    "pressure",
+    "battery",
+    "elevation_wgs84",
+    "elevation_dem",
+    "sat_gps",
+    "sat_glo",
+    "sat_bds",
+    "sat_gal",
+    "network_type",
+    "network_signal_percent",
+    "network_signal_dbm",
+    "inclination",
+    "magnetic_field",
+)
+
+
+def _masked(value, ok):
+    return value if ok else None
+
+
 class Segment:
-    meta: dict
-    points: List[TrackPoint]
+    """Columnar (struct-of-arrays) storage for the points of one track segment.
+
+    Every TrackPoint field is an ``array.array`` column; optional fields carry a
+    ``bytearray`` validity mask and are only allocated once a value appears.
+    ``points`` (or iterating the segment) yields lightweight TrackPoint rows for
+    callers that work point by point.
+    """
+
+    def __init__(self, meta: Optional[dict] = None, points: Iterable[TrackPoint] = ()):
+        self.meta = meta if meta is not None else {}
+        self.columns: Dict[str, Union[array, list]] = {name: array(COLUMN_TYPES[name]) for name in REQUIRED_COLUMNS}
+        self.valid: Dict[str, bytearray] = {}
+        self._len = 0
+        self._refresh()
+        for point in points:
+            self.append(point)
+
+    @classmethod
+    def from_columns(cls, meta: Optional[dict], count: int, columns: Dict[str, Tuple[Sequence, Optional[Sequence]]]) -> "Segment":
+        """Build a segment from whole columns given as {name: (values, valid mask or None)}.
+
+        Values exposing ``tobytes`` (array.array, NumPy) are copied as raw
+        memory and must already have the column's item type.
+        """
+        segment = cls(meta)
+        for name, (values, valid) in columns.items():
+            typecode = COLUMN_TYPES[name]
+            if typecode is None:
+                column = list(values)
+            else:
+                column = array(typecode)
+                if hasattr(values, "tobytes"):
+                    column.frombytes(values.tobytes())
+                else:
+                    column.extend(values)
+            segment.columns[name] = column
+            if name not in REQUIRED_COLUMNS and typecode is not None:
+                segment.valid[name] = bytearray(b"\x01") * count if valid is None else bytearray(bytes(valid))
+        segment._len = count
+        segment._refresh()
+        return segment
+
+    def _refresh(self) -> None:
+        index = {name: i for i, name in enumerate(FIELDS)}
+        self._active = tuple((index[name], column, self.valid.get(name)) for name, column in self.columns.items())
+        self._missing = tuple(index[name] for name in FIELDS if name not in self.columns)
+
+    def _add_column(self, name: str) -> None:
+        typecode = COLUMN_TYPES[name]
+        if typecode is None:
+            self.columns[name] = [None] * self._len
+        else:
+            self.columns[name] = array(typecode, bytes(array(typecode).itemsize * self._len))
+            self.valid[name] = bytearray(self._len)
+        self._refresh()
+
+    def append_row(self, row: Sequence) -> None:
+        """Append one point given as values in TrackPoint field order (None = missing)."""
+        for i, column, mask in self._active:
+            value = row[i]
+            if mask is None:
+                column.append(value)
+            elif value is None:
+                column.append(0)
+                mask.append(0)
+            else:
+                column.append(value)
+                mask.append(1)
+        for i in self._missing:
+            if row[i] is not None:
+                # first value of this field: backfill earlier rows as missing
+                name = FIELDS[i]
+                self._add_column(name)
+                self.columns[name].append(row[i])
+                if name in self.valid:
+                    self.valid[name].append(1)
+        self._len += 1
+
+    def append(self, point: TrackPoint) -> None:
+        self.append_row(_point_values(point))
+
+    def column(self, name: str) -> Iterator:
+        """Iterate one field's values, None where missing."""
+        column = self.columns.get(name)
+        if column is None:
+            return repeat(None, self._len)
+        mask = self.valid.get(name)
+        if mask is None or mask.find(0) == -1:
+            return iter(column)
+        return map(_masked, column, mask)
+
+    def has_extensions(self) -> bool:
+        """True if any point carries a value for one of EXTENSION_FIELDS."""
+        for name in EXTENSION_FIELDS:
+            column = self.columns.get(name)
+            if column is None:
+                continue
+            mask = self.valid.get(name)
+            if mask is None:
+                if any(value is not None for value in column):
+                    return True
+            elif mask.find(1) != -1:
+                return True
+        return False
+
+    def select(self, keep: Sequence[int]) -> "Segment":
+        """A new segment with the points whose keep flag is set, every column included."""
+        columns = {}
+        for name, column in self.columns.items():
+            values = list(compress(column, keep)) if COLUMN_TYPES[name] is None else array(column.typecode, compress(column, keep))
+            mask = self.valid.get(name)
+            columns[name] = (values, None if mask is None else bytearray(compress(mask, keep)))
+        return Segment.from_columns(self.meta, sum(1 for flag in keep if flag), columns)
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self) -> Iterator[TrackPoint]:
+        return map(TrackPoint, *[self.column(name) for name in FIELDS])
+
+    def __getitem__(self, index: int) -> TrackPoint:
+        if index < 0:
+            index += self._len
+        if not 0 <= index < self._len:
+            raise IndexError("segment index out of range")
+        values = []
+        for name in FIELDS:
+            column = self.columns.get(name)
+            mask = self.valid.get(name)
+            values.append(None if column is None or (mask is not None and not mask[index]) else column[index])
+        return TrackPoint(*values)
+
+    @property
+    def points(self) -> "Segment":
+        """Row view kept for point-by-point callers (supports len, iteration and indexing)."""
+        return self
 
 
 def parse_satellites(raw: bytes) -> Tuple[int | None, int | None, int | None, int | None]:
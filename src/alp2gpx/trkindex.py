@@ -0,0 +1,220 @@
+"""SQLite index of TRK header statistics.
+
+One row per track holds what ``--summary-only -vvv`` prints (counts, totals,
+first location and time) plus the track metadata, all read from the file
+header without touching the locations. Rows are keyed by resolved path and
+refreshed when a file's size or mtime changes, so re-indexing a large archive
+costs one stat per unchanged file. Queries run against the database only.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import sys
+from datetime import datetime
+from pathlib import Path
+from struct import error as StructError
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from .alp2gpx import CODECS
+from .ops import quick_stats
+from .summary import read_track_metadata
+
+SCHEMA_VERSION = 1
+# rows written per executemany / transaction
+INSERT_BATCH = 500
+
+COLUMNS = (
+    "path", "size", "mtime_ns", "version", "header",
+    "loc", "seg", "wpt", "lon0", "lat0", "ts0",
+    "length", "length3d", "gain", "duration",
+    "name", "metadata",
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tracks (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    version INTEGER,
+    header INTEGER,
+    loc INTEGER,
+    seg INTEGER,
+    wpt INTEGER,
+    lon0 REAL,
+    lat0 REAL,
+    ts0 REAL,
+    length REAL,
+    length3d REAL,
+    gain REAL,
+    duration INTEGER,
+    name TEXT,
+    metadata TEXT
+);
+CREATE INDEX IF NOT EXISTS tracks_ts0 ON tracks (ts0);
+CREATE INDEX IF NOT EXISTS tracks_length ON tracks (length);
+"""
+
+
+def _decode_string(raw: bytes) -> str:
+    # same order as the parser: UTF-8, then the legacy codecs
+    try:
+        return raw.decode("utf-8")
+    except UnicodeDecodeError:
+        pass
+    for charset in CODECS:
+        try:
+            return raw.decode(charset)
+        except (UnicodeDecodeError, LookupError):
+            continue
+    return raw.decode("utf-8", "replace")
+
+
+def open_index(path: Path) -> sqlite3.Connection:
+    """Open (creating if needed) the index database at path."""
+    conn = sqlite3.connect(str(path))
+    conn.row_factory = sqlite3.Row
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version not in (0, SCHEMA_VERSION):
+        conn.close()
+        raise ValueError(f"{path}: index schema version {version} is not supported (expected {SCHEMA_VERSION})")
+    conn.executescript(SCHEMA)
+    conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    return conn
+
+
+def _track_row(path: Path, key: str, size: int, mtime_ns: int) -> Optional[tuple]:
+    stats = quick_stats(path)
+    if stats is None:
+        return None
+    metadata = read_track_metadata(path, _decode_string)
+    # only text and numbers are kept (booleans and raw blobs are bytes)
+    metadata = {name: value for name, value in metadata.items() if isinstance(value, (str, int, float))}
+    name = metadata.get("name")
+    return (key, size, mtime_ns) + tuple(stats[column] for column in COLUMNS[3:15]) + (
+        name if isinstance(name, str) else None,
+        json.dumps(metadata, ensure_ascii=False, sort_keys=True),
+    )
+
+
+def build_index(db_path: Path, tracks: Iterable[Path], root: Optional[Path] = None) -> Tuple[int, int, int]:
+    """Add or refresh the rows of tracks; returns (indexed, unchanged, removed).
+
+    With root, rows under root whose file is no longer among tracks are
+    deleted. Unreadable files are reported on stderr and skipped.
+    """
+    conn = open_index(db_path)
+    try:
+        known = {row["path"]: (row["size"], row["mtime_ns"]) for row in conn.execute("SELECT path, size, mtime_ns FROM tracks")}
+        seen = set()
+        pending: List[tuple] = []
+        indexed = unchanged = 0
+        insert = f"INSERT OR REPLACE INTO tracks ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})"
+        for path in tracks:
+            key = str(path.resolve())
+            seen.add(key)
+            try:
+                stat = path.stat()
+                if known.get(key) == (stat.st_size, stat.st_mtime_ns):
+                    unchanged += 1
+                    continue
+                row = _track_row(path, key, stat.st_size, stat.st_mtime_ns)
+            except (OSError, ValueError, StructError) as exc:
+                print(f"!! {path}: {type(exc).__name__}: {exc}", file=sys.stderr)
+                continue
+            if row is None:
+                continue
+            pending.append(row)
+            indexed += 1
+            if len(pending) == INSERT_BATCH:
+                with conn:
+                    conn.executemany(insert, pending)
+                pending = []
+        if pending:
+            with conn:
+                conn.executemany(insert, pending)
+
+        removed = 0
+        if root is not None:
+            prefix = str(root.resolve()).rstrip(os.sep) + os.sep
+            stale = [(key,) for key in known if key.startswith(prefix) and key not in seen]
+            with conn:
+                conn.executemany("DELETE FROM tracks WHERE path = ?", stale)
+            removed = len(stale)
+        return indexed, unchanged, removed
+    finally:
+        conn.close()
+
+
+def _day_start(text: str) -> float:
+    return datetime.fromisoformat(text).timestamp()
+
+
+def _day_end(text: str) -> float:
+    # a bare date includes the whole day
+    moment = datetime.fromisoformat(text)
+    if len(text) == 10:
+        return moment.timestamp() + 86400
+    return moment.timestamp()
+
+
+def query_index(
+    db_path: Path,
+    version: Optional[int] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    min_length: Optional[float] = None,
+    max_length: Optional[float] = None,
+    min_gain: Optional[float] = None,
+    max_gain: Optional[float] = None,
+    bbox: Optional[Sequence[float]] = None,
+) -> List[sqlite3.Row]:
+    """Return the indexed tracks matching every given filter, oldest first.
+
+    since/until are ISO dates or date-times in local time (like the GPX
+    metadata time); lengths and gain are in metres; bbox is
+    ``(min_lon, min_lat, max_lon, max_lat)`` and applies to the first location.
+    """
+    clauses, params = [], []
+    if version is not None:
+        clauses.append("version = ?")
+        params.append(version)
+    if since is not None:
+        clauses.append("ts0 >= ?")
+        params.append(_day_start(since))
+    if until is not None:
+        clauses.append("ts0 < ?" if len(until) == 10 else "ts0 <= ?")
+        params.append(_day_end(until))
+    if min_length is not None:
+        clauses.append("length >= ?")
+        params.append(min_length)
+    if max_length is not None:
+        clauses.append("length <= ?")
+        params.append(max_length)
+    if min_gain is not None:
+        clauses.append("gain >= ?")
+        params.append(min_gain)
+    if max_gain is not None:
+        clauses.append("gain <= ?")
+        params.append(max_gain)
+    if bbox is not None:
+        min_lon, min_lat, max_lon, max_lat = bbox
+        clauses.append("lon0 BETWEEN ? AND ? AND lat0 BETWEEN ? AND ?")
+        params.extend((min_lon, max_lon, min_lat, max_lat))
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    conn = open_index(db_path)
+    try:
+        return conn.execute(f"SELECT * FROM tracks{where} ORDER BY ts0, path", params).fetchall()
+    finally:
+        conn.close()
+
+
+def format_index_row(row: sqlite3.Row) -> str:
+    """One line per track: path, first-location time and the main totals."""
+    when = datetime.fromtimestamp(row["ts0"]).isoformat(" ", "seconds") if row["ts0"] is not None else "?"
+    length = f"{row['length']:.1f}m" if row["length"] is not None else "?"
+    gain = f"{row['gain']:.1f}m" if row["gain"] is not None else "?"
+    name = row["name"] or ""
+    return f"{row['path']}\t{when}\tv{row['version']}\tlen={length}\tgain={gain}\t{name}"
@@ -0,0 +1,215 @@
+"""Layout-caching decoder for TRK v4 tagged location records.
+
+A v4 location is ``size, lon, lat`` followed by one-byte tags (e/t/a/p/n/b/s/v),
+each with a fixed-size payload. Within a segment nearly every record carries
+the same tag sequence, so the first record with a given signature is walked
+tag by tag and compiled into a single ``struct.Struct``; later records of the
+same size are decoded with one ``unpack_from`` and a tag check.
+"""
+
+from __future__ import annotations
+
+from dataclasses import fields
+from functools import lru_cache
+from operator import itemgetter
+from struct import Struct
+from typing import Dict, List, Optional, Tuple
+
+from .reader import INT
+from .trackpoint import TrackPoint, decode_network, parse_satellites
+
+HEIGHT_MISSING = -999999999
+PRESSURE_MISSING = 999999999
+
+_INDEX = {f.name: i for i, f in enumerate(fields(TrackPoint))}
+_EMPTY_ROW = [None] * len(_INDEX)
+_LAT, _LON = _INDEX["lat"], _INDEX["lon"]
+_ACCURACY = _INDEX["accuracy"]
+_BATTERY = _INDEX["battery"]
+_ELEVATION = _INDEX["elevation"]
+_NETWORK_CODE = _INDEX["network_code"]
+_NETWORK_SIGNAL_DBM = _INDEX["network_signal_dbm"]
+_NETWORK_SIGNAL_PERCENT = _INDEX["network_signal_percent"]
+_NETWORK_SIGNAL_RAW = _INDEX["network_signal_raw"]
+_NETWORK_TYPE = _INDEX["network_type"]
+_PRESSURE = _INDEX["pressure"]
+_SAT_BDS = _INDEX["sat_bds"]
+_SAT_GAL = _INDEX["sat_gal"]
+_SAT_GLO = _INDEX["sat_glo"]
+_SAT_GPS = _INDEX["sat_gps"]
+_TIMESTAMP = _INDEX["timestamp"]
+_VERTICAL_ACCURACY = _INDEX["vertical_accuracy"]
+_LON_LAT = Struct(">ll")
+
+# both take a handful of distinct byte values per track, so memoize them
+_decode_network = lru_cache(maxsize=None)(decode_network)
+_parse_satellites = lru_cache(maxsize=4096)(parse_satellites)
+
+
+def _elevation(row, value):
+    row[_ELEVATION] = None if value == HEIGHT_MISSING else value * 1e-3
+
+
+def _timestamp(row, value):
+    row[_TIMESTAMP] = value * 1e-3
+
+
+def _accuracy(row, value):
+    row[_ACCURACY] = value
+
+
+def _pressure(row, value):
+    row[_PRESSURE] = None if value == PRESSURE_MISSING else value * 1e-3
+
+
+def _network(row, code, signal):
+    # cell type in byte 1 (generation in tens, protocol in units), signal strength in byte 2 (1=BAD .. 127=GOOD)
+    row[_NETWORK_CODE] = code
+    row[_NETWORK_SIGNAL_RAW] = signal
+    (
+        row[_NETWORK_TYPE],
+        row[_NETWORK_SIGNAL_PERCENT],
+        row[_NETWORK_SIGNAL_DBM],
+    ) = _decode_network(code, signal)
+
+
+def _battery(row, value):
+    # battery level (0-100%)
+    row[_BATTERY] = value
+
+
+def _satellites(row, raw):
+    # satellites in use per constellation (UNKNOWN, GPS, SBAS, GLONASS, QZSS, BEIDOU, GALILEO, IRNSS)
+    (
+        row[_SAT_GPS],
+        row[_SAT_GLO],
+        row[_SAT_BDS],
+        row[_SAT_GAL],
+    ) = _parse_satellites(raw)
+
+
+def _vertical_accuracy(row, value):
+    # vertical accuracy (meters*1e2)
+    row[_VERTICAL_ACCURACY] = value * 1e-2
+
+
+class _Tag:
+    __slots__ = ("fmt", "struct", "size", "count", "setter")
+
+    def __init__(self, fmt: str, setter):
+        self.fmt = fmt
+        self.struct = Struct(">" + fmt)
+        self.size = self.struct.size
+        self.count = len(self.struct.unpack(bytes(self.size)))
+        self.setter = setter
+
+
+# tag byte -> payload layout and the TrackPoint fields it fills
+TAGS: Dict[int, _Tag] = {
+    ord("e"): _Tag("l", _elevation),
+    ord("t"): _Tag("q", _timestamp),
+    ord("a"): _Tag("l", _accuracy),
+    ord("p"): _Tag("l", _pressure),
+    ord("n"): _Tag("BB", _network),
+    ord("b"): _Tag("B", _battery),
+    ord("s"): _Tag("8s", _satellites),
+    ord("v"): _Tag("l", _vertical_accuracy),
+}
+
+
+class LocationLayout:
+    """A compiled tag signature: one struct for lon, lat, every tag byte and payload."""
+
+    __slots__ = ("signature", "struct", "size", "check", "setters")
+
+    def __init__(self, signature: Tuple[int, ...]):
+        fmt = ">ll"
+        index = 2
+        tag_index = []
+        setters = []
+        for tag in signature:
+            spec = TAGS[tag]
+            tag_index.append(index)
+            setters.append((spec.setter, index + 1, spec.count))
+            fmt += "B" + spec.fmt
+            index += 1 + spec.count
+        self.signature = signature
+        self.struct = Struct(fmt)
+        self.size = self.struct.size
+        if not tag_index:
+            self.check = lambda values: ()
+        elif len(tag_index) == 1:
+            only = tag_index[0]
+            self.check = lambda values: (values[only],)
+        else:
+            self.check = itemgetter(*tag_index)
+        self.setters = setters
+
+    def decode(self, buf, pos: int) -> Optional[list]:
+        """Decode the record body at pos into a TrackPoint-ordered row, or None if its tags differ."""
+        values = self.struct.unpack_from(buf, pos)
+        if self.check(values) != self.signature:
+            return None
+        row = _EMPTY_ROW.copy()
+        row[_LON] = values[0] * 1e-7
+        row[_LAT] = values[1] * 1e-7
+        for setter, start, count in self.setters:
+            if count == 1:
+                setter(row, values[start])
+            else:
+                setter(row, *values[start:start + count])
+        return row
+
+
+class V4LocationDecoder:
+    """Decode v4 location records, compiling each new tag signature once."""
+
+    def __init__(self):
+        self._layouts: Dict[int, List[LocationLayout]] = {}
+
+    def decode(self, buf, pos: int) -> Tuple[TrackPoint, int]:
+        """Decode the size-prefixed record at pos; returns (point, end offset)."""
+        row, end = self.decode_row(buf, pos)
+        return TrackPoint(*row), end
+
+    def decode_row(self, buf, pos: int) -> Tuple[list, int]:
+        """Like decode, but returns the values in TrackPoint field order (for Segment.append_row)."""
+        size = INT.unpack_from(buf, pos)[0]
+        body = pos + 4
+        layouts = self._layouts.get(size)
+        if layouts:
+            for i, layout in enumerate(layouts):
+                row = layout.decode(buf, body)
+                if row is not None:
+                    if i:
+                        # keep the most recently matched signature first
+                        layouts.insert(0, layouts.pop(i))
+                    return row, body + size
+        return self._walk(buf, body, size)
+
+    def _walk(self, buf, pos: int, size: int) -> Tuple[list, int]:
+        row = _EMPTY_ROW.copy()
+        lon, lat = _LON_LAT.unpack_from(buf, pos)
+        row[_LON] = lon * 1e-7
+        row[_LAT] = lat * 1e-7
+        pos += 8
+        remaining = size - 8
+        signature = []
+        compilable = True
+        while remaining > 0:
+            tag = buf[pos]
+            spec = TAGS.get(tag)
+            if spec is None:
+                # consume remaining payload to avoid infinite loops on unknown keys
+                pos += 1 + max(0, remaining - 1)
+                compilable = False
+                break
+            values = spec.struct.unpack_from(buf, pos + 1)
+            spec.setter(row, *values)
+            signature.append(tag)
+            pos += 1 + spec.size
+            remaining -= 1 + spec.size
+        if compilable and remaining == 0:
+            layout = LocationLayout(tuple(signature))
+            self._layouts.setdefault(size, []).insert(0, layout)
+        return row, pos
@@ -0,0 +1,217 @@
+"""Synthetic TRK fixtures.
+
+The tracks are built from a seeded generator, so they are the same on every
+run; tests/data holds the GPX the converter wrote for them before any of the
+decoding and writing optimizations (see test_gpx_output.py).
+"""
+
+import math
+import random
+import re
+import struct
+from pathlib import Path
+
+import pytest
+
+DATA_DIR = Path(__file__).parent / "data"
+
+
+def i32(value):
+    return struct.pack(">l", value)
+
+
+def i64(value):
+    return struct.pack(">q", value)
+
+
+def f64(value):
+    return struct.pack(">d", value)
+
+
+def meta(entries, version):
+    out = i32(len(entries))
+    for key, value in entries:
+        name = key.encode()
+        out += i32(len(name)) + name
+        if isinstance(value, bool):
+            out += i32(-1) + (b"\x01" if value else b"\x00")
+        elif isinstance(value, int):
+            out += i32(-2) + i64(value)
+        elif isinstance(value, float):
+            out += i32(-3) + f64(value)
+        elif isinstance(value, bytes):
+            out += i32(len(value)) + value
+        else:
+            text = value.encode("utf-8")
+            out += i32(len(text)) + text
+    if version == 3:
+        out += i32(0)
+    return out
+
+
+def location_v3(lon, lat, height, timestamp, accuracy=None, pressure=None):
+    body = i32(lon) + i32(lat) + i32(height) + i64(timestamp)
+    if accuracy is not None:
+        body += i32(accuracy)
+        if pressure is not None:
+            body += i32(pressure)
+    return i32(len(body)) + body
+
+
+def location_v4(lon, lat, tags):
+    body = i32(lon) + i32(lat)
+    for tag, value in tags:
+        body += tag.encode()
+        if tag in "eapv":
+            body += i32(value)
+        elif tag == "t":
+            body += i64(value)
+        elif tag in "nbs":
+            body += bytes(value if tag != "b" else [value])
+        else:
+            body += value
+    return i32(len(body)) + body
+
+
+def points(count, seed, lat0=46.5761, lon0=8.8924, ts0=1192356597000, rate_ms=1000):
+    """A random walk of (lon, lat, height, timestamp) in TRK units."""
+    rnd = random.Random(seed)
+    lat, lon = lat0, lon0
+    heading = rnd.uniform(0, 2 * math.pi)
+    out = []
+    for i in range(count):
+        heading += rnd.gauss(0, 0.2)
+        step = rnd.uniform(0.5, 4.0) / 111111.0
+        lat += step * math.cos(heading)
+        lon += step * math.sin(heading) / math.cos(math.radians(lat))
+        out.append((
+            int(round(lon * 1e7)),
+            int(round(lat * 1e7)),
+            int(2300000 + 50000 * math.sin(i / 50.0) + rnd.randint(-500, 500)),
+            ts0 + i * rate_ms + rnd.randint(0, 999),
+        ))
+    return out
+
+
+def trk_v3(segments=3, sizes=(40, 1, 25), seed=1, name="Lagoretico"):
+    """A v3 track whose records mix all three record sizes, with missing heights and pressures."""
+    rnd = random.Random(seed)
+    body = b""
+    total = 0
+    first = None
+    for s in range(segments):
+        walk = points(sizes[s % len(sizes)], seed + s, ts0=1192356597000 + s * 3600000)
+        total += len(walk)
+        records = []
+        for j, (lon, lat, height, timestamp) in enumerate(walk):
+            first = first or (lon, lat, timestamp)
+            shape = (j + s) % 5
+            if j % 17 == 3:
+                height = -999999999
+            if shape == 0:
+                records.append(location_v3(lon, lat, height, timestamp))
+            elif shape == 1:
+                records.append(location_v3(lon, lat, height, timestamp, accuracy=rnd.randint(0, 40)))
+            else:
+                pressure = 999999999 if j % 13 == 5 else rnd.randint(850000, 1020000)
+                accuracy = rnd.randint(0, 40)
+                records.append(location_v3(lon, lat, height, timestamp, accuracy=accuracy, pressure=pressure))
+        body += meta([("activity", "hike"), ("idx", s)], 3) + i32(len(walk)) + b"".join(records)
+    waypoints = [("LAGORETICO", 88926389, 465763889, 2372000), ("Hütte café", 88930000, 465770000, -999999999)]
+    encoded = b""
+    for label, lon, lat, height in waypoints:
+        encoded += meta([("name", label), ("comment", "x")], 3) + location_v3(lon, lat, height, 1192356600000, accuracy=5)
+    header = i32(total) + i32(segments) + i32(len(waypoints)) + i32(first[0]) + i32(first[1]) + i64(first[2]) \
+        + f64(1234.5) + f64(1240.25) + f64(321.0) + i64(5400)
+    metadata = meta([("name", name), ("desc", b"caf\xe9 latin"), ("flag", True), ("mass", 1.5)], 3)
+    return i32(3) + i32(len(header)) + header + metadata + i32(len(waypoints)) + encoded + i32(segments) + body
+
+
+def trk_v3_uniform(count, size=28):
+    """A single-segment v3 track whose records all have the same size (the NumPy fast path)."""
+    walk = points(count, 5)
+    rnd = random.Random(1)
+    records = []
+    for j, (lon, lat, height, timestamp) in enumerate(walk):
+        if j % 17 == 3:
+            height = -999999999
+        if size == 20:
+            records.append(location_v3(lon, lat, height, timestamp))
+        elif size == 24:
+            records.append(location_v3(lon, lat, height, timestamp, accuracy=rnd.randint(0, 40)))
+        else:
+            accuracy = rnd.randint(0, 40)
+            pressure = 999999999 if j % 13 == 5 else rnd.randint(850000, 1020000)
+            records.append(location_v3(lon, lat, height, timestamp, accuracy=accuracy, pressure=pressure))
+    segment = meta([("activity", "run")], 3) + i32(count) + b"".join(records)
+    header = i32(count) + i32(1) + i32(0) + i32(walk[0][0]) + i32(walk[0][1]) + i64(walk[0][2]) \
+        + f64(1.0) + f64(1.0) + f64(1.0) + i64(1)
+    return i32(3) + i32(len(header)) + header + meta([("name", "u")], 3) + i32(0) + i32(1) + segment
+
+
+def trk_v4(segments=2, sizes=(60, 30), seed=7, name="Pizzo", tags="full"):
+    """A v4 track; "full" records carry every tag, with some dropped, unknown or reordered."""
+    rnd = random.Random(seed)
+    body = b""
+    first = None
+    for s in range(segments):
+        walk = points(sizes[s % len(sizes)], seed + s, ts0=1700000000000 + s * 86400000)
+        records = []
+        for j, (lon, lat, height, timestamp) in enumerate(walk):
+            first = first or (lon, lat, timestamp)
+            if tags == "simple":
+                record = [("e", height), ("t", timestamp), ("a", rnd.randint(1, 30))]
+            else:
+                record = [
+                    ("e", height),
+                    ("t", timestamp),
+                    ("a", rnd.randint(1, 30)),
+                    ("p", rnd.randint(850000, 1020000)),
+                    ("n", (rnd.choice([0, 31, 34, 43, 45, 21, 77]), rnd.randint(1, 127))),
+                    ("b", rnd.randint(0, 100)),
+                    ("s", [rnd.randint(0, 12) for _ in range(8)]),
+                    ("v", rnd.randint(100, 3000)),
+                ]
+                if j % 11 == 4:
+                    record = [tag for tag in record if tag[0] not in "nsv"]
+                if j % 23 == 9:
+                    record = record[:3] + [("x", b"\x00\x01\x02\x03")]
+                if j % 19 == 2:
+                    record = [("t", timestamp), ("e", -999999999), ("a", 7)]
+            records.append(location_v4(lon, lat, record))
+        body += meta([("activity", "ski"), ("seg", s)], 4) + i32(3) + i32(-1) + i32(len(walk)) + b"".join(records)
+    waypoints = meta([("name", "Gipfel")], 4) + location_v4(89000000, 466000000, [("e", 2500000), ("t", 1700000001000)])
+    summary = meta([("lon", first[0]), ("lat", first[1]), ("dte", first[2])], 4)
+    rest = summary + i32(3) + i32(-1) + meta([("name", name), ("desc", "Über")], 4) + i32(0) + i32(-1) \
+        + i32(1) + waypoints + i32(segments) + body
+    return i32(0x50500E01) + i32(8 + len(summary)) + rest
+
+
+def gpx_points(name):
+    """(lat, lon) of every trackpoint of a baseline GPX, per segment."""
+    text = (DATA_DIR / f"{name}.plain.gpx").read_text("utf-8")
+    return [
+        [(float(lat), float(lon)) for lat, lon in re.findall(r'<trkpt lat="([^"]+)" lon="([^"]+)"', segment)]
+        for segment in text.split("<trkseg>")[1:]
+    ]
+
+
+TRACKS = {
+    "a_v3": lambda: trk_v3(),
+    "b_v4": lambda: trk_v4(),
+    "c_v3_noname": lambda: trk_v3(segments=1, sizes=(5,), seed=3, name=""),
+    "d_v4_simple": lambda: trk_v4(segments=1, sizes=(50,), tags="simple"),
+    "e_v3_uniform": lambda: trk_v3_uniform(300),
+    "f_v3_u20": lambda: trk_v3_uniform(50, size=20),
+}
+
+
+@pytest.fixture(scope="session")
+def tracks(tmp_path_factory):
+    """Name -> path of every synthetic track, written once per session."""
+    directory = tmp_path_factory.mktemp("tracks")
+    paths = {}
+    for name, build in TRACKS.items():
+        paths[name] = directory / f"{name}.trk"
+        paths[name].write_bytes(build())
+    return paths
@@ -0,0 +1,77 @@
+"""Decoded-track cache: hits reproduce the output, misses leave one entry and no temporary files."""
+
+import os
+import struct
+
+import pytest
+
+from alp2gpx import alp2gpx
+from alp2gpx import cache
+
+from conftest import DATA_DIR
+
+
+def convert(source, output, cache_dir, **options):
+    return alp2gpx(str(source), str(output), geoid=False, cache_dir=str(cache_dir), **options)
+
+
+@pytest.mark.parametrize("name", ["a_v3", "b_v4", "e_v3_uniform"])
+def test_miss_then_hit(tracks, tmp_path, name):
+    cache_dir = tmp_path / "cache"
+    miss = convert(tracks[name], tmp_path / "miss.gpx", cache_dir)
+    assert not miss.cache_hit
+    assert [entry.name for entry in cache_dir.iterdir()] == [f"{cache.track_key(tracks[name].read_bytes())}{cache.SUFFIX}"]
+    hit = convert(tracks[name], tmp_path / "hit.gpx", cache_dir)
+    assert hit.cache_hit
+    expected = (DATA_DIR / f"{name}.plain.gpx").read_bytes()
+    assert (tmp_path / "miss.gpx").read_bytes() == expected
+    assert (tmp_path / "hit.gpx").read_bytes() == expected
+
+
+def test_one_entry_serves_every_option(tracks, tmp_path):
+    # the v4 entry holds every decoded field, so a hit can still write the extensions
+    cache_dir = tmp_path / "cache"
+    convert(tracks["b_v4"], tmp_path / "plain.gpx", cache_dir)
+    hit = convert(tracks["b_v4"], tmp_path / "extensions.gpx", cache_dir, include_extensions=True)
+    assert hit.cache_hit
+    assert (tmp_path / "extensions.gpx").read_bytes() == (DATA_DIR / "b_v4.extensions.gpx").read_bytes()
+
+
+def test_parser_version_invalidates(tracks, tmp_path, monkeypatch):
+    cache_dir = tmp_path / "cache"
+    convert(tracks["a_v3"], tmp_path / "a.gpx", cache_dir)
+    monkeypatch.setattr(cache, "PARSER_VERSION", cache.PARSER_VERSION + 1)
+    assert not convert(tracks["a_v3"], tmp_path / "a.gpx", cache_dir).cache_hit
+    assert convert(tracks["a_v3"], tmp_path / "a.gpx", cache_dir).cache_hit
+    assert len(os.listdir(cache_dir)) == 2
+
+
+def test_corrupt_entry_is_a_miss(tracks, tmp_path):
+    cache_dir = tmp_path / "cache"
+    convert(tracks["a_v3"], tmp_path / "a.gpx", cache_dir)
+    (entry,) = cache_dir.iterdir()
+    entry.write_bytes(entry.read_bytes()[:-5])
+    assert not convert(tracks["a_v3"], tmp_path / "a.gpx", cache_dir).cache_hit
+    assert (tmp_path / "a.gpx").read_bytes() == (DATA_DIR / "a_v3.plain.gpx").read_bytes()
+
+
+def test_failed_conversion_leaves_no_temporary_file(tracks, tmp_path):
+    cache_dir = tmp_path / "cache"
+    truncated = tmp_path / "truncated.trk"
+    truncated.write_bytes(tracks["a_v3"].read_bytes()[:-40])
+    with pytest.raises(struct.error):
+        convert(truncated, tmp_path / "t.gpx", cache_dir)
+    assert os.listdir(cache_dir) == []
+
+
+def test_eviction_drops_the_least_recently_used(tracks, tmp_path):
+    cache_dir = tmp_path / "cache"
+    keys = {name: cache.track_key(tracks[name].read_bytes()) for name in ("a_v3", "b_v4")}
+    for name in keys:
+        convert(tracks[name], tmp_path / f"{name}.gpx", cache_dir)
+        os.utime(cache_dir / f"{keys[name]}{cache.SUFFIX}", (1, 1))
+    # a hit makes a_v3 the most recently used entry
+    assert convert(tracks["a_v3"], tmp_path / "a_v3.gpx", cache_dir).cache_hit
+    entry = cache_dir / f"{keys['a_v3']}{cache.SUFFIX}"
+    cache.TrackCache(str(cache_dir), max_bytes=entry.stat().st_size).evict()
+    assert [path.name for path in cache_dir.iterdir()] == [entry.name]
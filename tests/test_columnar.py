@@ -0,0 +1,113 @@
+"""Columnar exports: the .npz layout and the Arrow schema, with the same rows in every format."""
+
+import pytest
+
+from alp2gpx import alp2gpx, columnar
+from alp2gpx.columnar import ColumnarWriter
+from alp2gpx.trackpoint import COLUMN_TYPES, FIELDS, REQUIRED_COLUMNS, Segment, TrackPoint
+
+from conftest import gpx_points
+
+np = pytest.importorskip("numpy")
+
+NPY_KINDS = {"d": "float64", "i": "int32", "h": "int16"}
+
+
+def load_npz(path):
+    with np.load(path) as archive:
+        return dict(archive)
+
+
+@pytest.mark.parametrize("name", ["a_v3", "b_v4"])
+def test_npz_layout(tracks, tmp_path, name):
+    output = tmp_path / f"{name}.npz"
+    alp2gpx(str(tracks[name]), str(output), source_name=f"{name}.trk", geoid=False)
+    columns = load_npz(output)
+    nullable = [field for field in FIELDS if field not in REQUIRED_COLUMNS]
+    assert set(columns) == {"file", "segment", "point_index", *FIELDS, *(f"{field}_valid" for field in nullable)}
+
+    expected = gpx_points(name)
+    rows = sum(map(len, expected))
+    assert all(column.shape == (rows,) for column in columns.values())
+    assert set(columns["file"]) == {f"{name}.trk"}
+    assert columns["segment"].dtype == np.int32
+    assert columns["point_index"].dtype == np.int64
+    assert columns["timestamp"].dtype == np.dtype("datetime64[ms]")
+    for field in FIELDS:
+        typecode = COLUMN_TYPES[field]
+        if typecode is None:
+            assert columns[field].dtype.kind == "U"
+        elif field != "timestamp":
+            assert columns[field].dtype == NPY_KINDS[typecode], field
+    for field in nullable:
+        assert columns[f"{field}_valid"].dtype == np.bool_
+
+    segments = [list(zip(columns["lat"][columns["segment"] == s], columns["lon"][columns["segment"] == s])) for s in range(len(expected))]
+    assert segments == expected
+    assert [list(columns["point_index"][columns["segment"] == s]) for s in range(len(expected))] == [list(range(len(points))) for points in expected]
+    # missing heights (the -999999999 sentinel) are masked
+    assert 0 < columns["elevation_valid"].sum() < rows
+
+
+@pytest.mark.parametrize("output_format", ["parquet", "feather"])
+def test_arrow_schema_and_rows(tracks, tmp_path, output_format):
+    pytest.importorskip("pyarrow")
+    from alp2gpx.columnar import arrow_schema
+
+    output = tmp_path / f"b_v4.{output_format}"
+    alp2gpx(str(tracks["b_v4"]), str(output), source_name="b_v4.trk", geoid=False)
+    if output_format == "parquet":
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(output)
+    else:
+        import pyarrow.feather as feather
+
+        table = feather.read_table(output)
+    assert table.schema.remove_metadata().equals(arrow_schema())
+
+    alp2gpx(str(tracks["b_v4"]), str(tmp_path / "b_v4.npz"), source_name="b_v4.trk", geoid=False)
+    columns = load_npz(tmp_path / "b_v4.npz")
+    assert table.column("file").to_pylist() == columns["file"].tolist()
+    for field in ("segment", "point_index", *FIELDS):
+        values = table.column(field).to_pylist()
+        if field == "timestamp":
+            values = [value.replace(tzinfo=None) for value in values]
+        expected = columns[field].tolist()
+        if field in COLUMN_TYPES and field not in REQUIRED_COLUMNS:
+            valid = columns[f"{field}_valid"].tolist()
+            expected = [value if ok else None for value, ok in zip(expected, valid)]
+        assert values == expected, field
+
+
+def test_compressed_columnar_output_is_rejected(tracks, tmp_path):
+    with pytest.raises(ValueError):
+        alp2gpx(str(tracks["a_v3"]), str(tmp_path / "a.npz.gz"), output_format="npz", geoid=False)
+
+
+TIMES = [1.7e9, float("nan"), None, float("inf"), 1.7e9 + 0.25]
+
+
+def write_times(path, output_format):
+    with ColumnarWriter(path, output_format, source="t.trk") as out:
+        out.begin_segment()
+        out.write_points(Segment(points=[TrackPoint(46.5, 8.9, None, time) for time in TIMES]))
+
+
+def test_non_finite_times_are_masked_in_npz(tmp_path):
+    write_times(tmp_path / "t.npz", "npz")
+    columns = load_npz(tmp_path / "t.npz")
+    assert columns["timestamp_valid"].tolist() == [True, False, False, False, True]
+    assert columns["timestamp"][[0, 4]].astype("i8").tolist() == [1700000000000, 1700000000250]
+
+
+@pytest.mark.parametrize("numpy", [True, False], ids=["numpy", "python"])
+def test_non_finite_times_are_null_in_arrow(tmp_path, monkeypatch, numpy):
+    pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+
+    if not numpy:
+        monkeypatch.setattr(columnar, "np", None)
+    write_times(tmp_path / "t.parquet", "parquet")
+    values = pq.read_table(tmp_path / "t.parquet").column("timestamp").cast("int64").to_pylist()
+    assert values == [1700000000000, None, None, None, 1700000000250]
@@ -0,0 +1,60 @@
+"""Planar contours stay within the documented distance of the spherical ones."""
+
+import importlib
+import math
+import random
+
+import pytest
+
+from alp2gpx.contours import EARTH_RADIUS_M, METRES_PER_DEGREE, ContourBuilder
+from alp2gpx.trackpoint import FIELDS, Segment
+
+contours = importlib.import_module("alp2gpx.contours")
+
+TAIL = (None,) * (len(FIELDS) - 5)
+
+
+def walk(count, lat0, accuracy, seed=2):
+    # a random walk with ~10 m steps and offsets between 1 m and accuracy
+    rnd = random.Random(seed)
+    lat, lon, heading = lat0, 8.9, 0.0
+    rows = []
+    for i in range(count):
+        rows.append((lat, lon, 2000.0, 1.6e9 + i, rnd.randint(1, accuracy)))
+        heading += rnd.gauss(0, 0.4)
+        step = rnd.uniform(0, 20)
+        lat += step * math.cos(heading) / METRES_PER_DEGREE
+        lon += step * math.sin(heading) / (METRES_PER_DEGREE * math.cos(math.radians(lat)))
+    return rows
+
+
+def contour_points(rows, mode):
+    segment = Segment()
+    for row in rows:
+        segment.append_row(row + TAIL)
+    builder = ContourBuilder(mode)
+    parts = [builder.feed(segment), builder.finish()]
+    return [[(lat, lon) for part in parts for lat, lon in zip(part[side].column("lat"), part[side].column("lon"))] for side in (0, 1)]
+
+
+def distance_m(a, b):
+    dy = (b[0] - a[0]) * METRES_PER_DEGREE
+    dx = (b[1] - a[1]) * METRES_PER_DEGREE * math.cos(math.radians(a[0]))
+    return math.hypot(dx, dy)
+
+
+@pytest.mark.parametrize("numpy", [True, False], ids=["numpy", "python"])
+@pytest.mark.parametrize("lat0,accuracy", [(46.5, 30), (46.5, 100), (70.0, 100), (70.0, 300)])
+def test_planar_within_bound(monkeypatch, numpy, lat0, accuracy):
+    if numpy:
+        pytest.importorskip("numpy")
+    monkeypatch.setattr(contours, "HAVE_NUMPY", numpy)
+    rows = walk(2000, lat0, accuracy)
+    spherical = contour_points(rows, "spherical")
+    planar = contour_points(rows, "planar")
+    assert [len(side) for side in spherical + planar] == [len(rows)] * 4
+    deviation = max(distance_m(a, b) for side_s, side_p in zip(spherical, planar) for a, b in zip(side_s, side_p))
+    # accuracy**2 * tan(lat) / EARTH_RADIUS_M, see planar_contour_arrays
+    largest = max(row[4] for row in rows)
+    latitude = max(abs(row[0]) for row in rows)
+    assert 0 < deviation <= largest * largest * math.tan(math.radians(latitude)) / EARTH_RADIUS_M
@@ -0,0 +1,84 @@
+"""The local geoid grid: both interpolation paths, and pyproj agreement within 1 mm."""
+
+import random
+import struct
+
+import pytest
+
+from alp2gpx import geoid
+from alp2gpx.geoid import GRID_HEADER, GRID_MAGIC, GeoidGrid, build_grid
+
+# north-west node, spacing and size of the hand-built grid
+LAT0, LON0, STEP, ROWS, COLS = 47.0, 8.0, 0.25, 5, 7
+
+
+def node(row, col):
+    # bilinear in (row, col) and exact in float32, so interpolation reproduces it everywhere
+    return 40.0 + 1.5 * row - 0.75 * col + 0.125 * row * col
+
+
+def write_grid(path):
+    values = [node(r, c) for r in range(ROWS) for c in range(COLS)]
+    header = GRID_HEADER.pack(GRID_MAGIC, LAT0, LON0, STEP, STEP, ROWS, COLS)
+    path.write_bytes(header + struct.pack(f"<{len(values)}f", *values))
+    return str(path)
+
+
+def sample(count, south, west, north, east):
+    rnd = random.Random(1)
+    return [rnd.uniform(west, east) for _ in range(count)], [rnd.uniform(south, north) for _ in range(count)]
+
+
+def interpolate(grid, lons, lats, numpy):
+    if numpy:
+        assert grid._values is not None
+        return grid._undulation_np(lons, lats).tolist()
+    return [grid._undulation_point(lon, lat) for lon, lat in zip(lons, lats)]
+
+
+@pytest.mark.parametrize("numpy", [True, False], ids=["numpy", "python"])
+def test_interpolation(tmp_path, numpy):
+    if numpy:
+        pytest.importorskip("numpy")
+    with GeoidGrid(write_grid(tmp_path / "small.grid")) as grid:
+        lons = [LON0 + c * STEP for r in range(ROWS) for c in range(COLS)]
+        lats = [LAT0 - r * STEP for r in range(ROWS) for c in range(COLS)]
+        assert interpolate(grid, lons, lats, numpy) == [node(r, c) for r in range(ROWS) for c in range(COLS)]
+        lons, lats = sample(500, LAT0 - (ROWS - 1) * STEP, LON0, LAT0, LON0 + (COLS - 1) * STEP)
+        expected = [node((LAT0 - lat) / STEP, (lon - LON0) / STEP) for lon, lat in zip(lons, lats)]
+        assert interpolate(grid, lons, lats, numpy) == pytest.approx(expected, abs=1e-9)
+
+
+def test_close_releases_the_mapping(tmp_path):
+    with GeoidGrid(write_grid(tmp_path / "small.grid")) as grid:
+        assert grid.undulation([LON0], [LAT0]) == [node(0, 0)]
+    assert grid._mm.closed
+
+
+@pytest.mark.parametrize("content", [b"", b"ALPGEOID", b"NOTAGRID" + bytes(GRID_HEADER.size)])
+def test_invalid_grid(tmp_path, content):
+    path = tmp_path / "bad.grid"
+    path.write_bytes(content)
+    with pytest.raises(ValueError):
+        GeoidGrid(str(path))
+    with pytest.raises(OSError):
+        GeoidGrid(str(tmp_path / "missing.grid"))
+
+
+@pytest.mark.parametrize("numpy", [True, False], ids=["numpy", "python"])
+def test_matches_pyproj_within_1mm(tmp_path, numpy):
+    pytest.importorskip("pyproj")
+    if numpy:
+        pytest.importorskip("numpy")
+    transformer = geoid.get_transformer()
+    if transformer is None:
+        pytest.skip("pyproj has no us_nga_egm96_15 grid (offline)")
+    south, west, north, east = 45.5, 6.0, 47.5, 10.5
+    path = str(tmp_path / "alps.grid")
+    build_grid(path, bounds=(south, west, north, east))
+    lons, lats = sample(2000, south, west, north, east)
+    expected = transformer.transform(lons, lats, [0.0] * len(lons))[2]
+    with GeoidGrid(path) as grid:
+        # H = h - N with h = 0
+        actual = [-n for n in interpolate(grid, lons, lats, numpy)]
+    assert actual == pytest.approx(list(expected), abs=1e-3)
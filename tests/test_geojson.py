@@ -0,0 +1,94 @@
+"""GeoJSON and NDJSON outputs parse, and carry the same points as the GPX."""
+
+import json
+import re
+
+import pytest
+
+from alp2gpx import alp2gpx
+from alp2gpx.geojson import GeoJSONWriter, NDJSONWriter
+from alp2gpx.trackpoint import EXTENSION_FIELDS, Segment, TrackPoint
+
+from conftest import gpx_points
+
+
+@pytest.mark.parametrize("name", ["a_v3", "b_v4"])
+def test_linestring_features(tracks, tmp_path, name):
+    output = tmp_path / f"{name}.geojson"
+    alp2gpx(str(tracks[name]), str(output), include_extensions=True, geoid=False)
+    document = json.loads(output.read_text("utf-8"))
+    assert document["type"] == "FeatureCollection"
+    waypoints = [f for f in document["features"] if f["properties"].get("waypoint")]
+    lines = [f for f in document["features"] if not f["properties"].get("waypoint")]
+    assert all(f["geometry"]["type"] == "Point" for f in waypoints)
+    assert [f["properties"]["segment"] for f in lines] == list(range(len(lines)))
+
+    expected = gpx_points(name)
+    assert len(lines) == len(expected)
+    for feature, points in zip(lines, expected):
+        assert feature["geometry"]["type"] == "LineString"
+        coordinates = feature["geometry"]["coordinates"]
+        assert [(c[1], c[0]) for c in coordinates] == points
+        arrays = feature["properties"]["coordinateProperties"]
+        assert set(arrays) <= {"times", *EXTENSION_FIELDS}
+        assert all(len(values) == len(coordinates) for values in arrays.values())
+        assert all(re.fullmatch(r"\d{4}-\d\d-\d\dT\d\d:\d\d:\d\dZ", time) for time in arrays["times"])
+    if name == "b_v4":
+        assert {"accuracy", "pressure", "battery", "network_type"} <= set(lines[0]["properties"]["coordinateProperties"])
+
+
+def test_multilinestring_feature(tracks, tmp_path):
+    output = tmp_path / "a_v3.geojson"
+    alp2gpx(str(tracks["a_v3"]), str(output), geojson_geometry="multilinestring", geoid=False)
+    features = json.loads(output.read_text("utf-8"))["features"]
+    (track,) = [f for f in features if not f["properties"].get("waypoint")]
+    assert track["geometry"]["type"] == "MultiLineString"
+    assert track["properties"]["name"] == "2007-10-14 10:09:57 Lagoretico"
+    assert track["properties"]["segments"] == 3
+    assert [[(c[1], c[0]) for c in line] for line in track["geometry"]["coordinates"]] == gpx_points("a_v3")
+
+
+def test_ndjson_points(tracks, tmp_path):
+    output = tmp_path / "b_v4.ndjson"
+    alp2gpx(str(tracks["b_v4"]), str(output), include_extensions=True, geoid=False)
+    features = [json.loads(line) for line in output.read_text("utf-8").splitlines()]
+    assert all(f["type"] == "Feature" and f["geometry"]["type"] == "Point" for f in features)
+    points = [f for f in features if not f["properties"].get("waypoint")]
+    expected = gpx_points("b_v4")
+    assert len(points) == sum(map(len, expected))
+    for segment, segment_points in enumerate(expected):
+        chosen = [f for f in points if f["properties"]["segment"] == segment]
+        assert [(f["geometry"]["coordinates"][1], f["geometry"]["coordinates"][0]) for f in chosen] == segment_points
+        assert all(f["properties"]["track"] == "2023-11-14 22:13:20 Pizzo" for f in chosen)
+    assert all(set(f["properties"]) <= {"track", "segment", "time", *EXTENSION_FIELDS} for f in points)
+
+
+def test_contours_need_gpx(tracks, tmp_path):
+    with pytest.raises(ValueError):
+        alp2gpx(str(tracks["a_v3"]), str(tmp_path / "a.geojson"), accuracy_contours=True, geoid=False)
+
+
+def reject_constant(name):
+    raise ValueError(f"{name} is not JSON")
+
+
+@pytest.mark.parametrize("writer", [GeoJSONWriter, NDJSONWriter])
+def test_non_finite_elevations_are_dropped(tmp_path, writer):
+    elevations = [1.5, float("nan"), float("inf"), None, -float("inf"), 2.0]
+    segment = Segment(points=[TrackPoint(46.5 + i * 1e-4, 8.9, ele, 1.7e9 + i) for i, ele in enumerate(elevations)])
+    output = tmp_path / "nan.json"
+    with writer(output, coordinate_digits=4) as out:
+        out.write_waypoint(TrackPoint(46.5, 8.9, float("nan"), None), "w")
+        out.begin_track("t")
+        out.begin_segment()
+        out.write_points(segment)
+        out.end_segment()
+        out.end_track()
+    text = output.read_text("utf-8")
+    if writer is GeoJSONWriter:
+        features = json.loads(text, parse_constant=reject_constant)["features"]
+        positions = [features[0]["geometry"]["coordinates"]] + features[1]["geometry"]["coordinates"]
+    else:
+        features = [json.loads(line, parse_constant=reject_constant) for line in text.splitlines()]
+        positions = [f["geometry"]["coordinates"] for f in features]
+    assert [position[2:] for position in positions] == [[], [1.5], [], [], [], [], [2.0]]
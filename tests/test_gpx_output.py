@@ -0,0 +1,68 @@
+"""The GPX written for the synthetic tracks is byte-identical to the baseline writer's.
+
+The one exception is NumPy contours, whose coordinates may differ in the last bit.
+"""
+
+import gzip
+import importlib
+import re
+
+import pytest
+
+from alp2gpx import alp2gpx
+
+from conftest import DATA_DIR
+
+converter = importlib.import_module("alp2gpx.alp2gpx")
+contours = importlib.import_module("alp2gpx.contours")
+
+OPTIONS = {
+    "plain": {},
+    "extensions": {"include_extensions": True},
+    "pretty": {"pretty": True},
+    "contours": {"accuracy_contours": True},
+    "all": {"include_extensions": True, "pretty": True, "accuracy_contours": True},
+}
+CASES = sorted(path.name.split(".")[:2] for path in DATA_DIR.glob("*.gpx"))
+NUMBER = re.compile(r"(-?\d+\.\d+(?:e-?\d+)?)")
+
+
+def assert_close_gpx(actual: str, expected: str, tolerance: float) -> None:
+    # same text around the numbers, numbers within tolerance
+    actual_parts, expected_parts = NUMBER.split(actual), NUMBER.split(expected)
+    assert len(actual_parts) == len(expected_parts)
+    for i, (a, e) in enumerate(zip(actual_parts, expected_parts)):
+        if i % 2:
+            assert abs(float(a) - float(e)) <= tolerance, (a, e)
+        else:
+            assert a == e
+
+
+def convert(source, output, **options):
+    # the baseline has no geoid correction
+    return alp2gpx(str(source), str(output), geoid=False, **options)
+
+
+@pytest.mark.parametrize("numpy", [True, False], ids=["numpy", "python"])
+@pytest.mark.parametrize("name,variant", CASES)
+def test_matches_baseline(tracks, tmp_path, monkeypatch, name, variant, numpy):
+    if numpy:
+        pytest.importorskip("numpy")
+    monkeypatch.setattr(converter, "HAVE_NUMPY", numpy)
+    monkeypatch.setattr(contours, "HAVE_NUMPY", numpy)
+    output = tmp_path / f"{name}.gpx"
+    options = OPTIONS[variant]
+    convert(tracks[name], output, **options)
+    expected = DATA_DIR / f"{name}.{variant}.gpx"
+    if numpy and options.get("accuracy_contours"):
+        # NumPy's arcsin/arctan2 may round the last bit of a contour coordinate differently
+        assert_close_gpx(output.read_text("utf-8"), expected.read_text("utf-8"), 1e-13)
+    else:
+        assert output.read_bytes() == expected.read_bytes()
+
+
+def test_compressed_output_matches_baseline(tracks, tmp_path):
+    output = tmp_path / "b_v4.gpx.gz"
+    convert(tracks["b_v4"], output, include_extensions=True)
+    with gzip.open(output, "rb") as f:
+        assert f.read() == (DATA_DIR / "b_v4.extensions.gpx").read_bytes()
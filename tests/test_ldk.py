@@ -0,0 +1,133 @@
+"""The LDK archive index: entries, lookup, contents and output paths of a synthetic archive."""
+
+import os
+import struct
+
+import pytest
+
+from alp2gpx import alp2gpx
+from alp2gpx.ldk import LDKArchive, LDKEntry, LDKFormatError
+
+from conftest import DATA_DIR, i32, i64, meta, trk_v3, trk_v4
+
+TRACK, WAYPOINTS = 104, 101
+
+
+def pointer(value):
+    return struct.pack(">Q", value)
+
+
+def entry_table(entries):
+    return b"".join(struct.pack(">Ql", offset, uuid) for offset, uuid in entries)
+
+
+def build_ldk(folder, root=(), folder_name="Tracks"):
+    """An archive whose root node (a table) holds the root entries and a folder node.
+
+    Entries are (type, content, uuid, split); with split, the content from that
+    byte on is stored in a second chunk. The folder node is a list with an empty
+    slot whose first data entry is in the list and the others in its continuation.
+    """
+    buf = bytearray(48)
+
+    def put(data):
+        buf.extend(data)
+        return len(buf) - len(data)
+
+    def data(kind, content, split=None):
+        body = bytes([kind]) + content
+        first, rest = (body, b"") if split is None else (body[:split], body[split:])
+        more = put(i32(0x00055555) + i64(len(rest)) + pointer(0) + rest) if rest else 0
+        return put(i32(0x00035555) + i32(0) + i64(len(body)) + i64(len(first)) + pointer(more) + first)
+
+    def node(name, entries):
+        block = meta([("name", name)], 2)
+        metadata = put(i32(0x00035555) + i32(0) + i64(len(block)) + i64(len(block)) + pointer(0) + block)
+        return i32(0x00015555) + i32(0) + pointer(metadata) + struct.pack(">d", 0) + entries
+
+    folder_data = [(data(kind, content, split), uuid) for kind, content, uuid, split in folder]
+    root_data = [(data(kind, content, split), uuid) for kind, content, uuid, split in root]
+    more = put(i32(0x00025555) + i32(len(folder_data) - 1) + i32(0) + i32(len(folder_data) - 1) + pointer(0) + entry_table(folder_data[1:]))
+    head = i32(0x00025555) + i32(2) + i32(0) + i32(1) + pointer(more) + entry_table([(0, 0)] + folder_data[:1])
+    folder_node = put(node(folder_name, head))
+    root_node = put(node("", i32(0x00045555) + i32(1) + i32(len(root_data)) + entry_table([(folder_node, 0x20)] + root_data)))
+    struct.pack_into(">llQ", buf, 0, 0x4C444B00, 1, root_node)
+    return bytes(buf)
+
+
+A, B, NONAME = trk_v3(), trk_v4(), trk_v3(segments=1, sizes=(5,), seed=3, name="")
+ARCHIVE = build_ldk(
+    folder=[(TRACK, A, 0x11, None), (TRACK, B, 0x12, 100), (WAYPOINTS, b"waypointdata", 0x13, None), (TRACK, A, 0x1A, None)],
+    root=[(TRACK, NONAME, 0x30, None)],
+)
+
+
+def test_entries_and_contents():
+    archive = LDKArchive(ARCHIVE)
+    entries = archive.entries()
+    assert [entry.path for entry in entries] == ["/00000030", "/Tracks/00000011", "/Tracks/00000012", "/Tracks/00000013", "/Tracks/0000001A"]
+    assert [entry.type_name for entry in entries] == ["trk", "trk", "trk", "wpt", "trk"]
+    assert [entry.size for entry in entries] == [len(NONAME), len(A), len(B), len(b"waypointdata"), len(A)]
+    assert [entry.uuid for entry in archive.tracks()] == [0x30, 0x11, 0x12, 0x1A]
+    # unsplit contents are slices of the archive, split ones are joined
+    assert isinstance(archive.read(entries[1]), memoryview)
+    assert [bytes(archive.read(entry)) for entry in entries] == [NONAME, A, B, b"waypointdata", A]
+    assert [len(chunk) for chunk in archive.chunks(entries[2])] == [99, len(B) - 99]
+    assert archive.entry_at(entries[2].offset) == LDKEntry(f"{entries[2].offset:#x}", 0, TRACK, len(B), entries[2].offset)
+
+
+def test_find():
+    archive = LDKArchive(ARCHIVE)
+    assert archive.find("/Tracks/00000012").uuid == 0x12
+    assert archive.find("00000013").path == "/Tracks/00000013"
+    assert archive.find("0000001a").uuid == 0x1A
+    with pytest.raises(KeyError):
+        archive.find("/Tracks/00000099")
+
+
+def test_output_paths():
+    archive = LDKArchive(ARCHIVE)
+    paths = archive.output_paths(archive.tracks(), "out")
+    assert paths == [
+        os.path.join("out", "00000030.gpx"),
+        os.path.join("out", "Tracks", "Lagoretico.gpx"),
+        os.path.join("out", "Tracks", "Pizzo.gpx"),
+        # a repeated name gets the uuid
+        os.path.join("out", "Tracks", "Lagoretico 0000001A.gpx"),
+    ]
+    unsafe = build_ldk(folder=[(TRACK, trk_v3(name="a/b: c.d"), 1, None)], folder_name="x/y")
+    archive = LDKArchive(unsafe)
+    assert archive.entries()[0].path == "/x-y/00000001"
+    assert archive.output_paths(archive.tracks(), "out", ".geojson") == [os.path.join("out", "x-y", "a-b- c-d.geojson")]
+
+
+def test_malformed_archives():
+    with pytest.raises(LDKFormatError):
+        LDKArchive(ARCHIVE[:10])
+    # the root pointer at a data entry instead of a node
+    broken = bytearray(ARCHIVE)
+    struct.pack_into(">Q", broken, 8, LDKArchive(ARCHIVE).entries()[0].offset)
+    with pytest.raises(LDKFormatError):
+        LDKArchive(bytes(broken)).entries()
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_truncated_track_is_reported(tmp_path, capsys, jobs):
+    # cut inside the metadata that names the output file
+    source = tmp_path / "backup.ldk"
+    source.write_bytes(build_ldk(folder=[(TRACK, A, 0x11, None), (TRACK, A[:70], 0x12, None), (TRACK, B, 0x13, None)]))
+    result = alp2gpx(str(source), str(tmp_path / "backup.gpx"), geoid=False, jobs=jobs)
+    assert result.failed_tracks == ["/Tracks/00000012"]
+    assert "backup.ldk/Tracks/00000012: error:" in capsys.readouterr().out
+    assert sorted(os.listdir(tmp_path / "backup" / "Tracks")) == ["Lagoretico.gpx", "Pizzo.gpx"]
+    assert (tmp_path / "backup" / "Tracks" / "Pizzo.gpx").read_bytes() == (DATA_DIR / "b_v4.plain.gpx").read_bytes()
+
+
+def test_workers_get_the_conversion_options(tmp_path):
+    source = tmp_path / "backup.ldk"
+    source.write_bytes(build_ldk(folder=[(TRACK, A, 0x11, None), (TRACK, B, 0x12, None)]))
+    result = alp2gpx(str(source), str(tmp_path / "backup.gpx"), include_extensions=True, geoid=False, jobs=2)
+    assert not result.failed_tracks
+    for name, expected in (("Lagoretico", "a_v3"), ("Pizzo", "b_v4")):
+        output = tmp_path / "backup" / "Tracks" / f"{name}.gpx"
+        assert output.read_bytes() == (DATA_DIR / f"{expected}.extensions.gpx").read_bytes()
@@ -0,0 +1,120 @@
+"""Incremental batch runs: the manifest round-trip, change detection and pruning."""
+
+import os
+import shutil
+
+from alp2gpx.manifest import MANIFEST_NAME, Manifest
+from alp2gpx.ops import batch_convert, find_tracks
+
+
+def test_round_trip(tmp_path):
+    source = tmp_path / "a.trk"
+    source.write_bytes(b"track")
+    out_dir = tmp_path / "out"
+    out_dir.mkdir()
+    output = out_dir / "sub" / "a.gpx"
+    output.parent.mkdir()
+    output.write_text("gpx")
+
+    manifest = Manifest.load(out_dir)
+    assert manifest.needs_conversion(source, output, {"pretty": True})
+    manifest.record(source)
+    manifest.save()
+    assert not (out_dir / (MANIFEST_NAME + ".tmp")).exists()
+
+    loaded = Manifest.load(out_dir)
+    assert loaded.entries == manifest.entries
+    assert loaded.entries[Manifest.key(source)]["output"] == "sub/a.gpx"
+    assert not loaded.needs_conversion(source, output, {"pretty": True})
+    # other options, another output, or a missing output
+    assert loaded.needs_conversion(source, output, {"pretty": False})
+    assert loaded.needs_conversion(source, out_dir / "a.gpx", {"pretty": True})
+    output.unlink()
+    assert loaded.needs_conversion(source, output, {"pretty": True})
+
+
+def test_content_hash_decides_when_stat_changes(tmp_path):
+    source = tmp_path / "a.trk"
+    source.write_bytes(b"track")
+    output = tmp_path / "a.gpx"
+    output.write_text("gpx")
+    manifest = Manifest(tmp_path)
+    manifest.needs_conversion(source, output, {})
+    manifest.record(source)
+
+    # touched but identical
+    os.utime(source, ns=(1, 1))
+    assert not manifest.needs_conversion(source, output, {})
+    assert manifest.entries[Manifest.key(source)]["mtime_ns"] == 1
+    # same size, other content
+    source.write_bytes(b"trick")
+    assert manifest.needs_conversion(source, output, {})
+
+
+def test_unreadable_manifest_starts_empty(tmp_path):
+    (tmp_path / MANIFEST_NAME).write_text("{not json")
+    assert Manifest.load(tmp_path).entries == {}
+
+
+def test_forget_retries_a_failed_conversion(tmp_path):
+    source = tmp_path / "a.trk"
+    source.write_bytes(b"track")
+    output = tmp_path / "a.gpx"
+    output.write_text("gpx")
+    manifest = Manifest(tmp_path)
+    manifest.needs_conversion(source, output, {})
+    manifest.record(source)
+    manifest.forget(source)
+    assert manifest.needs_conversion(source, output, {})
+
+
+def test_prune_removes_the_mirrored_output(tmp_path):
+    out_dir = tmp_path / "out"
+    out_dir.mkdir()
+    sources = []
+    for name in ("x/a.trk", "y/a.trk"):
+        source = tmp_path / "tracks" / name
+        source.parent.mkdir(parents=True, exist_ok=True)
+        source.write_bytes(name.encode())
+        output = out_dir / name.replace(".trk", ".npz")
+        output.parent.mkdir(exist_ok=True)
+        output.write_text(name)
+        sources.append(source)
+    # a file of the same name at the top of out_dir is not the output of either source
+    decoy = out_dir / "a.npz"
+    decoy.write_text("decoy")
+
+    manifest = Manifest(out_dir)
+    for source in sources:
+        manifest.needs_conversion(source, out_dir / source.parent.name / "a.npz", {})
+        manifest.record(source)
+    assert manifest.prune(sources[1:]) == [out_dir / "x" / "a.npz"]
+    assert list(manifest.entries) == [Manifest.key(sources[1])]
+    assert (out_dir / "y" / "a.npz").exists()
+    assert decoy.exists()
+
+
+def test_incremental_batch(tracks, tmp_path, capsys):
+    batch = tmp_path / "batch"
+    batch.mkdir()
+    for name in ("a_v3", "b_v4", "c_v3_noname"):
+        shutil.copy(tracks[name], batch)
+    out_dir = tmp_path / "out"
+
+    def run(**options):
+        failed = batch_convert(find_tracks(batch), out_dir, geoid=False, incremental=True, **options)
+        assert failed == 0
+        return capsys.readouterr().out
+
+    assert "0 unchanged, 3 to convert" in run()
+    assert "3 unchanged, 0 to convert" in run()
+    # options that do not change the GPX keep the outputs
+    assert "3 unchanged, 0 to convert" in run(verbose=1)
+    assert "0 unchanged, 3 to convert" in run(pretty=True)
+
+    (batch / "b_v4.trk").write_bytes((batch / "b_v4.trk").read_bytes() + b"\0")
+    (batch / "c_v3_noname.trk").unlink()
+    report = run(pretty=True, prune=True)
+    assert "1 unchanged, 1 to convert" in report
+    assert f"xx {out_dir / 'c_v3_noname.gpx'}" in report
+    assert sorted(path.name for path in out_dir.iterdir()) == [MANIFEST_NAME, "a_v3.gpx", "b_v4.gpx"]
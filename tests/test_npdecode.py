@@ -0,0 +1,40 @@
+"""NumPy decoding of v3 location blocks gives the same values as the per-record reader."""
+
+import importlib
+
+import pytest
+
+from alp2gpx.trackpoint import FIELDS
+
+pytest.importorskip("numpy")
+
+converter = importlib.import_module("alp2gpx.alp2gpx")
+
+
+def decoded(path, output, monkeypatch):
+    """Per segment, the metadata and the decoded values of every TrackPoint field."""
+    segments = []
+
+    def collect(self, stream):
+        for meta, chunks in stream:
+            rows = {name: [] for name in FIELDS}
+            for chunk in chunks:
+                for name in FIELDS:
+                    rows[name].extend(chunk.column(name))
+            segments.append((meta, rows))
+
+    monkeypatch.setattr(converter.alp2gpx, "_write_output", collect)
+    converter.alp2gpx(str(path), str(output), geoid=False)
+    return segments
+
+
+@pytest.mark.parametrize("chunk_points", [65536, 7])
+@pytest.mark.parametrize("name", ["a_v3", "c_v3_noname", "e_v3_uniform", "f_v3_u20"])
+def test_numpy_matches_python(tracks, tmp_path, monkeypatch, name, chunk_points):
+    monkeypatch.setattr(converter, "CHUNK_POINTS", chunk_points)
+    monkeypatch.setattr(converter, "HAVE_NUMPY", True)
+    fast = decoded(tracks[name], tmp_path / "numpy.gpx", monkeypatch)
+    monkeypatch.setattr(converter, "HAVE_NUMPY", False)
+    slow = decoded(tracks[name], tmp_path / "python.gpx", monkeypatch)
+    assert fast == slow
+    assert sum(len(rows["lat"]) for meta, rows in slow) > 0
@@ -0,0 +1,69 @@
+"""Simplification keeps the end points and stays within the tolerance."""
+
+import importlib
+import math
+import random
+
+import pytest
+
+from alp2gpx.simplify import SIMPLIFY_METHODS, douglas_peucker, visvalingam
+
+simplify = importlib.import_module("alp2gpx.simplify")
+
+
+def walk(count, seed=4):
+    rnd = random.Random(seed)
+    x, y, heading = [0.0], [0.0], 0.0
+    for _ in range(count - 1):
+        heading += rnd.gauss(0, 0.4)
+        step = rnd.uniform(0.5, 4.0)
+        x.append(x[-1] + step * math.cos(heading))
+        y.append(y[-1] + step * math.sin(heading))
+    return x, y
+
+
+def distance_to_segment(px, py, ax, ay, bx, by):
+    dx, dy = bx - ax, by - ay
+    norm2 = dx * dx + dy * dy
+    t = 0.0 if norm2 == 0 else max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / norm2))
+    return math.hypot(px - ax - t * dx, py - ay - t * dy)
+
+
+@pytest.mark.parametrize("tolerance", [0.5, 3.0, 20.0])
+def test_douglas_peucker_within_tolerance(tolerance):
+    x, y = walk(2000)
+    keep = douglas_peucker(x, y, tolerance)
+    kept = [i for i, flag in enumerate(keep) if flag]
+    assert kept[0] == 0 and kept[-1] == len(x) - 1
+    for a, b in zip(kept, kept[1:]):
+        for i in range(a + 1, b):
+            assert distance_to_segment(x[i], y[i], x[a], y[a], x[b], y[b]) <= tolerance
+
+
+def test_douglas_peucker_numpy_matches_python(monkeypatch):
+    pytest.importorskip("numpy")
+    x, y = walk(5000)
+    fast = douglas_peucker(x, y, 2.0)
+    monkeypatch.setattr(simplify, "HAVE_NUMPY", False)
+    assert douglas_peucker(x, y, 2.0) == fast
+
+
+@pytest.mark.parametrize("tolerance", [0.5, 3.0, 20.0])
+def test_visvalingam_keeps_large_triangles(tolerance):
+    x, y = walk(2000)
+    keep = visvalingam(x, y, tolerance)
+    kept = [i for i, flag in enumerate(keep) if flag]
+    assert kept[0] == 0 and kept[-1] == len(x) - 1
+    assert len(kept) < len(x)
+    # every remaining inner point spans a triangle of at least tolerance**2 with its kept neighbours
+    for a, b, c in zip(kept, kept[1:], kept[2:]):
+        area = abs((x[b] - x[a]) * (y[c] - y[a]) - (x[c] - x[a]) * (y[b] - y[a])) * 0.5
+        assert area >= tolerance * tolerance
+
+
+@pytest.mark.parametrize("method", SIMPLIFY_METHODS)
+def test_straight_line_collapses(method):
+    x = [float(i) for i in range(100)]
+    y = [0.0] * 100
+    mask = douglas_peucker(x, y, 0.1) if method == "douglas-peucker" else visvalingam(x, y, 0.1)
+    assert [i for i, flag in enumerate(mask) if flag] == [0, 99]
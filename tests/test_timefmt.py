@@ -0,0 +1,47 @@
+"""TimeFormatter renders exactly what the baseline's per-point strftime did."""
+
+import random
+from datetime import datetime
+
+import pytest
+
+from alp2gpx.timefmt import TimeFormatter
+
+
+def baseline(timestamp, milliseconds=False):
+    moment = datetime.utcfromtimestamp(timestamp)
+    if milliseconds:
+        return moment.strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+    return moment.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def timestamps():
+    rnd = random.Random(3)
+    # TRK timestamps are milliseconds; the last ones are not, and round at the microsecond
+    values = [
+        0.0, -0.001, -1.0, -86400.0, 86399.999, 86400.0, 951782400.0, 1192356597.123,
+        1700000000.9995, 4102444800.5, -62135596800.0, 253402300799.999,
+        1e-7, 0.9999996, -0.0000004, 1192356597.1234565,
+    ]
+    # a 1 Hz log over a day change, with the same second repeated
+    start = 1192406390.0
+    values += [start + i + rnd.randint(0, 999) / 1000 for i in range(40) for _ in range(2)]
+    values += [rnd.randint(-2 ** 35, 2 ** 35) / 1000 for _ in range(2000)]
+    return values
+
+
+@pytest.mark.parametrize("milliseconds", [False, True])
+def test_matches_strftime(milliseconds):
+    format_time = TimeFormatter(milliseconds)
+    for timestamp in timestamps():
+        assert format_time(timestamp) == baseline(timestamp, milliseconds), timestamp
+
+
+def test_missing_and_out_of_range():
+    format_time = TimeFormatter()
+    assert format_time(None) is None
+    assert format_time(float("nan")) is None
+    assert format_time(float("inf")) is None
+    assert format_time(1e20) is None
+    # the cached second is not reused after a failure
+    assert format_time(60.0) == "1970-01-01T00:01:00Z"
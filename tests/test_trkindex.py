@@ -0,0 +1,71 @@
+"""The SQLite track index: refreshing, pruning and the query filters."""
+
+import os
+import shutil
+from datetime import datetime, timedelta
+
+import pytest
+
+from alp2gpx.trkindex import build_index, query_index
+
+
+@pytest.fixture
+def archive(tracks, tmp_path):
+    root = tmp_path / "tracks"
+    (root / "sub").mkdir(parents=True)
+    shutil.copy(tracks["a_v3"], root / "a.trk")
+    shutil.copy(tracks["b_v4"], root / "sub" / "b.trk")
+    shutil.copy(tracks["e_v3_uniform"], root / "e.trk")
+    return root
+
+
+def paths(root):
+    return sorted(root.rglob("*.trk"))
+
+
+def test_refresh_and_prune(archive, tmp_path, capsys):
+    db = tmp_path / "tracks.db"
+    assert build_index(db, paths(archive), root=archive) == (3, 0, 0)
+    assert build_index(db, paths(archive), root=archive) == (0, 3, 0)
+
+    # a changed mtime is re-read; an unreadable file is reported and skipped
+    os.utime(archive / "a.trk", ns=(1, 1))
+    (archive / "bad.trk").write_bytes(b"\x00\x00\x00\x03\x00\x00\x00\x3c")
+    assert build_index(db, paths(archive), root=archive) == (1, 2, 0)
+    assert "bad.trk" in capsys.readouterr().err
+
+    # rows of deleted files go, but only under root
+    (archive / "e.trk").unlink()
+    assert build_index(db, paths(archive / "sub"), root=archive / "sub") == (0, 1, 0)
+    assert len(query_index(db)) == 3
+    assert build_index(db, paths(archive), root=archive) == (0, 2, 1)
+    rows = query_index(db)
+    assert [os.path.basename(row["path"]) for row in rows] == ["a.trk", "b.trk"]
+    assert [row["name"] for row in rows] == ["Lagoretico", "Pizzo"]
+    assert rows[0]["length"] == 1234.5 and rows[0]["gain"] == 321.0
+
+
+def test_query_filters(archive, tmp_path):
+    db = tmp_path / "tracks.db"
+    build_index(db, paths(archive), root=archive)
+    e, a, b = query_index(db)
+    assert os.path.basename(b["path"]) == "b.trk"
+
+    def names(**filters):
+        return [os.path.basename(row["path"]) for row in query_index(db, **filters)]
+
+    assert names(version=4) == ["b.trk"]
+    assert names(min_length=1000) == ["a.trk"]
+    assert names(bbox=(8.8, 46.5, 9.0, 46.7)) == ["e.trk", "a.trk", "b.trk"]
+    assert names(bbox=(0.0, 0.0, 1.0, 1.0)) == []
+
+    # a bare date covers the whole local day, a date-time is exact
+    start = datetime.fromtimestamp(b["ts0"])
+    day = start.date()
+    assert names(since=day.isoformat(), until=day.isoformat()) == ["b.trk"]
+    assert names(until=(day - timedelta(days=1)).isoformat()) == ["e.trk", "a.trk"]
+    assert names(since=(day + timedelta(days=1)).isoformat()) == []
+    assert names(since=start.isoformat()) == ["b.trk"]
+    assert names(until=start.isoformat()) == ["e.trk", "a.trk", "b.trk"]
+    assert names(until=(start - timedelta(milliseconds=1)).isoformat()) == ["e.trk", "a.trk"]
+    assert names(since=(start + timedelta(milliseconds=1)).isoformat()) == []
@@ -0,0 +1,38 @@
+"""Compiled v4 layouts decode like the tag-by-tag walk."""
+
+from alp2gpx.v4decode import V4LocationDecoder
+
+from conftest import location_v4
+
+
+def test_layout_cache_matches_tag_walk():
+    # same size, different tag order; an unknown tag; records of other sizes
+    records = [
+        location_v4(89000000, 466000000, [("e", 2500000), ("t", 1700000001000), ("a", 5)]),
+        location_v4(89000010, 466000010, [("t", 1700000002000), ("e", -999999999), ("a", 7)]),
+        location_v4(89000020, 466000020, [("e", 2500100), ("t", 1700000003000), ("a", 6)]),
+        location_v4(89000030, 466000030, [("e", 2500200), ("t", 1700000004000), ("a", 8), ("x", b"\x00\x01\x02\x03")]),
+        location_v4(89000040, 466000040, [("e", 2500300), ("t", 1700000005000), ("a", 9), ("p", 950000), ("n", (43, 90)), ("b", 77), ("s", [1, 2, 3, 4, 5, 6, 7, 8]), ("v", 250)]),
+        location_v4(89000050, 466000050, [("t", 1700000006000), ("e", 2500400), ("a", 4)]),
+        location_v4(89000060, 466000060, [("e", 2500500), ("t", 1700000007000), ("a", 3), ("p", 999999999), ("n", (21, 5)), ("b", 0), ("s", [0] * 8), ("v", 100)]),
+    ]
+    buf = b"".join(records * 3)
+    cached = V4LocationDecoder()
+    pos = 0
+    for record in records * 3:
+        row, end = cached.decode_row(buf, pos)
+        # a fresh decoder has no compiled layout and walks the tags one by one
+        assert row == V4LocationDecoder().decode_row(record, 0)[0]
+        assert end == pos + len(record)
+        pos = end
+    assert pos == len(buf)
+
+
+def test_decode_returns_a_trackpoint():
+    record = location_v4(89000000, 466000000, [("e", -999999999), ("t", 1700000001000), ("a", 5), ("v", 250)])
+    point, end = V4LocationDecoder().decode(record, 0)
+    assert end == len(record)
+    assert (point.lat, point.lon) == (46.6, 8.9)
+    assert point.elevation is None
+    assert point.timestamp == 1700000001.0
+    assert (point.accuracy, point.vertical_accuracy) == (5, 2.5)